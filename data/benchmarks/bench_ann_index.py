@@ -0,0 +1,76 @@
+"""
+Near-duplicate lookup benchmark: random-projection LSH vs exact scan
+
+Indexes n synthetic unit-norm 384-d embeddings (the all-MiniLM-L6-v2 width)
+drawn around a few hundred "scenario" centres, like the repetitive fraud
+corpus. Queries are either fresh perturbations of an indexed vector (true
+near-duplicates, cosine >= threshold) or new vectors.
+
+Metrics:
+-------------------
+(1) Index build time
+(2) Mean / p99 query latency, LSH vs a brute-force matmul over all vectors
+(3) Recall: near-duplicates the LSH finds above the threshold
+(4) False rejects: novel queries reported above the threshold
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_ann_index [num_tables] [num_bits]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from src.utils.ann_index import RandomProjectionIndex
+
+num_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+num_bits = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+dim = 384
+threshold = 0.95
+num_queries = 500
+rng = np.random.default_rng(0)
+
+
+def unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def perturb(x, scale):
+    return unit(x + scale * rng.standard_normal(x.shape).astype(np.float32) / np.sqrt(dim))
+
+
+print(f"tables={num_tables} bits={num_bits} threshold={threshold}")
+print(f"{'n':>7} {'build s':>8} {'LSH ms':>7} {'p99 ms':>7} {'exact ms':>9} {'recall':>7} {'false rej':>10}")
+for n in (10_000, 50_000, 100_000):
+    centres = unit(rng.standard_normal((300, dim)))
+    data = perturb(centres[rng.integers(0, len(centres), n)], 0.6)   # cos to centre about 0.85
+
+    start = time.perf_counter()
+    index = RandomProjectionIndex(dim, num_tables=num_tables, num_bits=num_bits)
+    index.add(data)
+    build_s = time.perf_counter() - start
+
+    dup_queries = perturb(data[rng.integers(0, n, num_queries)], 0.2)          # cos about 0.98
+    new_queries = perturb(centres[rng.integers(0, len(centres), num_queries)], 0.6)
+
+    lat, found, false_rej = [], 0, 0
+    for q in dup_queries:
+        start = time.perf_counter()
+        hits = index.query(q)
+        lat.append(time.perf_counter() - start)
+        found += bool(hits) and hits[0][0] >= threshold
+    for q in new_queries:
+        start = time.perf_counter()
+        hits = index.query(q)
+        lat.append(time.perf_counter() - start)
+        false_rej += bool(hits) and hits[0][0] >= threshold
+
+    start = time.perf_counter()
+    for q in dup_queries[:100]:
+        int(np.argmax(data @ q))
+    exact_ms = (time.perf_counter() - start) / 100 * 1e3
+
+    lat_ms = np.array(lat) * 1e3
+    print(f"{n:>7} {build_s:>8.2f} {lat_ms.mean():>7.3f} {np.percentile(lat_ms, 99):>7.3f} {exact_ms:>9.3f} "
+          f"{found / num_queries:>7.3f} {false_rej:>10}")
@@ -0,0 +1,67 @@
+"""
+LLM backend throughput benchmark
+
+Runs against the in-process fake Ollama server, so no GPU/Ollama is needed.
+
+Metrics:
+-------------------
+(1) Requests/sec with a fresh requests.post per call (old call sites)
+(2) Requests/sec through the pooled OllamaBackend session
+(3) Wall time for N fraud sequences: sync planner vs AsyncLLMPlanner
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_backend
+"""
+
+import contextlib
+import io
+import time
+
+import requests
+
+import src.utils.fraud_env as fraud_env
+import src.llmplanner as llmplanner
+import src.async_planner as async_planner
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.llm_backend import OllamaBackend
+
+num_calls = 300
+num_seq = 20
+latency = 0.05
+
+
+def bench_fresh_connections(url):
+    start = time.perf_counter()
+    for i in range(num_calls):
+        requests.post(url + "/api/generate", json={"model": "llama3.2", "prompt": f"ping {i}", "stream": False}).json()
+    return num_calls / (time.perf_counter() - start)
+
+
+def bench_pooled(backend):
+    start = time.perf_counter()
+    for i in range(num_calls):
+        backend.generate(f"ping {i}")
+    return num_calls / (time.perf_counter() - start)
+
+
+with FakeOllamaServer() as server:
+    backend = OllamaBackend(host=server.url)
+    print(f"fresh requests.post : {bench_fresh_connections(server.url):8.1f} req/s")
+    print(f"pooled OllamaBackend: {bench_pooled(backend):8.1f} req/s")
+    print(backend.metrics.summary())
+
+with FakeOllamaServer(latency=latency) as server, contextlib.redirect_stdout(io.StringIO()):
+    env = fraud_env.FraudEnv().create_environment()
+
+    planner = llmplanner.LLMPlanner(env, OllamaBackend(host=server.url))
+    start = time.perf_counter()
+    for _ in range(num_seq):
+        planner.generate_valid_fraud_seq(5)
+    sync_time = time.perf_counter() - start
+
+    aplanner = async_planner.AsyncLLMPlanner(env, concurrency=8, backend=OllamaBackend(host=server.url, pool_size=8))
+    start = time.perf_counter()
+    aplanner.generate_many(["fraud"] * num_seq, max_attempts=5)
+    async_time = time.perf_counter() - start
+
+print(f"{num_seq} fraud sequences @ {latency * 1000:.0f} ms/call: sync {sync_time:.2f}s, async(8) {async_time:.2f}s")
@@ -0,0 +1,63 @@
+"""
+Pairwise similarity benchmark: dense N x N matrix vs blocked tiles
+
+Uses random unit-norm 384-d embeddings (the all-MiniLM-L6-v2 width), with
+a few planted near-duplicates so the top-k pairs are known.
+
+Metrics:
+-------------------
+(1) Seconds and peak traced memory for similarity_check.avg_similarity
+    (dense, only up to dense_max rows) and blocked_similarity.pairwise_stats
+(2) Absolute difference between the two means where both ran
+(3) Whether the planted duplicate pairs come out as the top-k
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_blocked_similarity [max_n]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.utils.blocked_similarity import normalize_rows, pairwise_stats
+from src.utils.similarity_check import avg_similarity
+
+max_n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+dense_max = 5_000
+dim = 384
+planted = 5
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+rng = np.random.default_rng(0)
+print(f"{'n':>7} {'dense s':>8} {'dense MB':>9} {'blocked s':>10} {'blocked MB':>11} {'|diff|':>9} {'top-k ok':>9}")
+for n in (1_000, 5_000, 20_000, 50_000, 100_000):
+    if n > max_n:
+        break
+    x = normalize_rows(rng.standard_normal((n, dim), dtype=np.float32))
+    pairs = [(i, n - 1 - i) for i in range(planted)]
+    for i, j in pairs:
+        x[j] = normalize_rows(x[i:i + 1] + 0.01 * rng.standard_normal((1, dim), dtype=np.float32))[0]
+
+    stats, blocked_s, blocked_mb = measure(lambda: pairwise_stats(x, top_k=planted, normalized=True))
+    top_ok = sorted((i, j) for __, i, j in stats.top_pairs) == pairs
+    if n <= dense_max:
+        dense, dense_s, dense_mb = measure(lambda: avg_similarity(x))
+        diff = f"{abs(dense - stats.mean):.1e}"
+        dense_cols = f"{dense_s:>8.2f} {dense_mb:>9.0f}"
+    else:
+        diff = "-"
+        dense_cols = f"{'-':>8} {n * (n - 1) / 2 * 20 / 2**20 + n * n * 4 / 2**20:>8.0f}*"
+    print(f"{n:>7} {dense_cols} {blocked_s:>10.2f} {blocked_mb:>11.0f} {diff:>9} {str(top_ok):>9}")
+print("* estimated: float32 N x N matrix plus the int64 triu index arrays and the gathered values")
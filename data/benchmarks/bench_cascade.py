@@ -0,0 +1,62 @@
+"""
+Cascade detector benchmark: LLM ensemble only vs RuleScorer pre-filter
+
+Classifies a labelled coev corpus against the fake Ollama server (its
+classifier is a fraud-word matcher, so the LLM accuracy here is only a
+stand-in for a real model's).
+
+Metrics:
+-------------------
+(1) Accuracy, false positives and false negatives
+(2) Sequences escalated to the LLM and LLM calls made
+(3) Accuracy impact: on the sequences the rules decided, rule accuracy vs
+    the LLM ensemble's accuracy on the same sequences
+(4) Wall time
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_cascade [coev_path]
+"""
+
+import sys
+import time
+
+import src.llmdetector as llmdetector
+import src.utils.fraud_env as fraud_env
+import src.utils.sequence_table as sequence_table
+from src.rule_detector import RuleScorer
+from src.utils.coev_io import iter_coev
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.llm_backend import OllamaBackend
+
+path = sys.argv[1] if len(sys.argv) > 1 else "data/test/coev_seq_v2.json"
+records = list(iter_coev(path))
+env = fraud_env.FraudEnv(verbose=False).create_environment()
+scorer = RuleScorer(env)
+
+with FakeOllamaServer(latency=0.01) as server:
+    results = {}
+    print(f"{'mode':>9} {'accuracy':>9} {'FP':>4} {'FN':>4} {'unclass':>8} {'escalated':>10} {'LLM calls':>10} {'seconds':>8}")
+    for mode, prefilter in (("LLM only", None), ("cascade", scorer)):
+        backend = OllamaBackend(host=server.url)
+        detector = llmdetector.LLMDetector(None, "fake", backend=backend, prefilter=prefilter)
+        start = time.perf_counter()
+        table = sequence_table.from_sequences([sequence for __, __, sequence in records])
+        cascade = detector.cascade_classify_table(table, len(records))
+        preds = [(label, winner, source) for (__, label, __), (winner, source, __, __, __) in zip(records, cascade)]
+        elapsed = time.perf_counter() - start
+        results[mode] = preds
+
+        n = len(preds)
+        correct = sum(label == winner for label, winner, __ in preds)
+        fp = sum(label == "legit" and winner == "fraud" for label, winner, __ in preds)
+        fn = sum(label == "fraud" and winner == "legit" for label, winner, __ in preds)
+        unclass = sum(winner is None for __, winner, __ in preds)
+        escalated = sum(source == "llm" for __, __, source in preds)
+        print(f"{mode:>9} {correct / n:>9.3f} {fp:>4} {fn:>4} {unclass:>8} {escalated:>10} "
+              f"{backend.metrics.calls:>10} {elapsed:>8.2f}")
+
+decided = [i for i, (__, __, source) in enumerate(results["cascade"]) if source == "rules"]
+rules_ok = sum(results["cascade"][i][0] == results["cascade"][i][1] for i in decided)
+llm_ok = sum(results["LLM only"][i][0] == results["LLM only"][i][1] for i in decided)
+print(f"rule-decided sequences: {len(decided)}/{len(records)}, "
+      f"rules correct {rules_ok}, LLM ensemble correct {llm_ok} on the same sequences")
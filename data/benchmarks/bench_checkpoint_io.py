@@ -0,0 +1,45 @@
+"""
+Dataset checkpoint I/O benchmark
+
+Metrics:
+-------------------
+(1) Seconds to persist N sequences one at a time by rewriting the whole
+    JSON file after each one (old generate_sequences)
+(2) Same with CoevLog appends at several fsync batch sizes
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_checkpoint_io [num_sequences]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from src.utils.coev_io import CoevLog, iter_coev
+
+num_sequences = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+records = [(i, label, seq) for i, (_, label, seq) in enumerate(iter_coev("data/test/coev_seq_v2.json"))]
+records = [(i, *records[i % len(records)][1:]) for i in range(num_sequences)]
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "coev_gen1.csv")
+    data = {}
+    start = time.perf_counter()
+    for i, label, seq in records:
+        data[i] = {"label": label, "sequence": seq}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+    print(f"{'rewrite whole file':>22}: {time.perf_counter() - start:7.2f}s")
+
+    for fsync_every in (1, 16, 256):
+        path = os.path.join(tmp, f"coev_{fsync_every}.jsonl")
+        start = time.perf_counter()
+        with CoevLog(path, fsync_every=fsync_every) as log:
+            for i, label, seq in records:
+                log.append(i, label, seq)
+        elapsed = time.perf_counter() - start
+        assert sum(1 for _ in iter_coev(path)) == num_sequences
+        print(f"{f'CoevLog fsync/{fsync_every}':>22}: {elapsed:7.2f}s")
@@ -0,0 +1,79 @@
+"""
+Co-evolution runner benchmark: pipelined vs sequential rounds
+
+Runs CoevolutionRunner against the fake Ollama server. The responder turns a
+fraud request into a "subtle" sequence (no phishing/takeover wording, so the
+fake detector calls it legit) with probability p_subtle, raised to
+p_subtle_feedback once the prompt carries detector feedback. That stands in
+for a planner learning from the evasions it is shown.
+
+Metrics:
+-------------------
+(1) Wall time of all rounds, pipelined (detection of round k overlapped with
+    generation of round k+1) vs one stage after the other
+(2) Per-round false negative rate and fraud prompts that carried feedback
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_coevolution [num_rounds] [per_round]
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import src.llmdetector as llmdetector
+import src.llmplanner as llmplanner
+import src.utils.fraud_env as fraud_env
+from src.coevolution import CoevolutionRunner
+from src.utils.fake_ollama import FakeOllamaServer, default_responder
+from src.utils.llm_backend import OllamaBackend
+
+num_rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+per_round = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+p_subtle = 0.1
+p_subtle_feedback = 0.5
+rng = random.Random(1)
+
+
+def responder(request):
+    prompt = request.get("prompt", "")
+    p = p_subtle_feedback if "DETECTOR FEEDBACK" in prompt else p_subtle
+    if "- Victim:" not in prompt or rng.random() >= p:
+        return default_responder(request)
+    f = {k: re.search(rf"- {k}: (\S+)", prompt).group(1)
+         for k in ("Victim", "Victim Account", "Fraudster", "Fraudster Account", "Transfer Amount")}
+    return json.dumps({"sequence": [
+        f"action({f['Fraudster']}, contacted, {f['Victim']}, phone, offered a refund for an overcharge)",
+        f"action({f['Victim']}, shared code, {f['Fraudster']}, phone, read out the one-time code)",
+        f"action({f['Fraudster']}, logged in, {f['Victim Account']}, online, opened the banking app)",
+        f"transaction({f['Victim Account']}, fast payment, {f['Fraudster Account']}, {f['Transfer Amount']})",
+    ]})
+
+
+env = fraud_env.FraudEnv(verbose=False).create_environment()
+
+for pipeline in (False, True):
+    rng.seed(1)
+    with FakeOllamaServer(responder=responder, latency=0.02, token_latency=0.002) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        planner = llmplanner.LLMPlanner(env, backend=OllamaBackend(host=server.url))
+        detector = llmdetector.LLMDetector(None, "fake", backend=OllamaBackend(host=server.url))
+        runner = CoevolutionRunner(planner, detector, seqs_per_round=per_round, seed=0, pipeline=pipeline,
+                                   results_path=os.path.join(tmp, "rounds.parquet"),
+                                   sequences_path=os.path.join(tmp, "sequences.jsonl"))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = runner.run(num_rounds)
+        elapsed = time.perf_counter() - start
+
+    mode = "pipelined" if pipeline else "sequential"
+    busy = df["gen_seconds"].sum() + df["detect_seconds"].sum()
+    print(f"{mode}: {elapsed:.2f}s wall, {busy:.2f}s of generation + detection")
+    print(df[["round", "generated", "fraud_prompts_with_feedback", "accuracy", "false_negative",
+              "gen_seconds", "detect_seconds", "wall_seconds"]].round(3).to_string(index=False))
@@ -0,0 +1,67 @@
+"""
+Concurrency control benchmark against a loaded fake Ollama server
+
+The fake server serves `capacity` requests at full speed; beyond that every
+request is slowed by active / capacity, and past max_queue active requests
+it answers 503. A pool of client threads (a planner plus a detector's
+parallel votes) sends non-cached generate calls through one shared backend.
+
+Metrics:
+-------------------
+(1) Goodput (successful calls/s) and p50/p95 call latency, including
+    retries and time queued behind the controller
+(2) 503 rejections, backend retries and failed calls
+(3) Final concurrency limit and the deepest client-side queue seen
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_concurrency [num_calls]
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.llm_backend import OllamaBackend
+from src.utils.rate_limit import AIMDConcurrencyController
+
+num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+clients = 32
+capacity = 4
+max_queue = 12
+latency = 0.05
+
+modes = [
+    ("sequential", lambda: AIMDConcurrencyController(initial=1, min_limit=1, max_limit=1)),
+    ("unbounded", lambda: None),
+    ("fixed 4", lambda: AIMDConcurrencyController(initial=4, min_limit=4, max_limit=4)),
+    ("fixed 16", lambda: AIMDConcurrencyController(initial=16, min_limit=16, max_limit=16)),
+    ("AIMD", lambda: AIMDConcurrencyController(initial=1, max_limit=clients)),
+]
+
+print(f"{'mode':>10} {'good/s':>8} {'p50 s':>7} {'p95 s':>7} {'503s':>6} {'retries':>8} {'failed':>7} "
+      f"{'limit':>6} {'max queue':>10}")
+for name, make_controller in modes:
+    with FakeOllamaServer(latency=latency, capacity=capacity, max_queue=max_queue) as server:
+        controller = make_controller()
+        backend = OllamaBackend(host=server.url, pool_size=clients, backoff=0.05, controller=controller)
+
+        def call(i):
+            try:
+                backend.generate(f"request {i}", use_cache=False)
+            except requests.RequestException:
+                pass
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(call, range(num_calls)))
+        elapsed = time.perf_counter() - start
+
+        m = backend.metrics.summary()
+        stats = controller.stats() if controller else {"limit": "-", "max_queue_depth": "-"}
+        print(f"{name:>10} {(num_calls - m['failures']) / elapsed:>8.1f} {m['p50_latency']:>7.3f} {m['p95_latency']:>7.3f} "
+              f"{server.requests_rejected:>6} {m['retries']:>8} {m['failures']:>7} "
+              f"{stats['limit']:>6} {stats['max_queue_depth']:>10}")
+        backend.close()
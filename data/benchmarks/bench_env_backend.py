@@ -0,0 +1,69 @@
+"""
+FraudEnv backend benchmark: networkx DiGraph vs ArrayFraudEnv
+
+Metrics:
+-------------------
+(1) Build time for the same synthetic environment
+(2) Peak traced Python memory during the build (tracemalloc)
+(3) update_balance throughput (transfers/sec) over random account pairs
+(4) get_accounts_of lookups/sec
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_env_backend [num_individuals]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from src.utils.array_env import ArrayFraudEnv
+from src.utils.env_generator import generate_environment
+from src.utils.fraud_env import FraudEnv
+
+num_individuals = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+num_transfers = 200_000
+num_lookups = 100_000
+
+backends = {
+    "networkx": lambda: FraudEnv(verbose=False),
+    "array": lambda: ArrayFraudEnv(),
+}
+
+
+def build(make_env):
+    return generate_environment(num_banks=50, num_individuals=num_individuals, num_fraudsters=num_individuals // 100,
+                                num_organizations=num_individuals // 50, accounts_per_owner=(1, 3),
+                                seed=0, env=make_env())
+
+
+print(f"{'backend':>9} {'nodes':>9} {'build s':>8} {'peak MB':>8} {'transfers/s':>12} {'lookups/s':>10}")
+for name, make_env in backends.items():
+    tracemalloc.start()
+    env = build(make_env)
+    __, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del env
+
+    start = time.perf_counter()
+    env = build(make_env)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(0)
+    accounts = env.get_acc()
+    pairs = [(rng.choice(accounts), rng.choice(accounts)) for _ in range(num_transfers)]
+    start = time.perf_counter()
+    for acc_from, acc_to in pairs:
+        env.update_balance(acc_from, acc_to, 1.0)
+    transfer_rate = num_transfers / (time.perf_counter() - start)
+
+    individuals = env.get_individuals()
+    owners = [rng.choice(individuals) for _ in range(num_lookups)]
+    env.get_accounts_of(owners[0])   # build the lazy index outside the timed loop
+    start = time.perf_counter()
+    for owner in owners:
+        env.get_accounts_of(owner)
+    lookup_rate = num_lookups / (time.perf_counter() - start)
+
+    nodes = len(env.get_nodes())
+    print(f"{name:>9} {nodes:>9} {build_time:>8.2f} {peak / 1e6:>8.1f} {transfer_rate:>12.0f} {lookup_rate:>10.0f}")
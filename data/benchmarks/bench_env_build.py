@@ -0,0 +1,44 @@
+"""
+Synthetic environment loading benchmark
+
+Metrics:
+-------------------
+(1) Build time of generate_environment for increasing participant counts
+(2) Peak traced Python memory during the build (tracemalloc)
+(3) Bytes per node
+
+tracemalloc adds overhead, so build time is measured in a separate untraced run.
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_env_build [num_individuals ...]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from src.utils.env_generator import generate_environment
+
+sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+
+
+def build(n):
+    return generate_environment(num_banks=50, num_individuals=n, num_fraudsters=max(1, n // 100),
+                                num_organizations=max(1, n // 50), accounts_per_owner=(1, 3), seed=0)
+
+
+print(f"{'individuals':>12} {'nodes':>10} {'edges':>10} {'build s':>9} {'peak MB':>9} {'B/node':>8}")
+for n in sizes:
+    start = time.perf_counter()
+    env = build(n)
+    elapsed = time.perf_counter() - start
+    nodes, edges = env.G.number_of_nodes(), env.G.number_of_edges()
+    del env
+
+    tracemalloc.start()
+    env = build(n)
+    __, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del env
+
+    print(f"{n:>12} {nodes:>10} {edges:>10} {elapsed:>9.2f} {peak / 1e6:>9.1f} {peak / nodes:>8.0f}")
@@ -0,0 +1,95 @@
+"""
+Validator keyword predicate benchmark
+
+Metrics:
+-------------------
+(1) Strings/sec classifying action types with the six per-predicate
+    `any(kw in s ...)` scans vs the Aho-Corasick automaton, with and
+    without the per-string memo
+(2) Predicate disagreements between the two (should be 0)
+
+Action types come from data/test plus synthetic variants, so the distinct
+set is realistic for a large generated corpus.
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_keyword_rules [num_strings]
+"""
+
+import random
+import sys
+import time
+
+import src.utils.pydantic_validator as pydantic_validator
+import src.utils.step_parser as step_parser
+from src.utils.coev_io import iter_coev
+from src.utils.keyword_automaton import KeywordAutomaton
+
+num_strings = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+keywords = pydantic_validator.CAPABILITY_KEYWORDS
+
+
+def old_predicates(action_type, channel):
+    """
+    The six predicates as they were before the automaton, one scan per keyword.
+    """
+    a, c = action_type.lower(), channel.lower()
+    return (
+        any(kw in c for kw in keywords["human_channel"]) or any(kw in a for kw in keywords["human_action"]),
+        any(kw in a for kw in keywords["submission"]) and any(kw in a for kw in keywords["info"]),
+        any(kw in a for kw in keywords["psychological"]),
+        'identity' in a or 'impersonat' in a,
+        any(kw in a for kw in keywords["technical"]),
+        any(kw in a for kw in keywords["fraud"]),
+    )
+
+
+def new_predicates(validator, action_type, channel):
+    return (
+        validator.requires_human_agency(action_type, channel),
+        validator.is_information_submission(action_type),
+        validator.targets_human_psychology(action_type),
+        validator.is_identity_based(action_type),
+        validator.is_technical_system_action(action_type),
+        validator.is_fraud_behavior(action_type),
+    )
+
+
+pairs = []
+for path in ["data/test/coev_seq_v1.json", "data/test/coev_seq_v2.json"]:
+    for _, _, sequence in iter_coev(path):
+        for step in step_parser.parse_sequence(sequence):
+            if step.kind == "action":
+                pairs.append((step.data["action_type"], step.data["channel"]))
+
+rng = random.Random(0)
+suffixes = ["", " via link", " urgently", " account details", " to bank", " Again"]
+workload = [(a + rng.choice(suffixes) + (f" #{rng.randrange(5000)}" if rng.random() < 0.5 else ""), c)
+            for a, c in (rng.choice(pairs) for _ in range(num_strings))]
+
+validator = pydantic_validator.UniversalRulesValidator({})
+disagree = sum(old_predicates(a, c) != new_predicates(validator, a, c) for a, c in workload)
+
+start = time.perf_counter()
+for a, c in workload:
+    old_predicates(a, c)
+old_rate = len(workload) / (time.perf_counter() - start)
+
+automaton = KeywordAutomaton(keywords)
+start = time.perf_counter()
+for a, c in workload:
+    automaton.scan(a)
+    automaton.scan(c)
+scan_rate = len(workload) / (time.perf_counter() - start)
+
+pydantic_validator.RULE_KEYWORDS._cache.clear()
+start = time.perf_counter()
+for a, c in workload:
+    new_predicates(validator, a, c)
+memo_rate = len(workload) / (time.perf_counter() - start)
+
+distinct = len({a for a, _ in workload})
+print(f"{len(workload)} (action, channel) pairs, {distinct} distinct action types")
+print(f"  per-keyword scans  {old_rate:>10.0f} pairs/s")
+print(f"  automaton scan     {scan_rate:>10.0f} pairs/s")
+print(f"  automaton + memo   {memo_rate:>10.0f} pairs/s")
+print(f"  disagreements      {disagree}")
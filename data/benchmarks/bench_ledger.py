@@ -0,0 +1,49 @@
+"""
+Batch transaction ledger benchmark
+
+Metrics:
+-------------------
+(1) Transfers/sec for a Python loop over update_balance (no checks)
+(2) Transfers/sec for one apply_transfers batch (with unknown/amount/frozen/overdraft checks)
+(3) Share of rows accepted
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_ledger [num_transfers]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from src.utils.array_env import ArrayFraudEnv
+from src.utils.env_generator import generate_environment
+from src.utils.fraud_env import FraudEnv
+
+num_transfers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+backends = {
+    "networkx": lambda: FraudEnv(verbose=False),
+    "array": lambda: ArrayFraudEnv(),
+}
+
+print(f"{'backend':>9} {'loop/s':>10} {'batch/s':>10} {'accepted':>9}")
+for name, make_env in backends.items():
+    env = generate_environment(num_individuals=50_000, num_organizations=1_000, seed=0, env=make_env())
+    accounts = np.array(env.get_acc(), dtype=object)
+    rng = np.random.default_rng(0)
+    acc_from = accounts[rng.integers(0, len(accounts), num_transfers)].tolist()
+    acc_to = accounts[rng.integers(0, len(accounts), num_transfers)].tolist()
+    amounts = np.round(rng.lognormal(np.log(500), 1.0, num_transfers), 2)
+
+    start = time.perf_counter()
+    for f, t, a in zip(acc_from, acc_to, amounts.tolist()):
+        env.update_balance(f, t, a)
+    loop_rate = num_transfers / (time.perf_counter() - start)
+
+    env = generate_environment(num_individuals=50_000, num_organizations=1_000, seed=0, env=make_env())
+    start = time.perf_counter()
+    codes = env.apply_transfers(acc_from, acc_to, amounts)
+    batch_rate = num_transfers / (time.perf_counter() - start)
+
+    print(f"{name:>9} {loop_rate:>10.0f} {batch_rate:>10.0f} {np.mean(codes == 0):>9.1%}")
@@ -0,0 +1,48 @@
+"""
+Legit prompt size benchmark: full entity lists vs a sampled neighborhood
+
+Metrics:
+-------------------
+(1) Estimated prompt tokens per legit prompt
+(2) Time to build one legit prompt
+(3) Seconds per legit model call against the fake Ollama server, whose
+    prefill time grows with prompt length, and the prompt_eval_count it reports
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_legit_prompt [neighborhood_k]
+"""
+
+import statistics
+import sys
+import time
+
+import src.llmplanner as llmplanner
+from src.utils.env_generator import generate_environment
+from src.utils.fake_ollama import FakeOllamaServer
+from src.utils.llm_backend import OllamaBackend
+
+k = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+num_prompts = 20
+num_calls = 5
+prompt_token_latency = 20e-6   # 20 us of prefill per prompt word
+
+print(f"{'individuals':>11} {'mode':>8} {'est tokens':>11} {'build ms':>9} {'call s':>8} {'prompt_eval':>12}")
+for n in (1_000, 10_000, 100_000):
+    env = generate_environment(num_individuals=n, num_organizations=n // 20, seed=0)
+    with FakeOllamaServer(prompt_token_latency=prompt_token_latency) as server:
+        for mode, neighborhood in (("full", None), (f"k={k}", k)):
+            backend = OllamaBackend(host=server.url)
+            planner = llmplanner.LLMPlanner(env, backend=backend, legit_neighborhood=neighborhood)
+
+            start = time.perf_counter()
+            prompts = [planner.legit_prompt() for _ in range(num_prompts)]
+            build_ms = (time.perf_counter() - start) / num_prompts * 1e3
+
+            start = time.perf_counter()
+            for prompt in prompts[:num_calls]:
+                planner.call_model(prompt)
+            call_s = (time.perf_counter() - start) / num_calls
+
+            tokens = statistics.mean(planner.prompt_tokens["legit"])
+            prompt_eval = backend.metrics.summary()["prompt_tokens"] / num_calls
+            print(f"{n:>11} {mode:>8} {tokens:>11.0f} {build_ms:>9.2f} {call_s:>8.3f} {prompt_eval:>12.0f}")
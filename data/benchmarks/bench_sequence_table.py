@@ -0,0 +1,73 @@
+"""
+Sequence table benchmark: per-string Python loops vs one columnar parse
+
+Builds n sequences by recombining the real steps of the test coev corpora
+and times the work the similarity and detector code does on them, first
+the old way (string surgery / RuleScorer.features per sequence), then
+through one sequence_table.
+
+Metrics:
+-------------------
+(1) Seconds to build the table
+(2) Description-stripped text for the embedding checks: the old
+    split-on-commas loop vs sequence_table.joined_text(strip=True)
+(3) RuleScorer features: per sequence vs RuleScorer.features_table
+(4) Both paths agree (features exactly)
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_sequence_table [n]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import src.utils.fraud_env as fraud_env
+import src.utils.sequence_table as sequence_table
+from src.rule_detector import FEATURE_WEIGHTS, RuleScorer
+from src.utils.coev_io import iter_coev
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+rng = np.random.default_rng(0)
+
+steps = sorted({step for path in ("data/test/coev_seq_v1.json", "data/test/coev_seq_v2.json")
+                for __, __, sequence in iter_coev(path) for step in sequence})
+lengths = rng.integers(3, 9, n)
+picks = rng.integers(0, len(steps), lengths.sum())
+bounds = np.r_[0, np.cumsum(lengths)]
+sequences = [[steps[k] for k in picks[bounds[i]:bounds[i + 1]]] for i in range(n)]
+scorer = RuleScorer(fraud_env.FraudEnv(verbose=False).create_environment())
+
+
+def old_strip(seq):
+    # the loop sim_check2 / sim_check3 used before the table
+    desc_removed = ""
+    for act in seq:
+        if act.startswith("action("):
+            desc_removed += ",".join(act.split(",")[:-1]) + ")" + ", "
+        else:
+            desc_removed += act
+    return desc_removed
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+table, table_s = timed(lambda: sequence_table.from_sequences(sequences))
+print(f"{n} sequences, {len(table)} steps ({len(steps)} distinct), table built in {table_s:.2f} s, "
+      f"{table.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+
+__, loop_s = timed(lambda: [old_strip(s) for s in sequences])
+__, col_s = timed(lambda: sequence_table.joined_text(table, strip=True))
+print(f"stripped text   loop {loop_s:>6.2f} s   table {col_s:>6.2f} s")
+
+loop_features, loop_s = timed(lambda: [scorer.features(s) for s in sequences])
+col_features, col_s = timed(lambda: scorer.features_table(table, n))
+print(f"rule features   loop {loop_s:>6.2f} s   table {col_s:>6.2f} s")
+
+same = np.array_equal(np.array([[f[name] for name in FEATURE_WEIGHTS] for f in loop_features]), col_features.to_numpy())
+print(f"features identical: {same}")
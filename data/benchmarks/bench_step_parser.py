@@ -0,0 +1,102 @@
+"""
+Step parser micro-benchmark over the data/test corpora
+
+Metrics:
+-------------------
+(1) Steps/sec for the old str.split parser vs step_parser.parse_step:
+    uncached (parse_step.__wrapped__) on the corpus steps, which take the
+    split fast path, and on the same steps with quoted descriptions, which
+    take the quoting-aware path; then memoized, as callers see it
+(2) Sequences/sec for validate_syntax + validate_semantic, parsing each
+    step twice without the memo (old behaviour) vs once through the shared
+    parsed cache
+(3) Number of steps the two parsers disagree on
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_step_parser [repeats]
+"""
+
+import contextlib
+import io
+import sys
+import time
+
+import src.llmplanner as llmplanner
+import src.utils.fraud_env as fraud_env
+import src.utils.step_parser as step_parser
+from src.utils.coev_io import iter_coev
+
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+corpora = ["data/test/coev_seq_v1.json", "data/test/coev_seq_v2.json"]
+
+
+def old_parse_step(step):
+    """
+    The str.split parser UniversalRulesValidator.parse_step used before step_parser.
+    """
+    step = step.strip()
+    if step.startswith('action('):
+        parts = [x.strip() for x in step[7:-1].split(",")]
+        if len(parts) != 5:
+            return 'invalid', {}
+        return 'action', dict(zip(step_parser.ACTION_FIELDS, parts))
+    elif step.startswith('transaction('):
+        parts = [p.strip() for p in step[12:-1].split(',')]
+        if len(parts) != 4:
+            return 'invalid', {}
+        try:
+            amount = float(parts[3])
+        except ValueError:
+            return 'invalid', {}
+        return 'transaction', {'from_account': parts[0], 'payment_type': parts[1],
+                               'to_account': parts[2], 'amount': amount}
+    return 'invalid', {}
+
+
+def rate(fn, items, runs=5):
+    # best of several runs, timings on a shared machine are noisy
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for item in items:
+                fn(item)
+        best = min(best, time.perf_counter() - start)
+    return repeats * len(items) / best
+
+
+def quoted(step):
+    parsed = step_parser.parse_step(step)
+    if parsed.kind != "action":
+        return step
+    return step_parser.format_step("action", {**parsed.data, "details": parsed.data["details"] + ", quoted"})
+
+
+with contextlib.redirect_stdout(io.StringIO()):
+    env = fraud_env.FraudEnv().create_environment()
+validator = llmplanner.LLMPlanner(env, backend=object()).pv
+
+for path in corpora:
+    sequences = [seq for _, _, seq in iter_coev(path)]
+    steps = [step for seq in sequences for step in seq]
+
+    quoted_steps = [quoted(s) for s in steps]
+    uncached = step_parser.parse_step.__wrapped__
+
+    disagree = sum(old_parse_step(s)[0] != step_parser.parse_step(s).kind for s in steps)
+
+    def validate_twice(seq):
+        validator._local.last_parsed = None
+        validator.validate_syntax(seq, [uncached(s) for s in seq])
+        validator.validate_semantic(seq, [uncached(s) for s in seq])
+
+    def validate_once(seq):
+        validator._local.last_parsed = None
+        validator.validate_syntax(seq)
+        validator.validate_semantic(seq)
+
+    print(path)
+    print(f"  parse  old {rate(old_parse_step, steps):>10.0f} steps/s   new {rate(uncached, steps):>10.0f} steps/s"
+          f"   quoted {rate(uncached, quoted_steps):>10.0f} steps/s   memoized {rate(step_parser.parse_step, steps):>10.0f} steps/s"
+          f"   kind differs on {disagree}/{len(steps)}")
+    print(f"  validate parse x2 {rate(validate_twice, sequences):>8.0f} seq/s   parse x1 {rate(validate_once, sequences):>8.0f} seq/s")
@@ -0,0 +1,62 @@
+"""
+Streaming early-abort benchmark for the planner repair loop
+
+Runs against the in-process fake Ollama server. The first attempt for every
+prompt returns a long sequence whose second step is invalid, the repair
+attempt returns a valid one, so both modes need two attempts per sequence.
+
+Metrics:
+-------------------
+(1) Wall time per valid fraud sequence, buffered vs streaming planner
+(2) Tokens the server generated (the streamed first attempt is cancelled at step 1)
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_stream_abort
+"""
+
+import contextlib
+import io
+import json
+import time
+
+import src.llmplanner as llmplanner
+import src.utils.fraud_env as fraud_env
+from src.utils.fake_ollama import FakeOllamaServer, default_responder
+from src.utils.llm_backend import OllamaBackend
+
+num_seq = 10
+token_latency = 0.002
+
+
+def responder(request):
+    prompt = request["prompt"]
+    if "ERRORS" in prompt:
+        return default_responder(request)
+
+    # first attempt: an account making a phone call at step 1, then filler steps
+    valid = json.loads(default_responder(request))["sequence"]
+    victim_acc = valid[-1].split("(")[1].split(",")[0]
+    victim = valid[1].split("(")[1].split(",")[0]
+    filler = [f"action({victim}, reviewed statement, {victim}, app, checked the balance and the recent transactions again {k})"
+              for k in range(8)]
+    return json.dumps({"sequence": [valid[0], f"action({victim_acc}, called, {victim}, phone, asked for the otp)",
+                                    *filler, valid[-1]]}, indent=2)
+
+
+env = fraud_env.FraudEnv(verbose=False).create_environment()
+
+print(f"{'mode':>9} {'s/seq':>8} {'tokens':>8} {'attempts':>9}")
+for stream in (False, True):
+    with FakeOllamaServer(responder=responder, token_latency=token_latency) as server:
+        planner = llmplanner.LLMPlanner(env, backend=OllamaBackend(host=server.url), stream=stream)
+        attempts = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(num_seq):
+                sequence, n, _, _ = planner.generate_valid_fraud_seq(max_attempts=3)
+                assert sequence is not None
+                attempts += n
+        elapsed = time.perf_counter() - start
+        time.sleep(0.1)   # let cancelled server threads notice the disconnect
+        mode = "stream" if stream else "buffered"
+        print(f"{mode:>9} {elapsed / num_seq:>8.3f} {server.tokens_generated:>8} {attempts:>9}")
@@ -0,0 +1,100 @@
+"""
+Structural MinHash benchmark: diversity and duplicate clusters at corpus scale
+
+Builds n synthetic sequences by recombining real steps of the test coev
+corpora (3-8 steps, half of them copies of an earlier sequence with one
+step swapped, so there are near-duplicates to find), then times the
+model-free structural path end to end on one CPU.
+
+Metrics:
+-------------------
+(1) Seconds for signatures, diversity and duplicate clusters
+(2) Estimation error: MinHash Jaccard vs exact Jaccard of the shingle
+    sets on 1000 random pairs and 5000 copy pairs (mean absolute error)
+(3) Cluster recall: sampled pairs with exact Jaccard >= threshold that
+    end up in the same cluster
+(4) Cluster tightness: exact Jaccard of random pairs inside a cluster
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_structural_minhash [n]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import src.utils.fraud_env as fraud_env
+import src.utils.pydantic_validator as pydantic_validator
+from src.utils.coev_io import iter_coev
+from src.utils.structural_minhash import StructuralMinHash
+
+n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+threshold = 0.8
+rng = np.random.default_rng(0)
+
+env = fraud_env.FraudEnv(verbose=False).create_environment()
+mh = StructuralMinHash(pydantic_validator.build_entity_registry(env))
+
+steps = sorted({step for path in ("data/test/coev_seq_v1.json", "data/test/coev_seq_v2.json")
+                for __, __, sequence in iter_coev(path) for step in sequence})
+print(f"{len(steps)} distinct real steps, building {n} sequences")
+
+lengths = rng.integers(3, 9, n)
+picks = rng.integers(0, len(steps), lengths.sum())
+bounds = np.r_[0, np.cumsum(lengths)]
+sequences = [[steps[k] for k in picks[bounds[i]:bounds[i + 1]]] for i in range(n)]
+sources = rng.integers(0, n // 2, n - n // 2)
+for i, source in zip(range(n // 2, n), sources):
+    copy = list(sequences[source])
+    copy[rng.integers(0, len(copy))] = steps[rng.integers(0, len(steps))]
+    sequences[i] = copy
+
+start = time.perf_counter()
+signatures = mh.signatures(sequences)
+sig_s = time.perf_counter() - start
+
+start = time.perf_counter()
+diversity = mh.diversity(signatures)
+div_s = time.perf_counter() - start
+
+start = time.perf_counter()
+dc = mh.duplicate_clusters(signatures, threshold=threshold)
+clu_s = time.perf_counter() - start
+
+print(f"signatures        {sig_s:>7.2f} s")
+print(f"diversity         {div_s:>7.2f} s   ({diversity:.3f})")
+print(f"duplicate clusters{clu_s:>7.2f} s   ({len(dc.clusters)} clusters, "
+      f"{sum(len(c) for c in dc.clusters)} sequences)")
+print(f"total             {sig_s + div_s + clu_s:>7.2f} s")
+
+
+def shingles(sequence):
+    skeleton = mh.skeleton(sequence)
+    return set(skeleton) | set(zip(skeleton, skeleton[1:]))
+
+
+def exact(a, b):
+    sa, sb = shingles(sequences[a]), shingles(sequences[b])
+    return len(sa & sb) / len(sa | sb)
+
+
+# random pairs are mostly dissimilar, planted copies cover the high range
+pairs = [(int(a), int(b)) for a, b in rng.integers(0, n, (1000, 2)) if a != b]
+copies = rng.integers(n // 2, n, 5000)
+pairs += [(int(sources[i - n // 2]), int(i)) for i in copies]
+est = np.array([mh.jaccard(signatures[a], signatures[b]) for a, b in pairs])
+ref = np.array([exact(a, b) for a, b in pairs])
+print(f"Jaccard MAE over {len(pairs)} pairs: {np.abs(est - ref).mean():.4f} (max {np.abs(est - ref).max():.3f})")
+
+near = [(a, b) for (a, b), r in zip(pairs, ref) if r >= threshold]
+recall = np.mean([dc.labels[a] == dc.labels[b] for a, b in near])
+print(f"recall: {recall:.3f} of {len(near)} sampled pairs with exact Jaccard >= {threshold} share a cluster")
+
+linked = []
+for cluster in dc.clusters[:1000]:
+    a, b = rng.choice(cluster, 2, replace=False)
+    linked.append(exact(int(a), int(b)))
+linked = np.array(linked)
+print(f"same-cluster pairs: mean exact Jaccard {linked.mean():.3f}, {np.mean(linked >= threshold):.3f} "
+      f">= {threshold} (clusters are transitive, so members can be further apart than the threshold)")
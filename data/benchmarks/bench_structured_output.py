@@ -0,0 +1,88 @@
+"""
+Structured output (Ollama `format` schema) vs free-text JSON benchmark
+
+Runs against the in-process fake Ollama server with a responder that
+imitates the model's typical failures. Free-text responses are malformed
+with probability p_format (unquoted comma in a description, a step broken
+across lines, or a truncated closing bracket that repair_json recovers),
+something constrained decoding rules out. With probability p_semantic both
+modes get a semantic error (an account placing a phone call) that a schema
+cannot prevent.
+
+Metrics:
+-------------------
+(1) Attempts per valid fraud sequence, split into syntax / semantic failures
+(2) Wall time per valid sequence at a fixed per-token generation latency
+
+Usage (from repo root):
+    python -m data.benchmarks.bench_structured_output [num_seq]
+"""
+
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+
+import src.llmplanner as llmplanner
+import src.utils.fraud_env as fraud_env
+import src.utils.step_parser as step_parser
+from src.utils.fake_ollama import FakeOllamaServer, default_responder
+from src.utils.llm_backend import OllamaBackend
+
+num_seq = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+p_format = 0.4
+p_semantic = 0.15
+token_latency = 0.001
+rng = random.Random(0)   # the model samples: a repeated prompt can fail differently
+
+
+def responder(request):
+    roll = rng.random()
+    steps = [step_parser.parse_step(s) for s in json.loads(default_responder(request))["sequence"]]
+    steps = [{"kind": s.kind, **s.data} for s in steps]
+
+    if roll < p_semantic:
+        acc = steps[-1]["from_account"]
+        steps.insert(1, {"kind": "action", "subject": acc, "action_type": "called",
+                         "object": steps[0]["object"], "channel": "phone", "details": "asked for the code"})
+    steps[0]["details"] += ", then asked to verify the account"
+
+    if isinstance(request.get("format"), dict):
+        # constrained decoding: always well-formed objects
+        return json.dumps({"sequence": steps})
+
+    lines = [step_parser.format_step(s["kind"], s).replace('"', "") for s in steps]   # model does not quote
+    format_roll = rng.random()
+    if format_roll >= p_format or int(format_roll / p_format * 3) != 0:
+        lines[0] = lines[0].replace(", then asked", " then asked")
+    if format_roll >= p_format:
+        return json.dumps({"sequence": lines}, indent=2)
+
+    defect = int(format_roll / p_format * 3)
+    if defect == 1:
+        head, tail = lines[1].split(", ", 1)
+        lines[1:2] = [head, tail]                  # step broken across two strings
+    elif defect == 2:
+        return json.dumps({"sequence": lines}, indent=2)[:-4]   # cut off before the closing bracket
+    return json.dumps({"sequence": lines}, indent=2)    # defect 0: unquoted comma in a description
+
+
+env = fraud_env.FraudEnv(verbose=False).create_environment()
+
+print(f"{'mode':>11} {'attempts/seq':>13} {'syntax':>7} {'semantic':>9} {'failed':>7} {'s/seq':>7}")
+for structured in (False, True):
+    rng.seed(0)
+    with FakeOllamaServer(responder=responder, token_latency=token_latency) as server:
+        planner = llmplanner.LLMPlanner(env, backend=OllamaBackend(host=server.url), structured=structured)
+        attempts = syntax = semantic = failed = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(num_seq):
+                sequence, n, nsyn, nsem = planner.generate_valid_fraud_seq(max_attempts=10)
+                attempts, syntax, semantic = attempts + n, syntax + nsyn, semantic + nsem
+                failed += sequence is None
+        elapsed = time.perf_counter() - start
+        mode = "structured" if structured else "free text"
+        print(f"{mode:>11} {attempts / num_seq:>13.2f} {syntax:>7} {semantic:>9} {failed:>7} {elapsed / num_seq:>7.3f}")
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import src.llmplanner as llmplanner
+import src.utils.llm_backend as llm_backend
+import src.utils.response_cache as response_cache
+import src.utils.rate_limit as rate_limit
+import src.utils.stateful_validator as stateful_validator
+
+
+class AsyncLLMPlanner(llmplanner.LLMPlanner):
+    """
+    LLMPlanner that keeps several repair loops in flight at once.
+
+    Each repair loop is the same prompt -> validate -> re-prompt cycle as
+    LLMPlanner.generate_valid_fraud_seq, but every attempt (model call and
+    validation) runs on a worker thread and is awaited, so the event loop can
+    interleave up to `concurrency` loops against Ollama.
+
+    planner_kwargs (stream, structured, dedup, legit_neighborhood, ...) are
+    passed on to LLMPlanner. request_timeout is the timeout of the default
+    backend; a backend passed in keeps its own. Call close() when done.
+    """
+
+    def __init__(self, env, concurrency=4, request_timeout=120, backend=None, **planner_kwargs):
+        super().__init__(env, backend or llm_backend.OllamaBackend(
+            timeout=request_timeout, pool_size=concurrency, cache=response_cache.get_default_cache(),
+            controller=rate_limit.get_default_controller(), latency_class="planner"
+        ), **planner_kwargs)
+        self.concurrency = concurrency
+        self.request_timeout = request_timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+
+    @property
+    def sv(self):
+        # StatefulValidator keeps the state of the sequence being checked, so
+        # every worker thread validates with its own
+        local = self._sv_local
+        if not hasattr(local, "sv"):
+            local.sv = stateful_validator.StatefulValidator(self.env, self.pv)
+        return local.sv
+
+
+    @sv.setter
+    def sv(self, value):
+        self._sv_local = threading.local()
+        self._sv_local.sv = value
+
+
+    def close(self):
+        """
+        Shuts down the worker threads, waiting for attempts still running.
+        """
+        self._executor.shutdown(wait=True)
+
+
+    async def aattempt(self, prompt, semantic=True):
+        """
+        Awaitable LLMPlanner.attempt, so structured and stream apply here too.
+
+        Returns:
+            (sequence, error_msg, error_kind) as in attempt, or None if the
+            request failed or timed out
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self.attempt, prompt, semantic)
+        except requests.RequestException as e:
+            print(f"Model call failed: {type(e).__name__}: {e}")
+            return None
+
+
+    async def _repair_loop(self, prompt, max_attempts, semantic) -> tuple:
+        """
+        Async repair loop shared by fraud and legit generation.
+
+        Returns:
+            (sequence, attempts, num_syntax_errors, num_semantic_errors)
+        """
+        error_msg = ""
+        attempts = 0
+        num_syntax_errors = 0
+        num_semantic_errors = 0
+
+        while attempts < max_attempts:
+            attempts += 1
+
+            result = await self.aattempt(prompt + error_msg, semantic)
+            if result is None:
+                # timeouts/network errors burn an attempt but keep the last correction
+                continue
+
+            sequence, error_msg, error_kind = result
+
+            if error_kind == "syntax":
+                num_syntax_errors += 1
+                continue
+
+            if error_kind == "semantic":
+                num_semantic_errors += 1
+                continue
+
+            if error_kind == "duplicate":
+                continue
+
+            print(f"✓ VALID SEQUENCE FOUND after {attempts} attempts")
+            return sequence, attempts, num_syntax_errors, num_semantic_errors
+
+        return None, attempts, num_syntax_errors, num_semantic_errors
+
+
+    async def agenerate_valid_fraud_seq(self, max_attempts=15) -> tuple:
+        return await self._repair_loop(self.fraud_prompt(), max_attempts, semantic=True)
+
+
+    async def agenerate_valid_legit_seq(self, max_attempts=10) -> tuple:
+        return await self._repair_loop(self.legit_prompt(), max_attempts, semantic=False)
+
+
+    async def agenerate_many(self, labels, max_attempts=15) -> list:
+        """
+        Runs one repair loop per label, at most `concurrency` at a time.
+
+        Args:
+            labels: list of "fraud" / "legit"
+            max_attempts: attempts per repair loop
+        Returns:
+            list of (sequence, attempts, num_syntax_errors, num_semantic_errors),
+            in the same order as labels
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(label):
+            async with semaphore:
+                if label == "fraud":
+                    return await self.agenerate_valid_fraud_seq(max_attempts)
+                return await self.agenerate_valid_legit_seq(max_attempts)
+
+        return await asyncio.gather(*(run_one(label) for label in labels))
+
+
+    def generate_many(self, labels, max_attempts=15) -> list:
+        """
+        Blocking wrapper around agenerate_many for scripts.
+        """
+        return asyncio.run(self.agenerate_many(labels, max_attempts))
+
+
+def main():
+    import src.utils.fraud_env as fraud_env
+
+    env = fraud_env.FraudEnv().create_environment()
+    planner = AsyncLLMPlanner(env, concurrency=4)
+    try:
+        for res in planner.generate_many(["fraud", "fraud", "legit", "legit"], max_attempts=5):
+            print(res)
+    finally:
+        planner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Co-evolution Runner - planner vs detector rounds
+Alternates generation rounds from LLMPlanner with evaluation rounds from
+LLMDetector. Detection of round k runs on a background thread while round
+k+1 is generated, and every fraud sequence the detector labels legit is
+pushed into planner.evasions as soon as it is found, so the fraud prompts
+of the round being generated already show it.
+
+Per-round throughput and accuracy go to a columnar results file (parquet,
+or CSV when no parquet engine is installed); the sequences themselves are
+appended to a JSONL log readable with coev_io.iter_coev.
+
+Usage (from repo root):
+    python -m src.coevolution --rounds 5 --per-round 8
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import pandas as pd
+
+import src.llmdetector as llmdetector
+import src.llmplanner as llmplanner
+import src.utils.blocked_similarity as blocked_similarity
+import src.utils.coev_io as coev_io
+import src.utils.fraud_env as fraud_env
+import src.utils.sequence_table as sequence_table
+
+
+def write_results(df: pd.DataFrame, path: str) -> str:
+    """
+    Writes the per-round table as parquet, or as CSV next to it
+    (same name, .csv suffix) if pandas has no parquet engine.
+
+    Returns:
+        path actually written
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        df.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        df.to_csv(csv_path, index=False)
+        return csv_path
+
+
+class CoevolutionRunner:
+    """
+    Args:
+        planner: LLMPlanner generating the sequences
+        detector: LLMDetector classifying them
+        seqs_per_round: sequences generated per round
+        fraud_fraction: share of fraud sequences in each round
+        max_attempts: repair attempts per generated sequence
+        num_votes: detector ensemble votes per sequence
+        results_path: per-round results file (.parquet)
+        sequences_path: JSONL log of every generated sequence, None to skip
+        pipeline: overlap detection of round k with generation of round k+1
+        diversity_store: EmbeddingStore; if set, each round records the mean pairwise
+            similarity of all fraud sequences so far, encoding only the new ones
+        seed: seed for the per-round label draw
+    """
+
+    def __init__(self, planner, detector, seqs_per_round: int = 8, fraud_fraction: float = 0.5,
+                 max_attempts: int = 5, num_votes: int = 5,
+                 results_path: str = "data/coev/coevolution_rounds.parquet",
+                 sequences_path: Optional[str] = "data/coev/coevolution_sequences.jsonl",
+                 pipeline: bool = True, diversity_store=None, seed: Optional[int] = None):
+        self.planner = planner
+        self.detector = detector
+        self.seqs_per_round = seqs_per_round
+        self.fraud_fraction = fraud_fraction
+        self.max_attempts = max_attempts
+        self.num_votes = num_votes
+        self.results_path = results_path
+        self.sequences_path = sequences_path
+        self.pipeline = pipeline
+        self.diversity_store = diversity_store
+        self.fraud_texts: List[str] = []
+        self.rng = random.Random(seed)
+        self.rows: List[dict] = []
+        self._next_id = 0
+
+    def generate_round(self, k: int) -> tuple:
+        """
+        Generates one round of sequences with the planner.
+
+        Returns:
+            (records, stats): records are {"id", "round", "label", "sequence"} dicts
+        """
+        num_fraud = round(self.seqs_per_round * self.fraud_fraction)
+        labels = ["fraud"] * num_fraud + ["legit"] * (self.seqs_per_round - num_fraud)
+        self.rng.shuffle(labels)
+
+        records = []
+        attempts = failed = with_feedback = 0
+        start = time.perf_counter()
+        for label in labels:
+            if label == "fraud":
+                # with pipelining, evasions from the round being detected arrive mid-round
+                with_feedback += bool(self.planner.evasions)
+                seq, n, __, __ = self.planner.generate_valid_fraud_seq(self.max_attempts)
+                attempts += n
+            else:
+                seq = self.planner.generate_valid_legit_seq(self.max_attempts)
+            if not seq:
+                failed += 1
+                continue
+            records.append({"id": self._next_id, "round": k, "label": label, "sequence": seq["sequence"]})
+            self._next_id += 1
+        elapsed = time.perf_counter() - start
+
+        return records, {
+            "generated": len(records),
+            "failed_generations": failed,
+            "fraud_attempts": attempts,
+            "fraud_prompts_with_feedback": with_feedback,
+            "gen_seconds": elapsed,
+            "gen_seq_per_s": len(records) / elapsed if elapsed else 0.0,
+        }
+
+    def detect_round(self, records: List[dict]) -> dict:
+        """
+        Classifies one round with the detector. False negatives are added to
+        planner.evasions immediately.
+
+        Returns:
+            detection stats for the round
+        """
+        correct = false_pos = false_neg = unclassifiable = escalated = 0
+        start = time.perf_counter()
+        # one table per round, so the prefilter parses and scores all of it in one pass
+        table = sequence_table.from_sequences([record["sequence"] for record in records])
+        results = self.detector.cascade_classify_table(table, len(records), num_calls=self.num_votes)
+        for record, (winner, source, __, __, __) in zip(records, results):
+            escalated += source == "llm"
+            record["prediction"] = winner
+            if winner == record["label"]:
+                correct += 1
+            elif winner is None:
+                unclassifiable += 1
+            elif winner == "fraud":
+                false_pos += 1
+            else:
+                false_neg += 1
+                self.planner.evasions.append(record["sequence"])
+        elapsed = time.perf_counter() - start
+
+        n = len(records) or 1
+        return {
+            "accuracy": correct / n,
+            "false_positive": false_pos / n,
+            "false_negative": false_neg / n,
+            "unclassifiable": unclassifiable / n,
+            "escalated": escalated / n,
+            "detect_seconds": elapsed,
+            "detect_seq_per_s": len(records) / elapsed if elapsed else 0.0,
+        }
+
+    def _finish_round(self, k: int, records: List[dict], gen_stats: dict, detect_stats: dict,
+                      wall: float, log) -> dict:
+        if log is not None:
+            for record in records:
+                log.append(record["id"], record["label"], record["sequence"],
+                           round=k, prediction=record.get("prediction"))
+        row = {"round": k, **gen_stats, **detect_stats, "wall_seconds": wall}
+        if self.diversity_store is not None:
+            self.fraud_texts += [", ".join(r["sequence"]) for r in records if r["label"] == "fraud"]
+            if len(self.fraud_texts) > 1:
+                row["fraud_similarity"] = blocked_similarity.mean_similarity(
+                    self.diversity_store.encode(self.fraud_texts), normalized=True)
+        self.rows.append(row)
+        written = write_results(pd.DataFrame(self.rows), self.results_path)
+        print(f"Round {k}: {gen_stats['generated']} sequences, accuracy {detect_stats['accuracy']:.2f}, "
+              f"false negatives {detect_stats['false_negative']:.2f} -> {written}")
+        return row
+
+    def run(self, num_rounds: int) -> pd.DataFrame:
+        """
+        Runs num_rounds generation + detection rounds.
+
+        Returns:
+            DataFrame with one row of throughput and accuracy stats per round
+        """
+        log = None
+        if self.sequences_path:
+            os.makedirs(os.path.dirname(self.sequences_path) or ".", exist_ok=True)
+            log = coev_io.CoevLog(self.sequences_path)
+            # the log is appended to across runs, continue its ids instead of restarting at 0
+            self._next_id = max(self._next_id, coev_io.next_free_id(self.sequences_path))
+        executor = ThreadPoolExecutor(max_workers=1) if self.pipeline else None
+        try:
+            round_start = time.perf_counter()
+            records, gen_stats = self.generate_round(0)
+            for k in range(num_rounds):
+                if executor is None:
+                    detect_stats = self.detect_round(records)
+                    upcoming = self.generate_round(k + 1) if k + 1 < num_rounds else None
+                else:
+                    detection = executor.submit(self.detect_round, records)
+                    upcoming = self.generate_round(k + 1) if k + 1 < num_rounds else None
+                    detect_stats = detection.result()
+
+                now = time.perf_counter()
+                self._finish_round(k, records, gen_stats, detect_stats, now - round_start, log)
+                round_start = now
+                if upcoming is not None:
+                    records, gen_stats = upcoming
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if log is not None:
+                log.close()
+            # the detector's vote threads are restarted if run is called again
+            self.detector.close()
+        return pd.DataFrame(self.rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run planner vs detector co-evolution rounds")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--per-round", type=int, default=8)
+    parser.add_argument("--fraud-fraction", type=float, default=0.5)
+    parser.add_argument("--model", default="llama3.2", help="detector model")
+    parser.add_argument("--results", default="data/coev/coevolution_rounds.parquet")
+    parser.add_argument("--sequences", default="data/coev/coevolution_sequences.jsonl")
+    parser.add_argument("--no-pipeline", action="store_true", help="run detection and generation one after the other")
+    args = parser.parse_args()
+
+    env = fraud_env.FraudEnv().create_environment()
+    runner = CoevolutionRunner(
+        llmplanner.LLMPlanner(env),
+        llmdetector.LLMDetector(None, args.model),
+        seqs_per_round=args.per_round,
+        fraud_fraction=args.fraud_fraction,
+        results_path=args.results,
+        sequences_path=args.sequences,
+        pipeline=not args.no_pipeline,
+    )
+    print(runner.run(args.rounds))
@@ -0,0 +1,172 @@
+"""
+Embedding Detector - trained linear baseline behind the LLMDetector interface
+Logistic regression on all-MiniLM-L6-v2 sentence embeddings (the model
+similarity_check uses) plus RuleScorer's structural features, trained on
+labelled coev datasets. Classifies thousands of sequences per second on CPU
+once the embeddings are computed; the sentence-transformers model is only
+loaded on the first encode, and an EmbeddingStore avoids re-encoding
+sequences seen before.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import src.llmdetector as llmdetector
+import src.utils.embedding_store as embedding_store
+import src.utils.llm_backend as llm_backend
+import src.utils.sequence_table as sequence_table
+from src.rule_detector import FEATURE_WEIGHTS, RuleScorer
+from src.utils.coev_io import iter_coev
+
+# batches at least this large are featurized through a sequence_table
+_TABLE_MIN_SEQUENCES = 32
+
+# run_detector output, kept apart from the LLM ensemble's CSVs it is compared against
+ERRORS_PATH = "data/detector/embedding/detector_errors_embedding.csv"
+RESULTS_PATH = "data/detector/embedding/detector_res_embedding.csv"
+
+
+def split_sequence(seq: str) -> List[str]:
+    """
+    Inverse of the "\\n".join(steps) LLMDetector sends to the model.
+    """
+    return [line.strip() for line in seq.splitlines() if line.strip()]
+
+
+class EmbeddingDetector(llmdetector.LLMDetector):
+    """
+    Args:
+        coev_file_path: dataset classified by run_detector
+        env: FraudEnv for the structural (ownership) features
+        model_name: sentence-transformers model for the embeddings
+        use_embeddings: False trains on structural features only, without loading a model
+        batch_size: sequences per encode batch
+        store: EmbeddingStore to read / add embeddings through, must hold model_name embeddings
+        C: inverse regularisation strength of the logistic regression
+        backend: OllamaBackend, only used by explain_classification
+        prefilter: optional RuleScorer cascade, as in LLMDetector
+        llm_model: Ollama model for explain_classification and the default backend
+        errors_path, results_path: run_detector output CSVs
+    """
+
+    def __init__(self, coev_file_path, env, model_name: str = embedding_store.EMBEDDING_MODEL,
+                 use_embeddings: bool = True, batch_size: int = 64, C: float = 1.0, store=None,
+                 backend=None, prefilter=None, llm_model: str = llm_backend.DEFAULT_MODEL,
+                 errors_path: str = ERRORS_PATH, results_path: str = RESULTS_PATH):
+        super().__init__(coev_file_path, llm_model, backend=backend, max_parallel_votes=1, prefilter=prefilter,
+                         errors_path=errors_path, results_path=results_path)
+        self.embedding_model = model_name
+        self.scorer = RuleScorer(env)
+        self.use_embeddings = use_embeddings
+        self.batch_size = batch_size
+        self.store = store
+        self.classifier = make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=1000, class_weight="balanced"))
+        self.fitted = False
+
+    def structural_features(self, sequences: List[List[str]], table: Optional[pd.DataFrame] = None) -> np.ndarray:
+        """
+        Args:
+            sequences: the sequences, as lists of step strings
+            table: their sequence_table, built here for batches if None
+        Returns: (n, k) float32 matrix of RuleScorer features plus action/transaction counts
+        """
+        n = len(sequences)
+        if table is None and n < _TABLE_MIN_SEQUENCES:
+            # a table costs a few ms of pandas overhead, too much for single classify_sequence calls
+            rows = []
+            for sequence in sequences:
+                features = self.scorer.features(sequence)
+                n_transactions = sum(p.kind == "transaction" for p in self.scorer.validator.parse_sequence(sequence))
+                rows.append([features[name] for name in FEATURE_WEIGHTS] + [len(sequence) - n_transactions, n_transactions])
+            return np.asarray(rows, dtype=np.float32).reshape(n, len(FEATURE_WEIGHTS) + 2)
+
+        table = sequence_table.from_sequences(sequences) if table is None else table
+        features = self.scorer.features_table(table, n)
+        steps = sequence_table.counts_per_sequence(table, n=n)
+        transactions = sequence_table.counts_per_sequence(table, table["kind"] == "transaction", n=n)
+        return np.column_stack([features.to_numpy(), steps - transactions, transactions]).astype(np.float32)
+
+    def featurize(self, sequences: List[List[str]]) -> np.ndarray:
+        """
+        Returns: (n, d) feature matrix, embeddings of ", ".join(steps) followed by structural features
+        """
+        table = sequence_table.from_sequences(sequences) if len(sequences) >= _TABLE_MIN_SEQUENCES else None
+        structural = self.structural_features(sequences, table)
+        if not self.use_embeddings:
+            return structural
+        if table is not None:
+            texts = sequence_table.joined_text(table, n=len(sequences))
+        else:
+            texts = [", ".join(s) for s in sequences]
+        if self.store is not None:
+            embeddings = self.store.encode(texts)
+        else:
+            embeddings = embedding_store.load_model(self.embedding_model).encode(texts, batch_size=self.batch_size,
+                                                                      convert_to_numpy=True, normalize_embeddings=True)
+        return np.hstack([embeddings.astype(np.float32), structural])
+
+    def fit(self, sequences: List[List[str]], labels: List[str]) -> "EmbeddingDetector":
+        """
+        Trains the classifier on labelled sequences ("fraud" / "legit").
+        """
+        y = np.array([label == "fraud" for label in labels], dtype=np.int8)
+        self.classifier.fit(self.featurize(sequences), y)
+        self.fitted = True
+        return self
+
+    def fit_files(self, paths: Iterable[str]) -> "EmbeddingDetector":
+        """
+        Trains on every labelled sequence of the given coev JSON/JSONL files.
+        """
+        records = [(label, sequence) for path in paths for __, label, sequence in iter_coev(path)]
+        return self.fit([sequence for __, sequence in records], [label for label, __ in records])
+
+    def predict_proba(self, sequences: List[List[str]]) -> np.ndarray:
+        """
+        Returns: fraud probability per sequence
+        """
+        if not self.fitted:
+            raise RuntimeError("EmbeddingDetector is not trained, call fit or fit_files first")
+        return self.classifier.predict_proba(self.featurize(sequences))[:, 1]
+
+    def classify_many(self, sequences: List[List[str]]) -> List[str]:
+        """
+        Batch classification, the fast path for large datasets.
+        """
+        return ["fraud" if p >= 0.5 else "legit" for p in self.predict_proba(sequences)]
+
+    def classify_sequence(self, seq: str, max_attempts: int = 5, timeout_s: int = 60) -> Optional[str]:
+        """
+        Same interface as LLMDetector.classify_sequence: seq is the
+        newline-joined sequence. max_attempts and timeout_s are ignored.
+        """
+        return self.classify_many([split_sequence(seq)])[0]
+
+    def ensemble_classify_sequence(self, seq: str, num_calls: int = 5, short_circuit: bool = True) -> Tuple[Optional[str], List[Optional[str]], float, float]:
+        """
+        The classifier is deterministic, so one vote stands for the whole ensemble.
+        """
+        label = self.classify_sequence(seq)
+        return label, [label], 1.0, 1.0
+
+    def cascade_classify_table(self, table: pd.DataFrame, n: Optional[int] = None,
+                               num_calls: int = 5) -> List[Tuple[Optional[str], str, List[Optional[str]], float, float]]:
+        """
+        Same results as LLMDetector.cascade_classify_table, but all escalated
+        sequences go through one classify_many call instead of one call each.
+        num_calls is ignored.
+        """
+        n = sequence_table.num_sequences(table) if n is None else n
+        rule_labels = self.prefilter_table(table, n)
+        escalated = [i for i, label in enumerate(rule_labels) if label is None]
+        results = [(label, "rules", [], 1.0, 1.0) for label in rule_labels]
+        if escalated:
+            sequences = sequence_table.sequences(table, n)
+            for i, label in zip(escalated, self.classify_many([sequences[i] for i in escalated])):
+                results[i] = (label, "llm", [label], 1.0, 1.0)
+        return results
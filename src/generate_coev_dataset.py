@@ -1,37 +1,191 @@
 import src.utils.fraud_env as fraud_env
 import src.llmplanner as llmplanner
+import src.async_planner as async_planner
+import src.utils.coev_io as coev_io
+import src.utils.rate_limit as rate_limit
+import os
 import random
-import json
-import time
+import requests
 
-env_generator = fraud_env.FraudEnv()
-env = env_generator.create_environment()
-planner = llmplanner.LLMPlanner(env)
 
+def resume_log(path, planner):
+    """
+    Reads the checkpoint log at `path` (dropping a torn last line) and seeds
+    planner.dedup, if set, with the sequences already written.
 
-def generate_sequences(env, planner, data_len=4, num_fraud_seq=2):
-    data = {}
-    fraud_ind = random.sample(range(0, data_len), num_fraud_seq)
+    Returns:
+        (sequences per label already in the log, next free sequence id)
+    Raises:
+        ValueError: if path is a JSON dict coev file rather than a JSONL log
+    """
+    # a crash mid-write leaves a torn last line, drop it before reading the checkpoint
+    dropped = coev_io.truncate_partial_line(path)
+    if dropped:
+        print(f"Dropped {dropped} bytes of a partially written record from {path}")
 
-    for i in range(data_len):
-        time.sleep(30)
-        print(f"Sequence {i} ---------------------------------------------")
-        label = "fraud" if i in fraud_ind else "legit"
+    done = {"fraud": 0, "legit": 0}
+    next_id = 0
+    resumed = []
+    for seq_id, label, sequence in coev_io.iter_coev(path) if os.path.exists(path) else []:
+        done[label] = done.get(label, 0) + 1
+        next_id = max(next_id, int(seq_id) + 1)
+        resumed.append((label, sequence))
+    if sum(done.values()):
+        print(f"Resuming from {path}: {done['fraud']} fraud, {done['legit']} legit")
+    if getattr(planner, "dedup", None) is not None:
+        # near-duplicates of sequences from earlier runs are rejected too
+        planner.dedup.add_many([sequence for __, sequence in resumed], labels=[label for label, __ in resumed])
+    return done, next_id
 
-        seq = None
 
-        while not seq:
-            if label == "fraud": seq, __, __, __ = planner.generate_valid_fraud_seq(5)
-            else: seq = planner.generate_valid_legit_seq(5)
+def generate_dataset(env, planner, path, data_len=4, num_fraud_seq=2, max_attempts=5,
+                     max_consecutive_failures=5, rate_limiter=None, fsync_every=16, seed=None):
+    """
+    Generates a labelled dataset into a JSONL checkpoint log, resuming from
+    whatever an earlier (possibly crashed) run already wrote to `path`.
 
-        data[i] = {
-            "label": label,
-            "sequence": seq['sequence']
-        }
-    
-        with open("coev_gen1.csv", 'w') as json_file:
-            json.dump(data, json_file, indent=4)
+    The label of each new sequence is drawn with probability proportional to
+    the fraud/legit sequences still missing, so the run ends on exactly
+    num_fraud_seq fraud sequences. Each sequence gets max_attempts repair
+    attempts. A label that fails max_consecutive_failures generations in a
+    row stops the run instead of retrying forever, and rerunning resumes.
+    With planner.dedup set, the filter is seeded with the resumed sequences.
+
+    Args:
+        env: FraudEnv
+        planner: LLMPlanner
+        path: JSONL file, read with coev_io.iter_coev
+        data_len: total sequences wanted
+        num_fraud_seq: how many of them are fraud
+        max_attempts: repair attempts per generation call
+        max_consecutive_failures: failed generation calls in a row before giving up
+        rate_limiter: AdaptiveRateLimiter pacing calls, defaults to one starting at 1 call/s
+        fsync_every: records between fsyncs of the log
+        seed: seed for the label draw
+    Returns:
+        dict with counts of fraud/legit sequences in the log, calls and failures this run
+    """
+    rng = random.Random(seed)
+    limiter = rate_limiter or rate_limit.AdaptiveRateLimiter()
+
+    done, next_id = resume_log(path, planner)
+    target = {"fraud": num_fraud_seq, "legit": data_len - num_fraud_seq}
+    failures = {"fraud": 0, "legit": 0}
+    stats = {"calls": 0, "failed_calls": 0, "stopped": None}
+
+    with coev_io.CoevLog(path, fsync_every=fsync_every) as log:
+        while True:
+            missing = {label: max(0, target[label] - done[label]) for label in target}
+            if not any(missing.values()):
+                break
+            label = "fraud" if rng.random() * sum(missing.values()) < missing["fraud"] else "legit"
+
+            print(f"Sequence {next_id} ({label}) ---------------------------------------------")
+            limiter.acquire()
+            retries_before = planner.backend.metrics.retries
+            stats["calls"] += 1
+            try:
+                if label == "fraud":
+                    seq, __, __, __ = planner.generate_valid_fraud_seq(max_attempts)
+                else:
+                    seq = planner.generate_valid_legit_seq(max_attempts)
+            except requests.RequestException as e:
+                # retries exhausted inside the backend: the server is overloaded or down
+                print(f"Generation failed: {type(e).__name__}: {e}")
+                seq = None
+                limiter.on_throttle()
+            else:
+                if planner.backend.metrics.retries > retries_before:
+                    limiter.on_throttle()
+                else:
+                    limiter.on_success()
+
+            if not seq:
+                stats["failed_calls"] += 1
+                failures[label] += 1
+                if failures[label] >= max_consecutive_failures:
+                    stats["stopped"] = f"{label} failed {failures[label]} times in a row"
+                    print(f"Stopping: {stats['stopped']}, rerun to resume from {path}")
+                    break
+                continue
+
+            failures[label] = 0
+            log.append(next_id, label, seq['sequence'])
+            done[label] += 1
+            next_id += 1
+
+    stats.update(done)
+    return stats
+
+
+def generate_sequences(env, planner, data_len=4, num_fraud_seq=2, path="coev_gen1.jsonl"):
+    """
+    Generates data_len sequences, num_fraud_seq of them fraud, into the
+    resumable JSONL log at `path` (see generate_dataset).
+    """
+    return generate_dataset(env, planner, path, data_len=data_len, num_fraud_seq=num_fraud_seq)
+
+
+def generate_sequences_concurrent(env, data_len=4, num_fraud_seq=2, concurrency=8, max_attempts=5,
+                                  path="coev_gen1.jsonl", max_failed_waves=5, fsync_every=16, seed=None,
+                                  **planner_kwargs):
+    """
+    Same dataset as generate_sequences, but keeps `concurrency` repair loops
+    in flight against Ollama instead of generating one sequence at a time.
+    Every missing sequence is requested in one wave and each accepted one is
+    appended to the same resumable JSONL log as generate_dataset. The run
+    stops after max_failed_waves waves in a row without a new sequence;
+    rerunning resumes. planner_kwargs go to AsyncLLMPlanner (e.g. dedup,
+    which resume_log seeds with the sequences already in the log).
+
+    Returns:
+        dict with counts of fraud/legit sequences in the log, waves and failed waves this run
+    """
+    rng = random.Random(seed)
+    planner = async_planner.AsyncLLMPlanner(env, concurrency=concurrency, **planner_kwargs)
+    try:
+        done, next_id = resume_log(path, planner)
+        target = {"fraud": num_fraud_seq, "legit": data_len - num_fraud_seq}
+        stats = {"waves": 0, "failed_waves": 0, "stopped": None}
+        failed_in_row = 0
+
+        with coev_io.CoevLog(path, fsync_every=fsync_every) as log:
+            while True:
+                missing = {label: max(0, target[label] - done[label]) for label in target}
+                if not any(missing.values()):
+                    break
+                labels = ["fraud"] * missing["fraud"] + ["legit"] * missing["legit"]
+                rng.shuffle(labels)
+
+                stats["waves"] += 1
+                accepted = 0
+                for label, (seq, __, __, __) in zip(labels, planner.generate_many(labels, max_attempts)):
+                    if seq:
+                        log.append(next_id, label, seq['sequence'])
+                        done[label] += 1
+                        next_id += 1
+                        accepted += 1
+                print(f"{sum(done.values())}/{data_len} sequences generated, {len(labels) - accepted} to retry")
+
+                if accepted:
+                    failed_in_row = 0
+                    continue
+                stats["failed_waves"] += 1
+                failed_in_row += 1
+                if failed_in_row >= max_failed_waves:
+                    stats["stopped"] = f"{failed_in_row} waves in a row produced no sequence"
+                    print(f"Stopping: {stats['stopped']}, rerun to resume from {path}")
+                    break
+    finally:
+        planner.close()
+
+    stats.update(done)
+    return stats
 
 
 if __name__ == "__main__":
+    env_generator = fraud_env.FraudEnv()
+    env = env_generator.create_environment()
+    planner = llmplanner.LLMPlanner(env)
+
     generate_sequences(env, planner)
@@ -1,89 +1,122 @@
-import requests
-import json
+import os
 import textwrap
 from collections import Counter
 import pandas as pd
 from typing import Optional, Tuple, List
+import src.utils.llm_backend as llm_backend
+import src.utils.response_cache as response_cache
+import src.utils.rate_limit as rate_limit
+import src.utils.sequence_table as sequence_table
+from concurrent.futures import ThreadPoolExecutor
+
+# where run_detector writes its misclassified sequences and summary metrics
+ERRORS_PATH = "data/detector/v2/detector_errors_v2_5.csv"
+RESULTS_PATH = "data/detector/v2/detector_res_v2_5.csv"
+
+# Static few-shot instructions shared by every classify_sequence call. Kept
+# byte-identical and at the start of the prompt so a loaded model reuses the
+# KV cache for it and only the sequence suffix is prefilled.
+CLASSIFY_PREFIX = textwrap.dedent("""\
+    You are a strict binary classifier for FAST-payment sequences.
+
+    Your job: label the *behavior* described in the sequence.
+    - "fraud" = unauthorized / deceptive activity leading to an improper transfer (phishing, impersonation, credential theft, account takeover, SIM swap, coercion, etc.)
+    - "legit" = ordinary, authorized payments for goods/services, bills, tuition, rent, reimbursements, etc.
+
+    IMPORTANT:
+    - Do NOT treat this as a "system log" task.
+    - The presence of the words "phishing", "fraudulent", "malware", etc. indicates FRAUD behavior (not "legit input").
+
+    Output rules (MUST follow):
+    - Output exactly ONE word: fraud OR legit
+    - No punctuation, no quotes, no extra words, no explanations.
+
+    Examples:
+    Sequence:
+    action(alice, consultation, bob, email, agreed on terms)
+    action(bob, payment, alice, app, paid for consultation)
+    transaction(acc_bob, fast payment, acc_alice, 200.00)
+    Output: legit
+
+    Sequence:
+    action(scammr, phishing, bob, email, sent fake login link)
+    action(bob, entered_credentials, scammr, website, shared password)
+    action(scammr, account_takeover, acc_bob, online, gained access)
+    transaction(acc_bob, fast payment, acc_scammr, 2000.00)
+    Output: fraud
+
+    """)
+
 
 class LLMDetector():
     """
     Detector that uses Ollama to classify fraudulent and legit 
     FAST-payment sequences.
+
+    With a prefilter (rule_detector.RuleScorer), sequences the rules label
+    with confidence skip the LLM and only ambiguous ones are escalated.
+
+    run_detector writes its error and result CSVs to errors_path and results_path.
     """
 
-    def __init__(self, coev_file_path, model):
+    def __init__(self, coev_file_path, model, backend=None, max_parallel_votes=5, keep_alive="10m", prefilter=None,
+                 errors_path=ERRORS_PATH, results_path=RESULTS_PATH):
         self.coev_file_path = coev_file_path
         self.model = model
+        self.prefilter = prefilter
+        self.errors_path = errors_path
+        self.results_path = results_path
+        # keep_alive holds the model (and its cached instruction prefix) in memory between votes
+        self.backend = backend or llm_backend.OllamaBackend(
+            model=model, pool_size=max_parallel_votes, keep_alive=keep_alive, cache=response_cache.get_default_cache(),
+            controller=rate_limit.get_default_controller(),
+            latency_class="detector"
+        )
+        self.max_parallel_votes = max_parallel_votes
+        # started by the first ensemble vote, shut down by close()
+        self._vote_pool = None
+
+    def close(self):
+        """
+        Shuts down the vote threads; a later ensemble call starts new ones.
+        """
+        if self._vote_pool is not None:
+            self._vote_pool.shutdown(wait=True)
+            self._vote_pool = None
     
-    def classify_sequence(self, seq: str, max_attempts: int = 5, timeout_s: int = 60) -> Optional[str]:
+    def classify_sequence(self, seq: str, max_attempts: int = 5, timeout_s: int = 60,
+                          use_cache: bool = True) -> Optional[str]:
         """
         Classifies one financial sequence in string format
         Given 5 attempts to generate single deterministic output "fraud" or "legit"
 
         Args:
             seq (str): financial sequence
+            use_cache: set False to always ask the model instead of the response cache
         Returns:
             res: "fraud", "legit", or None if sequence was unclassifiable
         """
 
-        prompt = textwrap.dedent(f"""\
-        You are a strict binary classifier for FAST-payment sequences.
-
-        Your job: label the *behavior* described in the sequence.
-        - "fraud" = unauthorized / deceptive activity leading to an improper transfer (phishing, impersonation, credential theft, account takeover, SIM swap, coercion, etc.)
-        - "legit" = ordinary, authorized payments for goods/services, bills, tuition, rent, reimbursements, etc.
-
-        IMPORTANT:
-        - Do NOT treat this as a "system log" task.
-        - The presence of the words "phishing", "fraudulent", "malware", etc. indicates FRAUD behavior (not "legit input").
-
-        Output rules (MUST follow):
-        - Output exactly ONE word: fraud OR legit
-        - No punctuation, no quotes, no extra words, no explanations.
-
-        Examples:
-        Sequence:
-        action(alice, consultation, bob, email, agreed on terms)
-        action(bob, payment, alice, app, paid for consultation)
-        transaction(acc_bob, fast payment, acc_alice, 200.00)
-        Output: legit
-
-        Sequence:
-        action(scammr, phishing, bob, email, sent fake login link)
-        action(bob, entered_credentials, scammr, website, shared password)
-        action(scammr, account_takeover, acc_bob, online, gained access)
-        transaction(acc_bob, fast payment, acc_scammr, 2000.00)
-        Output: fraud
-
-        Input sequence:
-        {seq}
-
-        Output:
-        """).strip() + "\n"
+        # static instructions first so Ollama can reuse the cached KV prefix across calls
+        prompt = CLASSIFY_PREFIX + f"Input sequence:\n{seq}\n\nOutput:\n"
 
         attempts = 0
 
         while attempts < max_attempts:
             attempts += 1
             try:
-                response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0,
-                            # keep generations short to discourage rambling
-                            "num_predict": 4,
-                            # stop as soon as it tries to add anything beyond the first word
-                            "stop": ["\n"],
-                        },
+                payload = self.backend.generate(
+                    prompt,
+                    options={
+                        "temperature": 0,
+                        # keep generations short to discourage rambling
+                        "num_predict": 4,
+                        # stop as soon as it tries to add anything beyond the first word
+                        "stop": ["\n"],
                     },
                     timeout=timeout_s,
+                    use_cache=use_cache,
                 )
-                response.raise_for_status()
-                payload = response.json()
             except Exception:
                 # network/timeout/HTTP/JSON issues -> treat as failed attempt
                 continue
@@ -112,24 +145,127 @@ class LLMDetector():
         return None
     
 
-    def ensemble_classify_sequence(self, seq: str, num_calls: int = 5) -> Tuple[Optional[str], List[Optional[str]], float, float]:
+    @staticmethod
+    def votes_to_settle(counts: Counter, remaining: int) -> int:
         """
-        Runs classify_sequence on financial sequence num_calls times, gets "winner"
+        Smallest number of further votes that could make the current leader
+        unbeatable, or 0 if the majority is already mathematically settled.
+        """
+        ranked = [c for _, c in counts.most_common(2)] + [0, 0]
+        leader, runner_up = ranked[0], ranked[1]
+        if leader > runner_up + remaining:
+            return 0
+        return min(remaining, (runner_up + remaining - leader) // 2 + 1)
+
+
+    def _fresh_vote(self, seq: str) -> Optional[str]:
+        return self.classify_sequence(seq, use_cache=False)
+
+
+    def ensemble_classify_sequence(self, seq: str, num_calls: int = 5, short_circuit: bool = True) -> Tuple[Optional[str], List[Optional[str]], float, float]:
+        """
+        Runs classify_sequence on financial sequence up to num_calls times, gets "winner"
         Assess agreeableness between detection runs and whether model is stable
+
+        Votes are issued in parallel waves. With short_circuit, each wave is only
+        as large as needed to settle the majority and voting stops as soon as no
+        remaining votes could change the winner, so unanimous runs cost
+        num_calls // 2 + 1 calls instead of num_calls.
+
+        Every vote sends the same temperature-0 request, so only the first vote
+        (issued alone) may be answered from the response cache. The others always
+        reach the model, otherwise they would all echo that one cached answer.
+
+        Returns:
+            (winner, votes cast, stability among valid votes, valid rate among votes cast)
         """
-        labels: List[Optional[str]] = [self.classify_sequence(seq) for _ in range(num_calls)]
+        labels: List[Optional[str]] = []
+        counts: Counter = Counter()
+
+        while len(labels) < num_calls:
+            remaining = num_calls - len(labels)
+            wave = self.votes_to_settle(counts, remaining) if short_circuit else remaining
+            if wave == 0:
+                break
+            if labels:
+                if self._vote_pool is None:
+                    self._vote_pool = ThreadPoolExecutor(max_workers=self.max_parallel_votes)
+                wave_labels = self._vote_pool.map(self._fresh_vote, [seq] * wave)
+            else:
+                wave_labels = [self.classify_sequence(seq)]
+            for label in wave_labels:
+                labels.append(label)
+                if label in ("fraud", "legit"):
+                    counts[label] += 1
+
         valid = [x for x in labels if x in ("fraud", "legit")]
 
-        valid_rate = len(valid) / num_calls if num_calls else 0.0
+        valid_rate = len(valid) / len(labels) if labels else 0.0
         if not valid:
             return None, labels, 0.0, valid_rate
 
-        winner, count = Counter(valid).most_common(1)[0]
+        winner, count = counts.most_common(1)[0]
         # stability among valid votes (agreement)
         stability = count / len(valid)
         return winner, labels, stability, valid_rate
 
 
+    def cascade_classify(self, sequence: List[str], num_calls: int = 5) -> Tuple[Optional[str], str, List[Optional[str]], float, float]:
+        """
+        Classifies with the prefilter first and escalates to
+        ensemble_classify_sequence only when it has no confident answer.
+
+        Args:
+            sequence: list of action/transaction steps
+        Returns:
+            (winner, source, votes, stability, valid rate), source is "rules" or "llm"
+        """
+        if self.prefilter is not None:
+            label, __ = self.prefilter.classify(sequence)
+            if label is not None:
+                return label, "rules", [], 1.0, 1.0
+        # Joins actions, should prevent model from reading sequences as log
+        winner, labels, stability, valid_rate = self.ensemble_classify_sequence("\n".join(sequence), num_calls)
+        return winner, "llm", labels, stability, valid_rate
+
+
+    def prefilter_table(self, table: pd.DataFrame, n: int) -> List[Optional[str]]:
+        """
+        Returns: prefilter label per seq, None where the sequence must be escalated
+        """
+        if self.prefilter is None:
+            return [None] * n
+        labels, __ = self.prefilter.classify_table(table, n)
+        return labels
+
+
+    def cascade_classify_table(self, table: pd.DataFrame, n: Optional[int] = None,
+                               num_calls: int = 5) -> List[Tuple[Optional[str], str, List[Optional[str]], float, float]]:
+        """
+        Batch version of cascade_classify: the prefilter scores the whole
+        sequence_table at once and only the ambiguous sequences are
+        escalated to ensemble_classify_sequence.
+
+        Args:
+            table: sequence_table.from_sequences / load output
+            n: number of sequences, defaults to sequence_table.num_sequences(table)
+        Returns:
+            cascade_classify result per seq, in seq order
+        """
+        n = sequence_table.num_sequences(table) if n is None else n
+        rule_labels = self.prefilter_table(table, n)
+        sequences = sequence_table.sequences(table, n)
+
+        results = []
+        for label, sequence in zip(rule_labels, sequences):
+            if label is not None:
+                results.append((label, "rules", [], 1.0, 1.0))
+                continue
+            winner, labels, stability, valid_rate = self.ensemble_classify_sequence("\n".join(sequence), num_calls)
+            results.append((winner, "llm", labels, stability, valid_rate))
+        return results
+
+
     def explain_classification(self, seq: str, result: str) -> str:
         """
         Prompts LLM to explain reasoning for classification
@@ -145,18 +281,7 @@ class LLMDetector():
             f"Input:\n{seq}\n\nOutput:"
         )
 
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': self.model,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    "temperature": 0
-                }
-            }
-        )
-        res = response.json().get('response', '').strip().strip("'")
+        res = self.backend.generate_text(prompt, options={"temperature": 0}).strip("'")
         return res
     
     def run_detector(self):
@@ -171,64 +296,70 @@ class LLMDetector():
         false_neg = 0
         total_seq = 0
         unclassifiable = 0
-
-        with open(self.coev_file_path, "r") as f:
-            data = json.load(f)
-            # print(data)
-
-            for id in data:
-                total_seq += 1
-
-                print(f"Classifying Sequence {id}.")
-                label = data[id]['label']
-                sequence = data[id]['sequence']
-
-                # Joins actions, should prevent model from reading sequences as log
-                sequence = "\n".join(sequence)
-
-                # print(sequence)
-
-                classification, labels, stability, valid_rate = self.ensemble_classify_sequence(sequence)
-
-                if classification == label:
-                    num_correct += 1
+        escalated = 0
+        calls_before = self.backend.metrics.calls
+
+        # JSON dict or the JSONL logs generate_coev_dataset writes, parsed once into a
+        # table the prefilter scores in one pass
+        seq_ids, seq_labels, sequences = sequence_table.read(self.coev_file_path)
+        table = sequence_table.from_sequences(sequences, seq_ids, seq_labels)
+        print(f"Classifying {len(sequences)} sequences.")
+        results = self.cascade_classify_table(table, len(sequences))
+
+        for id, label, steps, result in zip(seq_ids, seq_labels, sequences, results):
+            total_seq += 1
+            classification, source, labels, stability, valid_rate = result
+            escalated += source == "llm"
+            sequence = "\n".join(steps)
+
+            if classification == label:
+                num_correct += 1
+            else:
+                if classification is None:
+                    unclassifiable += 1
+                elif classification == "fraud" and label == "legit":
+                    false_pos += 1
+                elif classification == "legit" and label == "fraud":
+                    false_neg += 1
                 else:
-                    if classification is None:
-                        unclassifiable += 1
-                    elif classification == "fraud" and label == "legit":
-                        false_pos += 1
-                    elif classification == "legit" and label == "fraud":
-                        false_neg += 1
-                    else:
-                        unclassifiable += 1
-                    error_seq.append({
-                        'Sequence id': id,
-                        'Sequence': sequence,
-                        'Label': label,
-                        'LLM Generated Label': classification,
-                        'Stability': stability,
-                        'Valid rate': valid_rate,
-                        'Votes': labels,
-                    })
-            
-            df_error = pd.DataFrame(error_seq)
-            print(df_error)
-            df_error.to_csv("data/detector/v2/detector_errors_v2_5.csv", index=False)
+                    unclassifiable += 1
+                error_seq.append({
+                    'Sequence id': id,
+                    'Sequence': sequence,
+                    'Label': label,
+                    'LLM Generated Label': classification,
+                    'Stability': stability,
+                    'Valid rate': valid_rate,
+                    'Votes': labels,
+                    'Source': source,
+                })
+
+        df_error = pd.DataFrame(error_seq)
+        print(df_error)
+        os.makedirs(os.path.dirname(self.errors_path) or ".", exist_ok=True)
+        df_error.to_csv(self.errors_path, index=False)
 
         res.append({
             'Accuracy': num_correct/total_seq,
             'False positive': false_pos/total_seq,
             'False negative': false_neg/total_seq,
-            'Unclassifiable': unclassifiable/total_seq
+            'Unclassifiable': unclassifiable/total_seq,
+            'Escalated to LLM': escalated/total_seq,
+            'LLM calls': self.backend.metrics.calls - calls_before,
         })
         df_res = pd.DataFrame(res)
         print(df_res)
-        df_res.to_csv("data/detector/v2/detector_res_v2_5.csv", index=False)
+        os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+        df_res.to_csv(self.results_path, index=False)
         return num_correct/total_seq, false_pos/total_seq, false_neg/total_seq, unclassifiable/total_seq
 
 
-detector = LLMDetector("data/coev/coev_seq_v2.json", "llama3.2")
-detector.run_detector()
+if __name__ == "__main__":
+    detector = LLMDetector("data/coev/coev_seq_v2.json", "llama3.2")
+    try:
+        detector.run_detector()
+    finally:
+        detector.close()
 
 # with open("data/coev/coev_seq_v2.json", "r") as f:
 #     data = json.load(f)
@@ -1,57 +1,18 @@
-import requests
+import collections
 import json
 import src.utils.fraud_env as fraud_env
 import src.utils.pydantic_validator as pv
+import src.utils.stateful_validator as stateful_validator
+import src.utils.llm_backend as llm_backend
+import src.utils.response_cache as response_cache
+import src.utils.step_parser as step_parser
+import src.utils.prompt_template as prompt_template
+import src.utils.rate_limit as rate_limit
 from json_repair import repair_json
-import random
-
-
-class LLMPlanner():
-    """
-    Planner that uses a Ollama to generate fraud/legit FAST-payment
-    sequences and validates them with a Pydantic-based rules engine.
-    """
-
-    def __init__(self, env):
-        self.env = env
-        self.pv = pv.UniversalRulesValidator(self.build_entity_registry())
-
-
-    def select_characters(self) -> dict:
-        """
-        Selects values for sequence generation. Selects victim, fraudster, transfer amount.
-
-        Args: 
-            env: fraud env defined by fraud_env.py
-        Returns:
-            dict: {"victim": victim, "victim account": victim_acc, "bank": bank... etc}
-        """
-        # Random victim
-        victim = random.choice(self.env.get_individuals())
-        victim_acc = next((n for n, d in self.env.G.nodes(data=True) if d.get("owner") == victim), None)
-        bank = self.env.G.nodes[victim_acc]['bank']
-        
-        # Random fraudster
-        fraudster = random.choice(self.env.get_fraudsters())
-        fraudster_acc = next((n for n, d in self.env.G.nodes(data=True) if d.get("owner") == fraudster), None)
-
-        # Assume transfer amount is 0.8x balance
-        transfer_amount = self.env.G.nodes[victim_acc]["balance"] * 0.8
-
-        return {"victim": victim, "victim account": victim_acc, "bank": bank, "fraudster": fraudster, "fraudster account": fraudster_acc, "transfer amount": transfer_amount}
-        
-
-    def fraud_prompt(self) -> str:
-        """
-        Generates fraudulent prompt using input of entities from graph
+import requests
 
-        Args: 
-            env: fraud env defined by fraud_env.py
-        Returns:
-            prompt as string
-        """
 
-        PROMPT_TEMPLATE = """
+FRAUD_PROMPT = prompt_template.PromptTemplate("""
         YOUR TASK
 
         - Propose ONE valid fraud sequence.
@@ -79,6 +40,10 @@ class LLMPlanner():
         - ENTITY2 can be a bank, participant, or account.
         - CHANNEL is the fraud mode (exmples are not limited to SMS, email, phone, etc).
         - DESCRIPTION is a  description of what action occurred.
+        - Fields are separated by commas. If a field (usually DESCRIPTION) contains a comma, wrap it in
+          double quotes, escaped as \\" inside the JSON string, e.g.
+          "action({victim}, <action>, {fraudster}, <channel>, \\"sent SSN, password and PIN\\")".
+          An unquoted comma splits the field in two and the step is invalid.
         - Actions must flow logically (cause → effect → compromise → money stolen).
         - The **final step MUST be the transaction**.
         - Be creative
@@ -88,7 +53,7 @@ class LLMPlanner():
         {{
         "sequence": [
             "action({fraudster}, <action>, {victim}, <channel>, Posed as tax officer)",
-            "action({victim}, <action>, {fraudster}, <channel>, sent SSN and credentials)",
+            "action({victim}, <action>, {fraudster}, <channel>, \\"sent SSN, then credentials\\")",
             "action({fraudster}, <action>, {victim_acc}, <channel>, gained full access)",
             "transaction({victim_acc}, FAST Payment, {fraudster_acc}, {transfer_amount})"
         ]
@@ -108,26 +73,9 @@ class LLMPlanner():
             "transaction(...)"
         ]
         }}
-        """
-
-        characters = self.select_characters()
+        """)
 
-        v = characters['victim']
-        v_acc = characters['victim account']
-        f = characters['fraudster']
-        f_acc = characters['fraudster account']
-        amount = characters['transfer amount']
-
-        return PROMPT_TEMPLATE.format(victim = v, victim_acc = v_acc, fraudster = f, fraudster_acc = f_acc, transfer_amount = amount)
-    
-    def legit_prompt(self) -> str:
-        """
-        Generates fraudulent prompt using input of entities from graph
-
-        Returns:
-            prompt as string
-        """
-        PROMPT_TEMPLATE = """
+LEGIT_PROMPT = prompt_template.PromptTemplate("""
         YOUR TASK  
         - Propose 1 valid **legitimate** action/transaction sequence within a network of entities and assets.  
         - Follow these guidelines:
@@ -142,6 +90,8 @@ class LLMPlanner():
         `Action(ENTITY1, ACTION, ENTITY2, CHANNEL, DESCRIPTION)`  
         - A Transaction must have exactly four comma-separated fields:  
         `Transaction(ACCOUNT_FROM, FAST Payment, ACCOUNT_TO, AMOUNT)`  
+        - If a field (usually DESCRIPTION) contains a comma, wrap it in double quotes, escaped as \\" inside the
+        JSON string (see EXAMPLE 2). An unquoted comma splits the field in two and the step is invalid.  
         - Actions must be in chronological order.  
         - For sequential actions, ENTITY2 in the first action should become ENTITY1 in the second action.  
         - Money can only be transferred between **authorized users or businesses** for **legitimate reasons**.  
@@ -168,7 +118,7 @@ class LLMPlanner():
         EXAMPLE 2:
         {{
         "sequence": [
-            "action(Olivia, payment, Grace, mobile phone, payment to friend)",
+            "action(Olivia, payment, Grace, mobile phone, \\"payment to friend, for dinner\\")",
             "transaction(acc_olivia, fast payment, acc_grace, 200.00)"
         ]
         }}
@@ -190,31 +140,232 @@ class LLMPlanner():
         - The purpose of each action should be contextually valid (e.g., utility payments, rent transfers, tuition).
         - A payment must only occur once the recipient has provided value (e.g., consultation, service, product).
         - Do NOT include fraudsters in legitimate sequences.
+        """)
+
+# appended to fraud prompts once the detector has missed some fraud sequences
+EVASION_NOTE = prompt_template.PromptTemplate("""
+        DETECTOR FEEDBACK
+        The fraud detector classified these fraud sequences as legitimate.
+        Use similarly subtle tactics, but do not copy their steps or entities:
+        {examples}
+        """)
+
+# Ollama `format` for structured mode, and the note appended to the prompt so the
+# model knows the steps are objects rather than action(...) strings
+STEP_SCHEMA = pv.sequence_json_schema()
+
+STRUCTURED_NOTE = """
+        OUTPUT FORMAT OVERRIDE
+        Return each step as a JSON object instead of a string:
+        - an action as {"kind": "action", "subject": ENTITY1, "action_type": ACTION, "object": ENTITY2, "channel": CHANNEL, "details": DESCRIPTION}
+        - the transaction as {"kind": "transaction", "from_account": ACCOUNT_FROM, "payment_type": "FAST Payment", "to_account": ACCOUNT_TO, "amount": AMOUNT}
         """
-        i = ", ".join(self.env.get_individuals())
-        b = ", ".join(self.env.get_banks())
-        a = ", ".join(self.env.get_acc())
 
-        return PROMPT_TEMPLATE.format(ind=i, bank=b, acc=a)
+
+class LLMPlanner():
+    """
+    Planner that uses a Ollama to generate fraud/legit FAST-payment
+    sequences and validates them with a Pydantic-based rules engine.
+
+    Args:
+        env: FraudEnv the sequences are generated against
+        backend: OllamaBackend, defaults to a cached local one sharing the
+            process-wide concurrency controller with the detector
+        stream: stream completions and validate each step as it arrives,
+            cancelling the generation at the first invalid step
+        legit_neighborhood: if set, legit prompts list only this many sampled
+            individuals with their accounts and banks, so prompt size no longer
+            grows with the environment
+        structured: constrain the model to STEP_SCHEMA through Ollama's
+            `format`, falls back to free text if the server rejects it.
+            Takes precedence over stream.
+        max_evasions: how many detector false negatives (self.evasions) are
+            kept and shown in fraud prompts
+        dedup: ann_index.NearDuplicateFilter; valid sequences too similar to an
+            accepted one are re-prompted instead of returned
+        seed: sampling seed sent with every non-streamed call. Seeded calls are
+            reproducible and therefore go through the backend's response cache,
+            so an identical prompt returns the identical (cached) sequence. None
+            (default) samples freely and never touches the cache.
+    """
+
+    def __init__(self, env, backend=None, stream=False, legit_neighborhood=None, structured=False, max_evasions=3,
+                 dedup=None, seed=None):
+        self.env = env
+        self.options = {"seed": seed} if seed is not None else None
+        self.stream = stream
+        self.structured = structured
+        self.legit_neighborhood = legit_neighborhood
+        self.dedup = dedup
+        # estimated prompt tokens of every prompt built, per kind
+        self.prompt_tokens = {"fraud": [], "legit": []}
+        # most recent fraud sequences the detector labelled legit, newest last
+        self.evasions = collections.deque(maxlen=max_evasions)
+        self.backend = backend or llm_backend.OllamaBackend(
+            cache=response_cache.get_default_cache(), controller=rate_limit.get_default_controller(),
+            latency_class="planner"
+        )
+        self.pv = pv.UniversalRulesValidator(self.build_entity_registry())
+        self.sv = stateful_validator.StatefulValidator(env, self.pv)
 
 
-    def call_model(self, prompt):
+    def select_characters(self) -> dict:
+        """
+        Selects values for sequence generation. Selects victim, fraudster, transfer amount.
+
+        Args: 
+            env: fraud env defined by fraud_env.py
+        Returns:
+            dict: {"victim": victim, "victim account": victim_acc, "bank": bank... etc}
+        """
+        # Random victim
+        victim = self.env.sample_node("individual")
+        victim_acc = next(iter(self.env.get_accounts_of(victim)), None)
+        bank = self.env.get_attr(victim_acc, 'bank')
+        
+        # Random fraudster
+        fraudster = self.env.sample_node("fraudster")
+        fraudster_acc = next(iter(self.env.get_accounts_of(fraudster)), None)
+
+        # Assume transfer amount is 0.8x balance
+        transfer_amount = self.env.get_attr(victim_acc, "balance") * 0.8
+
+        return {"victim": victim, "victim account": victim_acc, "bank": bank, "fraudster": fraudster, "fraudster account": fraudster_acc, "transfer amount": transfer_amount}
+        
+
+    def fraud_prompt(self) -> str:
         """
         Generates fraudulent prompt using input of entities from graph
 
+        Args: 
+            env: fraud env defined by fraud_env.py
         Returns:
             prompt as string
         """
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': "llama3.2",
-                'prompt': prompt,
-                'stream': False
-            }
-        )
-        raw = response.json().get('response', '').strip()
-        return raw
+        characters = self.select_characters()
+
+        v = characters['victim']
+        v_acc = characters['victim account']
+        f = characters['fraudster']
+        f_acc = characters['fraudster account']
+        amount = characters['transfer amount']
+
+        prompt = FRAUD_PROMPT.render(victim = v, victim_acc = v_acc, fraudster = f, fraudster_acc = f_acc, transfer_amount = amount)
+        evasions = list(self.evasions)
+        if evasions:
+            examples = "\n".join(json.dumps({"sequence": seq}) for seq in evasions)
+            prompt += EVASION_NOTE.render(examples=examples)
+        self.prompt_tokens["fraud"].append(prompt_template.estimate_tokens(prompt))
+        return prompt
+    
+    def legit_prompt(self) -> str:
+        """
+        Generates legitimate prompt using input of entities from graph.
+        With legit_neighborhood set, only a sampled neighborhood of the graph
+        is listed instead of every individual, bank and account.
+
+        Returns:
+            prompt as string
+        """
+        if self.legit_neighborhood:
+            # k random individuals with their own accounts and the banks holding them
+            individuals = self.env.sample_nodes("individual", self.legit_neighborhood)
+            accounts = [acc for person in individuals for acc in self.env.get_accounts_of(person)]
+            banks = list(dict.fromkeys(self.env.get_attr(acc, "bank") for acc in accounts))
+        else:
+            individuals = self.env.get_individuals()
+            banks = self.env.get_banks()
+            accounts = self.env.get_acc()
+
+        prompt = LEGIT_PROMPT.render(ind=", ".join(individuals), bank=", ".join(banks), acc=", ".join(accounts))
+        self.prompt_tokens["legit"].append(prompt_template.estimate_tokens(prompt))
+        return prompt
+
+
+    def call_model(self, prompt, timeout=None):
+        """
+        Sends prompt to Ollama and returns the raw completion
+
+        Args:
+            prompt: full prompt string
+            timeout: seconds to wait for the response (defaults to the backend timeout)
+        Returns:
+            raw response text
+        """
+        return self.backend.generate_text(prompt, options=self.options, timeout=timeout)
+
+    def stream_model(self, prompt, semantic=True, timeout=None) -> tuple:
+        """
+        Streams the completion and validates every step as soon as its JSON
+        string closes. On the first invalid step the generation is cancelled.
+
+        Args:
+            prompt: full prompt string
+            semantic: also run the semantic rules and stateful checks per step
+            timeout: seconds to wait between streamed chunks
+        Returns:
+            (raw, error_msg, error_kind): raw is the text received so far,
+            error_kind is None if every completed step was valid
+        """
+        steps = step_parser.StepStream()
+        self.sv.reset()
+        chunks = self.backend.stream_generate(prompt, options=self.options, timeout=timeout)
+        try:
+            for chunk in chunks:
+                new = steps.feed(chunk.get("response", ""))
+                for i, step in enumerate(new, start=len(steps.steps) - len(new)):
+                    parsed = step_parser.parse_step(step)
+
+                    errors = self.pv.step_syntax_violations(parsed)
+                    kind = "syntax"
+                    if not errors and semantic:
+                        errors = self.pv.step_semantic_violations(parsed)
+                        errors += [(rule, msg) for _, rule, msg in self.sv.feed(parsed)]
+                        kind = "semantic"
+                    if not errors:
+                        continue
+
+                    print(f"Stream stopped at step {i}: {kind} error")
+                    error_msg = (
+                        f"\nYour previous sequence was stopped at step {i} because of {kind.upper()} ERRORS:\n"
+                        + "\n".join(f"Step {i}: {msg}" for _, msg in errors)
+                        + "\nThese were the steps you had produced:\n"
+                        + "\n".join(steps.steps[:i + 1])
+                        + "\nFix the errors and regenerate the whole sequence as a new valid JSON dictionary."
+                    )
+                    return steps.text, error_msg, kind
+        finally:
+            chunks.close()
+
+        return steps.text, "", None
+
+    def attempt(self, prompt, semantic=True) -> tuple:
+        """
+        One generation attempt: calls the model (schema-constrained if
+        self.structured, else streaming if self.stream) and validates the response.
+
+        Returns:
+            (sequence, error_msg, error_kind) as in check_response
+        """
+        if self.structured:
+            try:
+                raw = self.backend.generate_text(prompt + STRUCTURED_NOTE, options=self.options, format=STEP_SCHEMA)
+            except requests.HTTPError as e:
+                if getattr(e.response, "status_code", None) != 400:
+                    raise
+                # server without structured outputs: use the free-text path from now on
+                print("Structured output rejected, falling back to free text")
+                self.structured = False
+            else:
+                return self.check_structured(raw, semantic=semantic)
+
+        if not self.stream:
+            return self.check_response(self.call_model(prompt), semantic=semantic)
+
+        raw, error_msg, error_kind = self.stream_model(prompt, semantic=semantic)
+        if error_kind:
+            return None, error_msg, error_kind
+        return self.check_response(raw, semantic=semantic)
             
 
     def build_entity_registry(self):
@@ -222,28 +373,162 @@ class LLMPlanner():
         Builds registry of entities and entity types for pydantic validation
 
         """
-        ROLE_TO_ENTITYTYPE = {
-            "individual": pv.EntityType.INDIVIDUAL,
-            "fraudster": pv.EntityType.FRAUDSTER,
-            "bank": pv.EntityType.BANK,
-            "account": pv.EntityType.ACCOUNT,
-            "telecom": pv.EntityType.TELECOM,
-            "utility": pv.EntityType.ORGANIZATION,
-            "restaurant": pv.EntityType.ORGANIZATION,
-            "institution": pv.EntityType.ORGANIZATION,
-        }
-        registry = {}
-
-        for node, attrs in self.env.G.nodes(data=True):
-
-            role = attrs.get("role")
-            etype = ROLE_TO_ENTITYTYPE.get(role)
-
-            registry[node] = pv.Entity(name=node, type=etype)
-
-        return registry
+        return pv.build_entity_registry(self.env)
     
 
+    def check_response(self, raw: str, semantic: bool = True) -> tuple:
+        """
+        Runs one raw model response through JSON repair, syntax and (optionally)
+        semantic and stateful validation.
+
+        Args:
+            raw: raw text returned by the model
+            semantic: whether to run the semantic rules and stateful environment checks
+        Returns:
+            (sequence, error_msg, error_kind): sequence is the parsed dict or None,
+            error_msg is the corrective prompt suffix, error_kind is None,
+            "syntax" or "semantic"
+        """
+        # Validate JSON format
+        json_text = raw[raw.find("{"):]
+        json_text = repair_json(json_text).lower()
+
+        try:
+            sequence = json.loads(json_text)
+        except Exception as e:
+            error_msg = (
+                f"\nThe JSON you produced was invalid and could not be parsed.\n"
+                f"Error: {type(e).__name__}: {str(e)}\n"
+                f"Here is the exact output you produced:\n{json_text}\n\n"
+                "Fix the JSON formatting and return ONLY valid JSON."
+            )
+            return None, error_msg, "syntax"
+
+        if not isinstance(sequence, dict) or "sequence" not in sequence:
+            error_msg = (
+                "\nYour JSON did not include a valid 'sequence' list.\n"
+                f"You returned:\n{json_text}\n"
+                "Return ONLY: {\"sequence\": [ ... ]}"
+            )
+            return None, error_msg, "syntax"
+
+        # Detect broken / multiline / incomplete steps
+        broken = not isinstance(sequence["sequence"], list) or any(
+            not isinstance(step, str) or "(" not in step or ")" not in step
+            for step in sequence["sequence"]
+        )
+
+        if broken:
+            error_msg = (
+                "\nYour previous output was invalid because at least one action or transaction "
+                "was split across multiple lines or is missing parentheses.\n"
+                "Each step MUST be exactly one line of the form:\n"
+                "action(...)\n"
+                "transaction(...)\n"
+                "Here is what you returned:\n"
+                f"{json.dumps(sequence, indent=2)}\n"
+                "Regenerate a NEW JSON dictionary following the rules."
+            )
+            return None, error_msg, "syntax"
+
+        return self.validate_sequence(sequence, semantic)
+
+    def check_structured(self, raw: str, semantic: bool = True) -> tuple:
+        """
+        Checks a response produced with the STEP_SCHEMA format constraint.
+        Step objects are turned back into action(...)/transaction(...) strings
+        and go through the same syntax, semantic and stateful stages. Output
+        that is not schema-shaped JSON falls back to the free-text check_response.
+
+        Returns:
+            (sequence, error_msg, error_kind) as in check_response
+        """
+        try:
+            sequence = json.loads(raw)
+            steps = [
+                step_parser.format_step(step["kind"], step).lower() if isinstance(step, dict) else step
+                for step in sequence["sequence"]
+            ]
+        except (ValueError, TypeError, KeyError):
+            return self.check_response(raw, semantic=semantic)
+
+        return self.validate_sequence({"sequence": steps}, semantic)
+
+    def validate_sequence(self, sequence: dict, semantic: bool = True) -> tuple:
+        """
+        Runs a decoded {"sequence": [...]} dict through syntax and (optionally)
+        semantic and stateful validation.
+
+        Returns:
+            (sequence, error_msg, error_kind) as in check_response
+        """
+        # Stage 2: SYNTAX CHECK
+        syntax_ok, syntax_errors = self.pv.validate_syntax(sequence['sequence'])
+        print("Syntax OK:", syntax_ok)
+
+        if not syntax_ok:
+            error_msg = (
+                "\nYour previous sequence had SYNTAX ERRORS:\n"
+                + "\n".join(syntax_errors)
+                + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
+                "Fix the syntax and regenerate a new valid JSON dictionary."
+            )
+            return None, error_msg, "syntax"
+
+        if not semantic:
+            # only legit sequences skip the semantic rules
+            return self.check_novelty(sequence, "legit")
+
+        # Stage 3: Semantic check
+        semantic_ok, semantic_errors = self.pv.validate_semantic(sequence['sequence'])
+        print("Semantic OK:", semantic_ok)
+
+        if not semantic_ok:
+            error_msg = (
+                "\nYour previous sequence had SEMANTIC ERRORS:\n"
+                + "\n".join(semantic_errors)
+                + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
+                "Fix the logical errors and regenerate."
+            )
+            return None, error_msg, "semantic"
+
+        # Stage 4: Stateful check against the environment (owners, banks, balances)
+        state_ok, state_errors = self.sv.validate(sequence['sequence'])
+        print("State OK:", state_ok)
+
+        if not state_ok:
+            error_msg = (
+                "\nYour previous sequence was INCONSISTENT with the environment:\n"
+                + "\n".join(state_errors)
+                + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
+                "Fix the order of steps, the accounts or the amount and regenerate."
+            )
+            return None, error_msg, "semantic"
+
+        return self.check_novelty(sequence, "fraud")
+
+    def check_novelty(self, sequence: dict, label: str) -> tuple:
+        """
+        Last stage: rejects a valid sequence that is a near-duplicate of one
+        already accepted with the same label (self.dedup), and remembers it otherwise.
+
+        Returns:
+            (sequence, error_msg, error_kind) as in check_response, error_kind "duplicate" on rejection
+        """
+        if self.dedup is None:
+            return sequence, "", None
+        accepted, similarity, __ = self.dedup.check_and_add(sequence['sequence'], label=label)
+        print("Novel:", accepted)
+        if accepted:
+            return sequence, "", None
+        error_msg = (
+            f"\nYour previous sequence was valid but {similarity:.0%} similar to one already in the dataset:\n"
+            f"{json.dumps(sequence, indent=2)}\n"
+            "Write a DIFFERENT scenario: change the pretext, the channel and the way access is gained."
+        )
+        return None, error_msg, "duplicate"
+
+
     def generate_valid_fraud_seq(self, max_attempts=15) -> dict:
         """
         Generates a valid fraud sequence through GEPA-stype prompting the LLM
@@ -254,98 +539,31 @@ class LLMPlanner():
         error_msg = ""
 
         attempts = 0
-        valid_seq = False
 
         num_syntax_errors = 0
         num_semantic_errors = 0
 
-        while not valid_seq and attempts < max_attempts:
+        while attempts < max_attempts:
 
             print(f"=== ATTEMPT {attempts+1}/{max_attempts} ===")
             attempts += 1
-            # #TESTING
-            # print("-----------------------start prompt-----------------------")
-            # print(prompt + error_msg)
-            # print("-----------------------end prompt-----------------------")
 
+            sequence, error_msg, error_kind = self.attempt(prompt + error_msg)
 
-            raw = self.call_model(prompt + error_msg)
-
-            # Validate JSON format
-            json_text = raw[raw.find("{"):]
-            json_text = repair_json(json_text).lower()
-
-            try:
-                sequence = json.loads(json_text)
-            except Exception as e:
-                error_msg = (
-                    f"\nThe JSON you produced was invalid and could not be parsed.\n"
-                    f"Error: {type(e).__name__}: {str(e)}\n"
-                    f"Here is the exact output you produced:\n{json_text}\n\n"
-                    "Fix the JSON formatting and return ONLY valid JSON."
-                )
+            if error_kind == "syntax":
                 num_syntax_errors += 1
                 print(error_msg)
                 continue
 
-            if "sequence" not in sequence:
-                error_msg = "\n Error. The JSON you produced did not contain 'sequence' key."
-                num_syntax_errors += 1
+            if error_kind == "semantic":
+                num_semantic_errors += 1
                 print(error_msg)
                 continue
 
-            # Detect broken / multiline / incomplete steps
-            broken = any(
-                not isinstance(step, str) or "(" not in step or ")" not in step
-                for step in sequence["sequence"]
-            )
-
-            if broken:
-                num_syntax_errors += 1
-                error_msg = (
-                    "\nYour previous output was invalid because at least one action or transaction "
-                    "was split across multiple lines or is missing parentheses.\n"
-                    "Each step MUST be exactly one line of the form:\n"
-                    "action(...)\n"
-                    "transaction(...)\n"
-                    "Here is what you returned:\n"
-                    f"{json.dumps(sequence, indent=2)}\n"
-                    "Regenerate a NEW JSON dictionary following the rules."
-                )
+            if error_kind == "duplicate":
                 print(error_msg)
                 continue
 
-            # Stage 2: SYNTAX CHECK
-            syntax_ok, syntax_errors = self.pv.validate_syntax(sequence['sequence'])
-            print("Syntax OK:", syntax_ok)
-
-            if not syntax_ok:
-                num_syntax_errors += 1
-                error_msg = (
-                    "\nYour previous sequence had SYNTAX ERRORS:\n"
-                    + "\n".join(syntax_errors)
-                    + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
-                    "Fix the syntax and regenerate a new valid JSON dictionary."
-                )
-                print(error_msg)
-                continue
-
-            # Stage 3: Semantic check
-            semantic_ok, semantic_errors = self.pv.validate_semantic(sequence['sequence'])
-            print("Semantic OK:", semantic_ok)
-
-            if not semantic_ok:
-                num_semantic_errors += 1
-                error_msg = (
-                    "\nYour previous sequence had SEMANTIC ERRORS:\n"
-                    + "\n".join(semantic_errors)
-                    + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
-                    "Fix the logical errors and regenerate."
-                )
-                print(error_msg)
-                continue
-            
-            valid_seq = True
             print(f"✓ VALID SEQUENCE FOUND after {attempts} attempts")
             return sequence, attempts, num_syntax_errors, num_semantic_errors
         
@@ -358,77 +576,14 @@ class LLMPlanner():
         error_msg = ""
 
         attempts = 0
-        valid_seq = False
 
-        while not valid_seq and attempts < max_attempts:
+        while attempts < max_attempts:
             print(f"=== ATTEMPT {attempts+1}/{max_attempts} ===")
             attempts += 1
-            # print("-----------------------start prompt-----------------------")
-            # print(prompt + error_msg)
-            # print("-----------------------end prompt-----------------------")
-
-            raw = self.call_model(prompt + error_msg)
-
-            # Stage 1: Validate JSON format
-            json_text = raw[raw.find("{"):]
-            json_text = repair_json(json_text).lower()
 
-            try:
-                sequence = json.loads(json_text)
-            except Exception as e:
-                error_msg = (
-                    f"\nThe JSON you produced was invalid and could not be parsed.\n"
-                    f"Error: {type(e).__name__}: {str(e)}\n"
-                    f"Here is the exact output you produced:\n{json_text}\n\n"
-                    "Fix the JSON formatting and return ONLY valid JSON."
-                )
-                print(error_msg)
-                continue
-
-            if "sequence" not in sequence:
-                continue
-
-            # Detect broken / multiline / incomplete steps
-            broken = any(
-                not isinstance(step, str) or "(" not in step or ")" not in step
-                for step in sequence["sequence"]
-            )
-
-            if broken:
-                error_msg = (
-                    "\nYour previous output was invalid because at least one action or transaction "
-                    "was split across multiple lines or is missing parentheses.\n"
-                    "Each step MUST be exactly one line of the form:\n"
-                    "action(...)\n"
-                    "transaction(...)\n"
-                    "Here is what you returned:\n"
-                    f"{json.dumps(sequence, indent=2)}\n"
-                    "Regenerate a NEW JSON dictionary following the rules."
-                )
-                print(error_msg)
-                continue
-
-            # Check if 'sequence' is present
-            if 'sequence' not in sequence:
-                error_msg = (
-                    "\nYour JSON did not include a valid 'sequence' list.\n"
-                    f"You returned:\n{json_text}\n"
-                    "Return ONLY: {\"sequence\": [ ... ]}"
-                )
-                print(error_msg)
-                continue
+            sequence, error_msg, error_kind = self.attempt(prompt + error_msg, semantic=False)
 
-            # Stage 2: SYNTAX CHECK
-            syntax_ok, syntax_errors = self.pv.validate_syntax(sequence['sequence'])
-            print("Syntax OK:", syntax_ok)
-
-            if not syntax_ok:
-                error_msg = (
-                    "\nYour previous sequence had SYNTAX ERRORS:\n"
-                    + "\n".join(syntax_errors)
-                    + f"\nThis was the sequence you returned:\n{json.dumps(sequence, indent=2)}\n"
-                    "Fix the syntax and regenerate a new valid JSON dictionary."
-                )
+            if error_kind:
                 print(error_msg)
                 continue
         
@@ -1,11 +1,11 @@
-import json
-import requests
+import src.utils.coev_io as coev_io
+import src.utils.llm_backend as llm_backend
+import src.utils.response_cache as response_cache
 
-def generate_pattern(file, max_patterns) -> str:
-    with open(file, 'r') as f:
-        data = json.load(f)
-        formatted_fraud = {key: value for key, value in data.items() if value.get("label") == "fraud"}
-        formatted_legit = {key: value for key, value in data.items() if value.get("label") == "legit"}
+def generate_pattern(file, max_patterns, backend=None, options=None) -> str:
+    data = coev_io.load_coev(file)
+    formatted_fraud = {key: value for key, value in data.items() if value.get("label") == "fraud"}
+    formatted_legit = {key: value for key, value in data.items() if value.get("label") == "legit"}
 
         
     TEMPLATE = """
@@ -41,17 +41,11 @@ def generate_pattern(file, max_patterns) -> str:
 
     prompt = TEMPLATE.format(fraud_seqs=formatted_fraud, legit_seqs=formatted_legit, max_patterns=max_patterns)
 
-    response = requests.post(
-        'http://localhost:11434/api/generate',
-        json={
-            'model': 'llama3.2',
-            'prompt': prompt,
-            'stream': False
-        }
-    )
-    return response.json().get('response', '')
+    backend = backend or llm_backend.OllamaBackend(cache=response_cache.get_default_cache())
+    # default sampling, never cached; pass deterministic options (e.g. {"temperature": 0})
+    # to mine the same patterns from the same corpus and serve reruns from the cache
+    return backend.generate_text(prompt, options=options)
 
-        
 
-print(generate_pattern("data/coev/coev_seq_v2.json", 5))
-        
\ No newline at end of file
+if __name__ == "__main__":
+    print(generate_pattern("data/coev/coev_seq_v2.json", 5))
@@ -0,0 +1,159 @@
+"""
+Rule Detector - cheap structural pre-filter for LLMDetector
+Scores a sequence from the validator's keyword predicates and the FraudEnv
+ownership graph. Clear-cut sequences get a label straight away; only the
+ones scoring between the two thresholds are escalated to the LLM ensemble.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import src.utils.pydantic_validator as pv
+import src.utils.sequence_table as sequence_table
+
+# score contribution of each feature, counts are capped at the weight's cap
+FEATURE_WEIGHTS = {
+    "foreign_account_action": (2, 1),   # (weight, cap) an actor acts on an account someone else owns
+    "psychological_steps": (2, 1),      # phishing, impersonation, manipulation, ...
+    "fraud_keyword_steps": (1, 2),      # is_fraud_behavior on action type + description
+    "info_submission_steps": (1, 1),    # sharing credentials / details
+    "fraudster_actor": (1, 1),          # a FRAUDSTER-typed entity acts
+    "fraudster_recipient": (1, 1),      # money goes to an account a FRAUDSTER owns
+}
+
+
+def _fold(name) -> str:
+    return "" if name is None else str(name).strip().lower()
+
+
+class RuleScorer:
+    """
+    Args:
+        env: FraudEnv the sequences were generated against
+        validator: UniversalRulesValidator to reuse, built from env if None
+        fraud_threshold: score at or above which a sequence is labelled fraud
+        legit_threshold: score at or below which a sequence is labelled legit
+    """
+
+    def __init__(self, env, validator: Optional[pv.UniversalRulesValidator] = None,
+                 fraud_threshold: int = 5, legit_threshold: int = 1):
+        self.env = env
+        self.validator = validator or pv.UniversalRulesValidator(pv.build_entity_registry(env))
+        self.fraud_threshold = fraud_threshold
+        self.legit_threshold = legit_threshold
+        # build_entity_registry keys by the environment's names (e.g. "ConEdison"), while
+        # generated steps are usually lowercased
+        self._folded = {_fold(name): entity for name, entity in self.validator.entity_registry.items()}
+
+    def _owner(self, account: Optional[str]) -> Optional[str]:
+        if account is None:
+            return None
+        try:
+            # env.get_attr, not env.G: ArrayFraudEnv.G rebuilds a whole networkx graph
+            return self.env.get_attr(account, "owner")
+        except KeyError:
+            return None
+
+    def _is_foreign(self, account: Optional[str], subject: Optional[str]) -> bool:
+        owner = self._owner(account)
+        return owner is not None and _fold(owner) != _fold(subject)
+
+    def _is_fraudster(self, name: Optional[str]) -> bool:
+        entity = self.validator.entity_registry.get(name)
+        if entity is None and name is not None:
+            entity = self._folded.get(_fold(name))
+        return entity is not None and entity.is_fraudster()
+
+    def features(self, sequence: List[str]) -> Dict[str, int]:
+        """
+        Returns: feature counts for one sequence (see FEATURE_WEIGHTS)
+        """
+        parsed = self.validator.parse_sequence(sequence)
+        actions = [p.data for p in parsed if p.kind == "action"]
+        transactions = [p.data for p in parsed if p.kind == "transaction"]
+
+        v = self.validator
+        texts = [f"{a.get('action_type', '')} {a.get('details', '')}" for a in actions]
+        return {
+            "foreign_account_action": sum(
+                1 for a in actions if self._is_foreign(a.get("object"), a.get("subject"))
+            ),
+            "psychological_steps": sum(v.targets_human_psychology(t) for t in texts),
+            "fraud_keyword_steps": sum(v.is_fraud_behavior(t) for t in texts),
+            "info_submission_steps": sum(v.is_information_submission(t) for t in texts),
+            "fraudster_actor": int(any(self._is_fraudster(a.get("subject")) for a in actions)),
+            "fraudster_recipient": int(any(self._is_fraudster(self._owner(t.get("to_account"))) for t in transactions)),
+        }
+
+    def features_table(self, table: pd.DataFrame, n: Optional[int] = None) -> pd.DataFrame:
+        """
+        Batch version of features over a sequence_table: the per-step checks
+        run once per distinct step, then are summed per sequence.
+
+        Args:
+            table: sequence_table.from_sequences / load output
+            n: number of sequences, defaults to sequence_table.num_sequences(table)
+        Returns:
+            DataFrame indexed by seq with one column per FEATURE_WEIGHTS feature
+        """
+        n = sequence_table.num_sequences(table) if n is None else n
+        rows = sequence_table.distinct_rows(table)
+        v = self.validator
+        # per distinct step, columns in FEATURE_WEIGHTS order
+        flags = np.zeros((len(table["step"].cat.categories), len(FEATURE_WEIGHTS)), dtype=np.int64)
+        columns = [np.asarray(rows[c], dtype=object).tolist() for c in ("kind", "subject", "action", "object", "description")]
+        for code, kind, subject, action, obj, description in zip(rows.index.tolist(), *columns):
+            if kind == "action":
+                text = f"{action} {description}"
+                flags[code, :5] = (self._is_foreign(obj, subject), v.targets_human_psychology(text),
+                                   v.is_fraud_behavior(text), v.is_information_submission(text),
+                                   self._is_fraudster(subject))
+            elif kind == "transaction":
+                flags[code, 5] = self._is_fraudster(self._owner(obj))
+
+        per_step = flags[table["step"].cat.codes.to_numpy()]
+        seq = table["seq"].to_numpy()
+        counts = np.stack([np.bincount(seq, weights=per_step[:, k], minlength=n) for k in range(flags.shape[1])], axis=1)
+        features = pd.DataFrame(counts.astype(np.int64), columns=list(FEATURE_WEIGHTS))
+        # any(), not counts
+        for name in ("fraudster_actor", "fraudster_recipient"):
+            features[name] = (features[name] > 0).astype(np.int64)
+        return features
+
+    @staticmethod
+    def _weighted(features) -> int:
+        return sum(weight * np.minimum(features[name], cap) for name, (weight, cap) in FEATURE_WEIGHTS.items())
+
+    def _label(self, score: int) -> Optional[str]:
+        if score >= self.fraud_threshold:
+            return "fraud"
+        if score <= self.legit_threshold:
+            return "legit"
+        return None
+
+    def score(self, sequence: List[str]) -> int:
+        return int(self._weighted(self.features(sequence)))
+
+    def classify(self, sequence: List[str]) -> Tuple[Optional[str], int]:
+        """
+        Returns:
+            (label, score): label is "fraud", "legit", or None when the
+            score is ambiguous and the sequence should go to the LLM
+        """
+        score = self.score(sequence)
+        return self._label(score), score
+
+    def classify_table(self, table: pd.DataFrame, n: Optional[int] = None) -> Tuple[List[Optional[str]], np.ndarray]:
+        """
+        Batch version of classify over a sequence_table.
+
+        Args:
+            table: sequence_table.from_sequences / load output
+            n: number of sequences, defaults to sequence_table.num_sequences(table)
+        Returns:
+            (labels, scores): one label (None if ambiguous) and score per seq
+        """
+        scores = self._weighted(self.features_table(table, n)).to_numpy()
+        return [self._label(score) for score in scores.tolist()], scores
@@ -0,0 +1,187 @@
+"""
+ANN Index - random-projection LSH over sentence embeddings
+Each of num_tables tables hashes a unit vector to the sign pattern of
+num_bits random hyperplanes; vectors with a high cosine similarity collide
+in at least one table with high probability. A query rescores only the
+colliding candidates exactly, so looking up a new sequence against tens of
+thousands stays well under a millisecond.
+
+NearDuplicateFilter wraps one index per label and an embedding function so
+the planner can reject generated sequences too similar to ones already
+accepted with the same label.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RandomProjectionIndex:
+    """
+    Args:
+        dim: embedding width (384 for all-MiniLM-L6-v2)
+        num_tables: independent hash tables, more tables raise recall
+        num_bits: hyperplanes per table, more bits shrink buckets
+        seed: seed for the hyperplanes
+    """
+
+    def __init__(self, dim: int, num_tables: int = 8, num_bits: int = 12, seed: int = 0):
+        if num_bits > 62:
+            raise ValueError("num_bits must fit in an int64 bucket code")
+        self.dim = dim
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        rng = np.random.default_rng(seed)
+        # (tables * bits, dim): one matmul hashes a vector into every table
+        self.planes = rng.standard_normal((num_tables * num_bits, dim)).astype(np.float32)
+        self._weights = (1 << np.arange(num_bits, dtype=np.int64))
+        self.tables = [defaultdict(list) for _ in range(num_tables)]
+        self.keys: List[Hashable] = []
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _codes(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns: (n, num_tables) int64 bucket codes
+        """
+        bits = (vectors @ self.planes.T > 0).reshape(len(vectors), self.num_tables, self.num_bits)
+        return bits.astype(np.int64) @ self._weights
+
+    def add(self, vectors: np.ndarray, keys: Optional[Sequence[Hashable]] = None):
+        """
+        Adds one vector or a (n, dim) batch. keys default to insertion positions.
+        """
+        vectors = self._normalize(vectors)
+        codes = self._codes(vectors)
+        with self._lock:
+            first = self._size
+            if first + len(vectors) > len(self._vectors):
+                grown = np.empty((max(2 * len(self._vectors), first + len(vectors), 256), self.dim), dtype=np.float32)
+                grown[:first] = self._vectors[:first]
+                self._vectors = grown
+            self._vectors[first:first + len(vectors)] = vectors
+            for offset, row in enumerate(codes):
+                for table, code in zip(self.tables, row.tolist()):
+                    table[code].append(first + offset)
+            self.keys.extend(keys if keys is not None else range(first, first + len(vectors)))
+            self._size += len(vectors)
+
+    def query(self, vector: np.ndarray, k: int = 1) -> List[Tuple[float, Hashable]]:
+        """
+        Approximate k nearest neighbours of one vector by cosine similarity.
+
+        Returns:
+            up to k (similarity, key) pairs, most similar first; only vectors
+            sharing a bucket with the query in some table are considered
+        """
+        vector = self._normalize(vector)
+        codes = self._codes(vector)[0].tolist()
+        with self._lock:
+            candidates = set()
+            for table, code in zip(self.tables, codes):
+                candidates.update(table.get(code, ()))
+            if not candidates:
+                return []
+            ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            sims = self._vectors[ids] @ vector[0]
+            keys = self.keys
+        top = np.argsort(-sims)[:k]
+        return [(float(sims[i]), keys[ids[i]]) for i in top]
+
+
+class NearDuplicateFilter:
+    """
+    Keeps one index per label, so a legit sequence is never rejected as a
+    duplicate of a fraud one.
+
+    Args:
+        embed: callable(list of texts) -> (n, dim) embeddings, defaults to the
+            shared similarity_check embedding store (all-MiniLM-L6-v2)
+        threshold: cosine similarity at or above which a sequence is a near-duplicate
+        dim: embedding width
+        index: RandomProjectionIndex to use for label None, built from dim if None
+    """
+
+    def __init__(self, embed: Optional[Callable[[List[str]], np.ndarray]] = None, threshold: float = 0.95,
+                 dim: int = 384, index: Optional[RandomProjectionIndex] = None):
+        if embed is None:
+            import src.utils.similarity_check as similarity_check
+            embed = lambda texts: similarity_check.get_store().encode(texts)
+        self.embed = embed
+        self.threshold = threshold
+        self.dim = dim
+        self.indexes: Dict[Optional[str], RandomProjectionIndex] = {None: index} if index is not None else {}
+        self.rejected = 0
+        # held across query + add, so two near-identical sequences checked at once cannot both pass
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text(sequence: List[str]) -> str:
+        # same text similarity_check embeds, so the store already holds it
+        return ", ".join(sequence)
+
+    def _index(self, label: Optional[str]) -> RandomProjectionIndex:
+        if label not in self.indexes:
+            self.indexes[label] = RandomProjectionIndex(self.dim)
+        return self.indexes[label]
+
+    def nearest(self, sequence: List[str], label: Optional[str] = None) -> Tuple[float, Optional[Hashable]]:
+        """
+        Returns: (similarity, key) of the closest accepted sequence with the
+            same label, (0.0, None) if none collides
+        """
+        vector = self.embed([self.text(sequence)])[0]
+        with self._lock:
+            found = self._index(label).query(vector, k=1)
+        return found[0] if found else (0.0, None)
+
+    def check_and_add(self, sequence: List[str], key: Optional[Hashable] = None,
+                      label: Optional[str] = None) -> Tuple[bool, float, Optional[Hashable]]:
+        """
+        Adds the sequence unless it is a near-duplicate of one already added
+        with the same label.
+
+        Returns:
+            (accepted, similarity, nearest key)
+        """
+        vector = self.embed([self.text(sequence)])[0]
+        with self._lock:
+            index = self._index(label)
+            found = index.query(vector, k=1)
+            sim, nearest = found[0] if found else (0.0, None)
+            if sim >= self.threshold:
+                self.rejected += 1
+                return False, sim, nearest
+            index.add(vector, [key if key is not None else len(index)])
+        return True, sim, nearest
+
+    def add_many(self, sequences: List[List[str]], keys: Optional[Sequence[Hashable]] = None,
+                 labels: Optional[Sequence[Optional[str]]] = None):
+        """
+        Adds sequences unconditionally, e.g. an existing dataset on resume.
+
+        Args:
+            labels: label per sequence, all None if not given
+        """
+        if not sequences:
+            return
+        vectors = self.embed([self.text(s) for s in sequences])
+        labels = list(labels) if labels is not None else [None] * len(sequences)
+        keys = list(keys) if keys is not None else None
+        with self._lock:
+            for label in dict.fromkeys(labels):
+                rows = [i for i, l in enumerate(labels) if l == label]
+                self._index(label).add(vectors[rows], [keys[i] for i in rows] if keys is not None else None)
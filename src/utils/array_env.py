@@ -0,0 +1,382 @@
+"""
+Array-backed Fraud Environment - compact alternative to the networkx FraudEnv
+Node ids are interned to integers; roles, balances, status, compromised
+flags and owner/bank references live in NumPy columns, and edges are kept
+as CSR arrays. Exposes the same get_*/update_balance API as FraudEnv and
+only builds a networkx DiGraph when asked (e.g. for draw_graph).
+"""
+
+import random
+
+import networkx as nx
+import numpy as np
+
+import src.utils.fraud_env as fraud_env
+import src.utils.ledger as ledger
+
+
+ROLES = ["bank", "account", "individual", "fraudster", "utility", "telecom", "restaurant", "institution"]
+STATUSES = ["active", "flagged", "frozen"]
+RELS = ["owns", "hosts"]
+
+ROLE_CODE = {r: i for i, r in enumerate(ROLES)}
+STATUS_CODE = {s: i for i, s in enumerate(STATUSES)}
+REL_CODE = {r: i for i, r in enumerate(RELS)}
+
+NO_ROLE = -1
+NO_NODE = -1
+
+
+class ArrayFraudEnv():
+    """
+    Drop-in FraudEnv replacement for environments with millions of nodes.
+
+    Args:
+        verbose: print per-node messages like FraudEnv (off by default)
+        capacity: initial number of node slots, columns double when full
+    """
+
+    NODE_TEMPLATES = fraud_env.NODE_TEMPLATES
+
+    def __init__(self, verbose=False, capacity=1024):
+        self.verbose = verbose
+        self._alloc(capacity)
+        self.reset()
+
+    def _alloc(self, capacity):
+        self.role = np.full(capacity, NO_ROLE, dtype=np.int8)
+        self.is_fraudster = np.full(capacity, -1, dtype=np.int8)   # -1 unset, 0 False, 1 True
+        self.balance = np.zeros(capacity, dtype=np.float64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.compromised = np.zeros(capacity, dtype=bool)
+        self.owner = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.bank = np.full(capacity, NO_NODE, dtype=np.int32)
+
+    def _grow(self, needed):
+        capacity = len(self.role)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, 2 * capacity)
+        for name, fill in [("role", NO_ROLE), ("is_fraudster", -1), ("balance", 0.0), ("status", 0),
+                           ("compromised", False), ("owner", NO_NODE), ("bank", NO_NODE)]:
+            old = getattr(self, name)
+            col = np.full(new_capacity, fill, dtype=old.dtype)
+            col[:capacity] = old
+            setattr(self, name, col)
+
+    def _invalidate(self):
+        self._groups = {}
+        self._csr = None
+        self._nx = None
+
+    # ------------------------------------------------------------------
+    # construction
+    # ------------------------------------------------------------------
+
+    def _intern(self, node_id):
+        idx = self.ids.get(node_id)
+        if idx is None:
+            idx = self.n
+            self._grow(idx + 1)
+            self.ids[node_id] = idx
+            self.names.append(node_id)
+            self.n += 1
+        return idx
+
+    def _set_attrs(self, idx, attr):
+        self.role[idx] = ROLE_CODE.get(attr.get("role"), NO_ROLE)
+        if attr.get("isFraudster") is not None:
+            self.is_fraudster[idx] = int(bool(attr["isFraudster"]))
+        if attr.get("role") == "account":
+            self.owner[idx] = self._intern(attr["owner"]) if attr.get("owner") is not None else NO_NODE
+            self.bank[idx] = self._intern(attr["bank"]) if attr.get("bank") is not None else NO_NODE
+            self.balance[idx] = attr.get("balance", 0.0)
+            self.status[idx] = STATUS_CODE[attr.get("status", "active")]
+            self.compromised[idx] = bool(attr.get("compromised", False))
+
+    def _add_edges(self, sources, targets, rel):
+        sources = np.atleast_1d(sources)
+        needed = self.m + len(sources)
+        if needed > len(self._edge_buf):
+            buf = np.empty((max(needed, 2 * len(self._edge_buf)), 3), dtype=np.int32)
+            buf[:self.m] = self._edge_buf[:self.m]
+            self._edge_buf = buf
+        self._edge_buf[self.m:needed, 0] = sources
+        self._edge_buf[self.m:needed, 1] = targets
+        self._edge_buf[self.m:needed, 2] = REL_CODE[rel]
+        self.m = needed
+
+    def _template_attrs(self, node_type, custom_attrs):
+        if node_type not in self.NODE_TEMPLATES:
+            raise ValueError(f"Unknown node type: '{node_type}'")
+        attr = self.NODE_TEMPLATES[node_type].copy()
+        if custom_attrs:
+            invalid_attr = [i for i in custom_attrs if i not in attr]
+            if invalid_attr:
+                raise ValueError(f"Invalid keys: {invalid_attr}")
+            attr.update(custom_attrs)
+        return attr
+
+    def add_node_with_attribute(self, node_id, node_type, custom_attrs=None):
+        """
+        Same contract as FraudEnv.add_node_with_attribute.
+        """
+        attr = self._template_attrs(node_type, custom_attrs)
+        idx = self._intern(node_id)
+        self._set_attrs(idx, attr)
+        if node_type == "account" and attr.get("owner") is not None and attr.get("bank") is not None:
+            self._add_edges(self.owner[idx], idx, "owns")
+            self._add_edges(self.bank[idx], idx, "hosts")
+        self._invalidate()
+        if self.verbose:
+            print(f"Successfully added node {node_id} as a {node_type} node.")
+
+    def add_nodes_bulk(self, node_type, nodes):
+        """
+        Same contract as FraudEnv.add_nodes_bulk. Columns and edges are written
+        with one vectorized assignment per attribute.
+        """
+        rows = [(self._intern(node_id), self._template_attrs(node_type, custom_attrs)) for node_id, custom_attrs in nodes]
+        if not rows:
+            return
+        idx = np.fromiter((i for i, _ in rows), dtype=np.int64, count=len(rows))
+        attrs = [a for _, a in rows]
+
+        self.role[idx] = [ROLE_CODE.get(a.get("role"), NO_ROLE) for a in attrs]
+        self.is_fraudster[idx] = [-1 if a.get("isFraudster") is None else int(bool(a["isFraudster"])) for a in attrs]
+
+        if node_type == "account":
+            owners = np.fromiter((self._intern(a["owner"]) for a in attrs), dtype=np.int32, count=len(attrs))
+            banks = np.fromiter((self._intern(a["bank"]) for a in attrs), dtype=np.int32, count=len(attrs))
+            self.owner[idx] = owners
+            self.bank[idx] = banks
+            self.balance[idx] = [a["balance"] for a in attrs]
+            self.status[idx] = [STATUS_CODE[a["status"]] for a in attrs]
+            self.compromised[idx] = [bool(a["compromised"]) for a in attrs]
+            self._add_edges(owners, idx, "owns")
+            self._add_edges(banks, idx, "hosts")
+        self._invalidate()
+
+    def add_ownership_edge(self, node_id1, node_id2):
+        self._add_edges(self._intern(node_id1), self._intern(node_id2), "owns")
+        self._invalidate()
+        if self.verbose:
+            print(f"Added ownership relationship between {node_id1} -> {node_id2}")
+
+    def reset(self):
+        self.ids = {}
+        self.names = []
+        self.n = 0
+        self.m = 0
+        self._edge_buf = np.empty((len(self.role), 3), dtype=np.int32)
+        self._alloc(len(self.role))
+        self._invalidate()
+        self.ledger = ledger.TransactionLedger(self)
+        if self.verbose:
+            print("Graph has been reset.")
+
+    def create_environment(self):
+        return fraud_env.FraudEnv.create_environment(self)
+
+    # ------------------------------------------------------------------
+    # indexes
+    # ------------------------------------------------------------------
+
+    def edge_csr(self):
+        """
+        Returns: (indptr, targets, rels) with the out-edges of node i in
+        targets[indptr[i]:indptr[i + 1]], duplicate edges removed
+        """
+        if self._csr is None:
+            edges = self._edge_buf[:self.m].astype(np.int64)
+            if len(edges):
+                edges = np.unique(edges, axis=0)   # sorted by source, then target
+            counts = np.bincount(edges[:, 0], minlength=self.n) if len(edges) else np.zeros(self.n, dtype=np.int64)
+            indptr = np.zeros(self.n + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            self._csr = (indptr, edges[:, 1].astype(np.int32), edges[:, 2].astype(np.int8))
+        return self._csr
+
+    def _group(self, name):
+        """
+        Groups node ids by a key column: role for every node, owner/bank for accounts.
+        Returns: (order, indptr) so ids with key k are order[indptr[k]:indptr[k + 1]]
+        """
+        if name not in self._groups:
+            if name == "role":
+                ids = np.arange(self.n)
+                keys = self.role[:self.n].astype(np.int64) + 1   # shift NO_ROLE to 0
+                size = len(ROLES) + 1
+            else:
+                ids = np.flatnonzero(self.role[:self.n] == ROLE_CODE["account"])
+                column = self.owner if name == "owner" else self.bank
+                keys = column[ids].astype(np.int64) + 1          # shift NO_NODE to 0
+                size = self.n + 1
+            order = ids[np.argsort(keys, kind="stable")]
+            indptr = np.zeros(size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+            self._groups[name] = (order, indptr)
+        return self._groups[name]
+
+    def _names_of(self, ids):
+        names = self.names
+        return [names[i] for i in ids.tolist()]
+
+    def _ids_with(self, name, key):
+        order, indptr = self._group(name)
+        return order[indptr[key + 1]:indptr[key + 2]]
+
+    # ------------------------------------------------------------------
+    # FraudEnv API
+    # ------------------------------------------------------------------
+
+    def get_nodes(self):
+        return list(self.names)
+
+    def get_edges(self):
+        indptr, targets, rels = self.edge_csr()
+        sources = np.repeat(np.arange(self.n), np.diff(indptr))
+        return [(self.names[u], self.names[v], {"rel": RELS[r]}) for u, v, r in zip(sources, targets, rels)]
+
+    def get_graph(self):
+        return self.to_networkx()
+
+    @property
+    def G(self):
+        return self.to_networkx()
+
+    def get_attr(self, node_id, key, default=None):
+        idx = self.ids[node_id]
+        role = self.role[idx]
+        if key == "role":
+            return ROLES[role] if role != NO_ROLE else default
+        if key == "isFraudster":
+            return default if self.is_fraudster[idx] < 0 else bool(self.is_fraudster[idx])
+        if role != ROLE_CODE["account"]:
+            return default
+        if key == "balance":
+            return float(self.balance[idx])
+        if key == "status":
+            return STATUSES[self.status[idx]]
+        if key == "compromised":
+            return bool(self.compromised[idx])
+        if key in ("owner", "bank"):
+            ref = (self.owner if key == "owner" else self.bank)[idx]
+            return self.names[ref] if ref != NO_NODE else default
+        return default
+
+    def node_attrs(self, idx):
+        """
+        Rebuilds the FraudEnv attribute dict of node `idx`.
+        """
+        role = self.role[idx]
+        if role == NO_ROLE:
+            return {}
+        name = self.names[idx]
+        if role == ROLE_CODE["bank"]:
+            return {"role": "bank"}
+        if role == ROLE_CODE["account"]:
+            keys = ["role", "owner", "bank", "balance", "status", "compromised"]
+        else:
+            keys = ["role", "isFraudster"]
+        return {k: self.get_attr(name, k) for k in keys}
+
+    def iter_roles(self):
+        for name, role in zip(self.names, self.role[:self.n].tolist()):
+            yield name, ROLES[role] if role != NO_ROLE else None
+
+    def get_nodes_by_role(self, role):
+        return self._names_of(self._ids_with("role", ROLE_CODE[role])) if role in ROLE_CODE else []
+
+    def get_individuals(self):
+        return self.get_nodes_by_role("individual")
+
+    def get_fraudsters(self):
+        return self.get_nodes_by_role("fraudster")
+
+    def get_banks(self):
+        return self.get_nodes_by_role("bank")
+
+    def get_acc(self):
+        return self.get_nodes_by_role("account")
+
+    def sample_node(self, role):
+        ids = self._ids_with("role", ROLE_CODE[role])
+        if not len(ids):
+            raise IndexError(f"No nodes with role '{role}'")
+        return self.names[ids[random.randrange(len(ids))]]
+
+    def sample_nodes(self, role, k):
+        ids = self._ids_with("role", ROLE_CODE[role]) if role in ROLE_CODE else []
+        return [self.names[ids[i]] for i in random.sample(range(len(ids)), min(k, len(ids)))]
+
+    def get_accounts_of(self, owner):
+        idx = self.ids.get(owner)
+        return [] if idx is None else self._names_of(self._ids_with("owner", idx))
+
+    def get_bank_accounts(self, bank):
+        idx = self.ids.get(bank)
+        return [] if idx is None else self._names_of(self._ids_with("bank", idx))
+
+    def update_balance(self, acc_from, acc_to, amount):
+        self.balance[self.ids[acc_from]] -= amount
+        self.balance[self.ids[acc_to]] += amount
+        self._nx = None
+
+    def _lookup(self, accounts):
+        return np.fromiter((self.ids.get(a, NO_NODE) for a in accounts), dtype=np.int64, count=len(accounts))
+
+    def account_state(self, accounts):
+        """
+        Same contract as FraudEnv.account_state, gathered straight from the columns.
+        """
+        idx = self._lookup(accounts)
+        safe = np.where(idx >= 0, idx, 0)
+        known = (idx >= 0) & (self.role[safe] == ROLE_CODE["account"])
+        balance = np.where(known, self.balance[safe], 0.0)
+        frozen = known & (self.status[safe] == STATUS_CODE["frozen"])
+        compromised = known & self.compromised[safe]
+        return known, balance, frozen, compromised
+
+    def add_to_balances(self, accounts, deltas):
+        idx = self._lookup(accounts)
+        unknown = np.flatnonzero(idx < 0)
+        if len(unknown):
+            # NO_NODE would index the last slot, like FraudEnv a missing account is a KeyError
+            raise KeyError(accounts[int(unknown[0])])
+        np.add.at(self.balance, idx, deltas)
+        self._nx = None
+
+    def apply_transfers(self, acc_from, acc_to, amounts):
+        """
+        Same contract as FraudEnv.apply_transfers.
+        """
+        return self.ledger.apply(acc_from, acc_to, amounts)
+
+    def to_networkx(self):
+        """
+        Exports to a networkx DiGraph equivalent to what FraudEnv would hold.
+        The export is cached until the next mutation.
+        """
+        if self._nx is None:
+            G = nx.DiGraph()
+            G.add_nodes_from((self.names[i], self.node_attrs(i)) for i in range(self.n))
+            G.add_edges_from(self.get_edges())
+            self._nx = G
+        return self._nx
+
+    def nbytes(self):
+        """
+        Bytes held by the NumPy columns and the edge list (excludes the id dict and name list).
+        """
+        columns = [self.role, self.is_fraudster, self.balance, self.status, self.compromised, self.owner, self.bank]
+        csr = self.edge_csr()
+        return sum(c.nbytes for c in columns) + sum(a.nbytes for a in csr)
+
+    def __str__(self):
+        return f"ArrayFraudEnv with {self.n} nodes and {len(self.edge_csr()[1])} edges."
+
+    def draw_graph(self):
+        env = fraud_env.FraudEnv(verbose=False)
+        env.G = self.to_networkx()
+        env.draw_graph()
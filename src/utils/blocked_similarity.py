@@ -0,0 +1,131 @@
+"""
+Blocked Similarity - pairwise cosine statistics without the N x N matrix
+Walks the upper triangle of the similarity matrix in block_size x block_size
+tiles on a thread pool (the matmul releases the GIL), keeping only running
+sums, a fixed-range histogram and the current top-k pairs. Memory is
+O(workers * block_size^2) instead of O(N^2): 100k sequences need a few
+hundred MB instead of 40 GB.
+"""
+
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class SimilarityStats(NamedTuple):
+    mean: float
+    pairs: int
+    histogram: np.ndarray          # counts per bin over bin_edges
+    bin_edges: np.ndarray          # bins + 1 edges spanning [-1, 1]
+    top_pairs: List[Tuple[float, int, int]]   # (similarity, i, j), i < j, most similar first
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Returns a float32 copy with unit-norm rows (zero rows stay zero), as cosine_similarity does.
+    """
+    x = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def iter_blocks(n: int, block_size: int, m: Optional[int] = None) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    Yields (i0, i1, j0, j1) tiles covering the upper triangle of an n x n
+    matrix, diagonal tiles included, or the whole n x m matrix if m is given.
+    """
+    for i0 in range(0, n, block_size):
+        for j0 in range(i0 if m is None else 0, n if m is None else m, block_size):
+            yield i0, min(i0 + block_size, n), j0, min(j0 + block_size, n if m is None else m)
+
+
+def _tile_stats(x: np.ndarray, y: Optional[np.ndarray], tile, edges: np.ndarray, top_k: int):
+    i0, i1, j0, j1 = tile
+    sims = x[i0:i1] @ (x if y is None else y)[j0:j1].T
+    if y is None and i0 == j0:
+        # diagonal tile: only pairs with i < j
+        rows, cols = np.triu_indices(i1 - i0, k=1, m=j1 - j0)
+        values = sims[rows, cols]
+    else:
+        rows = cols = None
+        values = sims.ravel()
+
+    total = float(values.sum(dtype=np.float64))
+    hist = np.histogram(values, bins=edges)[0]
+
+    top = []
+    if top_k and values.size:
+        k = min(top_k, values.size)
+        best = np.argpartition(values, values.size - k)[values.size - k:]
+        for flat in best:
+            if rows is None:
+                r, c = divmod(int(flat), j1 - j0)
+            else:
+                r, c = int(rows[flat]), int(cols[flat])
+            top.append((float(values[flat]), i0 + r, j0 + c))
+    return total, values.size, hist, top
+
+
+def pairwise_stats(embeddings: np.ndarray, block_size: int = 2048, bins: int = 40, top_k: int = 10,
+                   workers: Optional[int] = None, normalized: bool = False,
+                   other: Optional[np.ndarray] = None) -> SimilarityStats:
+    """
+    Mean, histogram and top-k most similar pairs of the pairwise cosine
+    similarities between distinct rows of `embeddings`, or between every
+    row of `embeddings` and every row of `other`.
+
+    Args:
+        embeddings: (n, d) matrix
+        block_size: tile edge, peak memory is about workers * block_size^2 * 4 bytes
+        bins: histogram bins over [-1, 1]
+        top_k: most similar pairs to return, 0 to skip
+        workers: threads, defaults to os.cpu_count()
+        normalized: rows are already unit-norm (e.g. normalize_embeddings=True), skip the copy
+        other: (m, d) matrix for cross-set stats; pairs are then (row of embeddings, row of other)
+    Returns:
+        SimilarityStats
+    """
+    prep = (lambda e: np.ascontiguousarray(e, dtype=np.float32)) if normalized else normalize_rows
+    x = prep(embeddings)
+    y = None if other is None else prep(other)
+    n = x.shape[0]
+    edges = np.linspace(-1.0, 1.0, bins + 1)
+    # float32 rounding can put near-duplicate pairs a hair outside [-1, 1]
+    edges[0], edges[-1] = -1.0 - 1e-6, 1.0 + 1e-6
+
+    total, count = 0.0, 0
+    hist = np.zeros(bins, dtype=np.int64)
+    top: List[Tuple[float, int, int]] = []
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for tile_total, tile_count, tile_hist, tile_top in pool.map(
+                lambda tile: _tile_stats(x, y, tile, edges, top_k),
+                iter_blocks(n, block_size, None if y is None else y.shape[0])):
+            total += tile_total
+            count += tile_count
+            hist += tile_hist
+            for item in tile_top:
+                if len(top) < top_k:
+                    heapq.heappush(top, item)
+                elif item > top[0]:
+                    heapq.heapreplace(top, item)
+
+    return SimilarityStats(
+        mean=total / count if count else float("nan"),
+        pairs=count,
+        histogram=hist,
+        bin_edges=edges,
+        top_pairs=sorted(top, reverse=True),
+    )
+
+
+def mean_similarity(embeddings: np.ndarray, block_size: int = 2048, workers: Optional[int] = None,
+                    normalized: bool = False) -> float:
+    """
+    Blocked equivalent of similarity_check.avg_similarity.
+    """
+    return pairwise_stats(embeddings, block_size=block_size, top_k=0, workers=workers, normalized=normalized).mean
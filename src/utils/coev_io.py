@@ -0,0 +1,171 @@
+"""
+Coev file I/O - one reader for every co-evolution dataset layout
+Handles the {"<id>": {"label", "sequence"}} JSON dict (coev_seq_v2.json)
+and JSON-lines records with "id", "label", "sequence" (coev_seq_v1.json,
+*.jsonl), whatever the file extension. CoevLog appends JSON-lines records
+for generation runs that must survive a crash; it refuses JSON dict files,
+which cannot be appended to.
+"""
+
+import json
+import os
+from typing import Iterator, Tuple, List
+
+
+def _is_record(line: str) -> bool:
+    line = line.strip()
+    return line.startswith("{") and line.endswith("}")
+
+
+def is_jsonl(path: str) -> bool:
+    """
+    True if the coev file at path is JSON-lines (or missing or empty), False
+    for a JSON dict spread over several lines, e.g. written by json.dump(indent=4).
+    A single line without its newline counts as JSON-lines, whole or torn.
+    """
+    if not os.path.exists(path):
+        return True
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                return _is_record(line) or not line.endswith("\n")
+    return True
+
+
+def iter_coev(path: str) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    Yields (seq_id, label, sequence) for every record in a coev file.
+    JSON-lines files are streamed, JSON dict files are loaded whole.
+    """
+    with open(path, "r") as f:
+        first = ""
+        while not first:
+            line = f.readline()
+            if not line:
+                return
+            first = line.strip()
+        f.seek(0)
+
+        if _is_record(first):
+            # JSON-lines, one record per line
+            for n, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "sequence" not in record:
+                    # a whole {"<id>": {...}} dict written on one line
+                    for seq_id, value in record.items():
+                        yield str(seq_id), value.get("label"), value.get("sequence")
+                    continue
+                yield str(record.get("id", n)), record.get("label"), record.get("sequence")
+            return
+
+        data = json.load(f)
+        for seq_id, value in data.items():
+            yield str(seq_id), value.get("label"), value.get("sequence")
+
+
+def load_coev(path: str) -> dict:
+    """
+    Loads any coev file into the {"<id>": {"label", "sequence"}} layout used by the detector.
+    """
+    return {seq_id: {"label": label, "sequence": sequence} for seq_id, label, sequence in iter_coev(path)}
+
+
+def next_free_id(path: str) -> int:
+    """
+    One past the largest integer id in the coev file at path, 0 if it does not
+    exist, so a log appended to across runs keeps its ids unique.
+    """
+    if not os.path.exists(path):
+        return 0
+    return max((int(seq_id) + 1 for seq_id, __, __ in iter_coev(path)), default=0)
+
+
+def truncate_partial_line(path: str) -> int:
+    """
+    Drops a trailing line without its newline, left behind by a crash mid-write.
+    A last line that is still valid JSON is kept and gets its newline instead.
+
+    Returns:
+        number of bytes removed
+    Raises:
+        ValueError: if path is a multi-line JSON dict file, whose closing
+            brace has no newline either but is not a torn record
+    """
+    if not os.path.exists(path):
+        return 0
+    if not is_jsonl(path):
+        raise ValueError(f"{path} is a JSON dict coev file, not JSON-lines; convert it before appending to it")
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            block = f.read(end - start)
+            if end == size and block.endswith(b"\n"):
+                return 0
+            cut = block.rfind(b"\n")
+            if cut >= 0:
+                keep = start + cut + 1
+                break
+            end = start
+        else:
+            keep = 0
+        f.seek(keep)
+        try:
+            json.loads(f.read())
+        except ValueError:
+            f.truncate(keep)
+            return size - keep
+        # a complete record (or one-line dict) that only lacks its newline
+        f.write(b"\n")
+        return 0
+
+
+class CoevLog:
+    """
+    Append-only JSON-lines coev file, readable with iter_coev. Every record
+    is flushed to the OS as it is written, and fsync'd in batches of
+    fsync_every, so a process crash loses nothing and a machine crash at
+    most the last batch. Reopening drops a torn last line.
+
+    Args:
+        path: JSONL file, created if missing; a JSON dict file raises ValueError
+        fsync_every: records between fsyncs
+    """
+
+    def __init__(self, path: str, fsync_every: int = 16):
+        self.path = path
+        self.fsync_every = fsync_every
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        truncate_partial_line(path)
+        self._f = open(path, "a")
+        self._unsynced = 0
+
+    def append(self, seq_id, label: str, sequence: List[str], **extra):
+        self._f.write(json.dumps({"id": seq_id, "label": label, "sequence": sequence, **extra}) + "\n")
+        self._f.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._f.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,154 @@
+"""
+Corpus Validator - bulk syntax + semantic validation of coev datasets
+Streams a coev JSON/JSONL file, validates every sequence with
+UniversalRulesValidator across a process pool and reports per-sequence
+error records plus aggregate rule-violation counts.
+
+Usage (from repo root):
+    python -m src.utils.corpus_validator data/test/coev_seq_v2.json --errors data/test/coev_seq_v2_errors.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import src.utils.pydantic_validator as pv
+import src.utils.step_parser as step_parser
+from src.utils.coev_io import iter_coev
+
+# validator of the current worker process, set by _init_worker
+_validator: Optional[pv.UniversalRulesValidator] = None
+
+
+def _init_worker(entity_registry: Dict[str, pv.Entity]):
+    global _validator
+    _validator = pv.UniversalRulesValidator(entity_registry)
+
+
+def validate_record(validator: pv.UniversalRulesValidator, seq_id: str, label: str, sequence) -> dict:
+    """
+    Validates one sequence. Both stages always run so an audit sees every
+    violation, unlike the planner which stops at the first failing stage.
+
+    Returns:
+        {"id", "label", "valid", "syntax_ok", "semantic_ok", "violations": [{"stage", "step", "rule", "message"}]}
+    """
+    if not isinstance(sequence, list):
+        violations = [{"stage": "syntax", "step": None, "rule": "not_a_list", "message": "sequence is not a list"}]
+    else:
+        parsed = step_parser.parse_sequence(sequence)
+        violations = [{"stage": "syntax", "step": i, "rule": rule, "message": msg}
+                      for i, rule, msg in validator.syntax_violations(parsed)]
+        violations += [{"stage": "semantic", "step": i, "rule": rule, "message": msg}
+                       for i, rule, msg in validator.semantic_violations(parsed)]
+
+    syntax_ok = not any(v["stage"] == "syntax" for v in violations)
+    semantic_ok = not any(v["stage"] == "semantic" for v in violations)
+    return {
+        "id": seq_id,
+        "label": label,
+        "valid": syntax_ok and semantic_ok,
+        "syntax_ok": syntax_ok,
+        "semantic_ok": semantic_ok,
+        "violations": violations,
+    }
+
+
+def _validate_chunk(chunk: List[tuple]) -> List[dict]:
+    return [validate_record(_validator, *item) for item in chunk]
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_corpus(path: str, entity_registry: Dict[str, pv.Entity], processes: Optional[int] = None,
+                    chunk_size: int = 256, errors_path: Optional[str] = None, include_valid: bool = False) -> dict:
+    """
+    Validates every sequence of a coev file.
+
+    Args:
+        path: coev JSON dict or JSONL file, streamed through coev_io.iter_coev
+        entity_registry: {name: Entity} the sequences are checked against
+        processes: worker processes, None for os.cpu_count(), 1 to validate inline
+        chunk_size: sequences sent to a worker per task
+        errors_path: if set, per-sequence records are written here as JSON lines
+        include_valid: also write records of valid sequences to errors_path
+    Returns:
+        summary dict with totals, per-label counts, and per-rule violation
+        counts ("rule_counts") and affected-sequence counts ("sequence_counts")
+    """
+    summary = {
+        "sequences": 0,
+        "valid": 0,
+        "syntax_invalid": 0,
+        "semantic_invalid": 0,
+        "by_label": {},
+        "rule_counts": Counter(),
+        "sequence_counts": Counter(),
+    }
+
+    chunks = _chunks(iter_coev(path), chunk_size)
+    if processes == 1:
+        _init_worker(entity_registry)
+        results = map(_validate_chunk, chunks)
+        pool = None
+    else:
+        pool = mp.Pool(processes, initializer=_init_worker, initargs=(entity_registry,))
+        results = pool.imap(_validate_chunk, chunks)
+
+    out = open(errors_path, "w") if errors_path else None
+    try:
+        for records in results:
+            for record in records:
+                summary["sequences"] += 1
+                summary["valid"] += record["valid"]
+                summary["syntax_invalid"] += not record["syntax_ok"]
+                summary["semantic_invalid"] += not record["semantic_ok"]
+
+                label_counts = summary["by_label"].setdefault(record["label"], {"sequences": 0, "valid": 0})
+                label_counts["sequences"] += 1
+                label_counts["valid"] += record["valid"]
+
+                rules = [f"{v['stage']}/{v['rule']}" for v in record["violations"]]
+                summary["rule_counts"].update(rules)
+                summary["sequence_counts"].update(set(rules))
+
+                if out and (include_valid or not record["valid"]):
+                    out.write(json.dumps(record) + "\n")
+    finally:
+        if out:
+            out.close()
+        if pool:
+            pool.close()
+            pool.join()
+
+    summary["rule_counts"] = dict(summary["rule_counts"].most_common())
+    summary["sequence_counts"] = dict(summary["sequence_counts"].most_common())
+    return summary
+
+
+if __name__ == "__main__":
+    import src.utils.fraud_env as fraud_env
+
+    parser = argparse.ArgumentParser(description="Validate every sequence of a coev dataset")
+    parser.add_argument("path", help="coev JSON or JSONL file")
+    parser.add_argument("--errors", default=None, help="write per-sequence error records to this JSONL file")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--include-valid", action="store_true")
+    args = parser.parse_args()
+
+    env = fraud_env.FraudEnv(verbose=False).create_environment()
+    summary = validate_corpus(args.path, pv.build_entity_registry(env), processes=args.processes,
+                              chunk_size=args.chunk_size, errors_path=args.errors,
+                              include_valid=args.include_valid)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,154 @@
+"""
+Embedding Store - persistent sentence embeddings keyed by content hash
+Keeps a memory-mapped float32 matrix (one row per distinct text) and a JSON
+index from the text's SHA-1 to its row. Asking for a batch of texts only
+encodes the ones not stored yet, in batches of batch_size on the CPU, so
+tracking diversity across co-evolution rounds costs model inference for the
+new sequences only instead of the whole corpus.
+"""
+
+import hashlib
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_STORE_DIR = os.path.join("data", "cache", "embeddings")
+
+_models = {}
+
+
+def load_model(name: str = EMBEDDING_MODEL):
+    """
+    Returns the SentenceTransformer `name` on the CPU, loading it once per process.
+    """
+    if name not in _models:
+        from sentence_transformers import SentenceTransformer
+        _models[name] = SentenceTransformer(name, device="cpu")
+    return _models[name]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Args:
+        directory: where embeddings.f32 and index.json live, created if missing
+        model_name: sentence-transformers model, loaded on the first encode
+        batch_size: texts per encode call
+        encoder: object with a SentenceTransformer-style encode(), overrides model_name
+        initial_capacity: rows allocated when the store is created, doubled when full
+    """
+
+    def __init__(self, directory: str = DEFAULT_STORE_DIR, model_name: str = EMBEDDING_MODEL,
+                 batch_size: int = 64, encoder=None, initial_capacity: int = 1024):
+        self.directory = directory
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._encoder = encoder
+        self.initial_capacity = initial_capacity
+        self.encoded = 0   # texts encoded by this instance
+        self.hits = 0      # texts served from the store
+
+        os.makedirs(directory, exist_ok=True)
+        self._matrix_path = os.path.join(directory, "embeddings.f32")
+        self._index_path = os.path.join(directory, "index.json")
+
+        self.index = {}
+        self.dim = None
+        self.capacity = 0
+        self._matrix: Optional[np.memmap] = None
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                meta = json.load(f)
+            if meta["model"] != model_name and encoder is None:
+                raise ValueError(f"store at {directory} holds {meta['model']} embeddings, not {model_name}")
+            self.index = meta["index"]
+            self.dim = meta["dim"]
+            self.capacity = meta["capacity"]
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = load_model(self.model_name)
+        return self._encoder
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, text: str) -> bool:
+        return content_hash(text) in self.index
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        Read-only view of the stored rows, in insertion order.
+        """
+        if self._matrix is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        view = self._matrix[:len(self.index)]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, rows: int):
+        if self._matrix is not None and rows <= self.capacity:
+            return
+        capacity = max(self.initial_capacity, self.capacity)
+        while capacity < rows:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        with open(self._matrix_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _save_index(self):
+        meta = {"model": self.model_name, "dim": self.dim, "capacity": self.capacity, "index": self.index}
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._index_path)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns the normalised embeddings of `texts`, encoding only those
+        whose content hash is not stored yet.
+
+        Returns:
+            (len(texts), dim) float32 array
+        """
+        keys = [content_hash(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+
+        if missing:
+            new_keys, new_texts = list(missing), list(missing.values())
+            for start in range(0, len(new_texts), self.batch_size):
+                batch = self.encoder.encode(new_texts[start:start + self.batch_size], batch_size=self.batch_size,
+                                            convert_to_numpy=True, normalize_embeddings=True)
+                batch = np.asarray(batch, dtype=np.float32)
+                if self.dim is None:
+                    self.dim = batch.shape[1]
+                first = len(self.index)
+                self._reserve(first + len(batch))
+                self._matrix[first:first + len(batch)] = batch
+                for offset, key in enumerate(new_keys[start:start + len(batch)]):
+                    self.index[key] = first + offset
+            self.encoded += len(new_texts)
+            # rows first, then the index that points at them
+            self._matrix.flush()
+            self._save_index()
+
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._matrix[[self.index[key] for key in keys]])
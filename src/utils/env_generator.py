@@ -0,0 +1,110 @@
+"""
+Synthetic Environment Generator - large, reproducible FraudEnv graphs
+Builds environments with configurable role counts, accounts per owner,
+bank market shares and balance distributions from a seeded RNG.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+import src.utils.fraud_env as fraud_env
+
+
+ORGANIZATION_ROLES = ["utility", "telecom", "restaurant", "institution"]
+
+# (median, sigma) of a log-normal balance per participant role; median 0 means always empty
+DEFAULT_BALANCES: Dict[str, Tuple[float, float]] = {
+    "individual": (10000.0, 1.0),
+    "organization": (300000.0, 1.2),
+    "fraudster": (0.0, 0.0),
+}
+
+
+def zipf_shares(num_banks: int, s: float = 1.0) -> np.ndarray:
+    """
+    Market shares where the k-th largest bank holds weight 1/k^s.
+    """
+    weights = 1.0 / np.arange(1, num_banks + 1) ** s
+    return weights / weights.sum()
+
+
+def _draw_balances(rng, n, median, sigma) -> np.ndarray:
+    if median <= 0:
+        return np.zeros(n)
+    return np.round(rng.lognormal(np.log(median), sigma, n), 2)
+
+
+def generate_environment(num_banks: int = 5, num_individuals: int = 1000, num_fraudsters: int = 10,
+                         num_organizations: int = 50, accounts_per_owner: Tuple[int, int] = (1, 1),
+                         bank_shares: Optional[Sequence[float]] = None,
+                         balances: Optional[Dict[str, Tuple[float, float]]] = None,
+                         seed: int = 0, env=None):
+    """
+    Builds a synthetic fraud environment.
+
+    Args:
+        num_banks, num_individuals, num_fraudsters, num_organizations: node counts per role
+        accounts_per_owner: inclusive (min, max) accounts drawn uniformly per participant
+        bank_shares: probability that an account is hosted by each bank, defaults to zipf_shares
+        balances: per-role (median, sigma) overrides of DEFAULT_BALANCES
+        seed: RNG seed, the same arguments and seed always give the same graph
+        env: environment to fill, defaults to a new silent FraudEnv
+    Returns:
+        the populated environment
+    """
+    rng = np.random.default_rng(seed)
+    env = env if env is not None else fraud_env.FraudEnv(verbose=False)
+    balances = {**DEFAULT_BALANCES, **(balances or {})}
+
+    banks = [f"bank_{i}" for i in range(num_banks)]
+    shares = np.asarray(bank_shares if bank_shares is not None else zipf_shares(num_banks), dtype=float)
+    if len(shares) != num_banks:
+        raise ValueError(f"bank_shares has {len(shares)} entries for {num_banks} banks")
+    shares = shares / shares.sum()
+
+    env.add_nodes_bulk("bank", ((b, None) for b in banks))
+
+    groups = [
+        ("individual", [f"person_{i}" for i in range(num_individuals)],
+         ["individual"] * num_individuals),
+        ("organization", [f"org_{i}" for i in range(num_organizations)],
+         [ORGANIZATION_ROLES[i % len(ORGANIZATION_ROLES)] for i in range(num_organizations)]),
+        ("fraudster", [f"fraudster_{i}" for i in range(num_fraudsters)],
+         ["fraudster"] * num_fraudsters),
+    ]
+
+    lo, hi = accounts_per_owner
+    for group, owners, roles in groups:
+        if not owners:
+            continue
+        is_fraudster = group == "fraudster"
+        env.add_nodes_bulk("participant", (
+            (owner, {"role": role, "isFraudster": is_fraudster}) for owner, role in zip(owners, roles)
+        ))
+
+        counts = rng.integers(lo, hi + 1, len(owners))
+        total = int(counts.sum())
+        bank_ids = rng.choice(num_banks, size=total, p=shares)
+        median, sigma = balances[group]
+        amounts = _draw_balances(rng, total, median, sigma)
+
+        owner_of = np.repeat(np.arange(len(owners)), counts)
+        # k-th account of an owner: acc_<owner> for k == 0, acc_<owner>_<k> after that
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        nth = np.arange(total) - starts
+
+        env.add_nodes_bulk("account", (
+            (f"acc_{owners[o]}" if k == 0 else f"acc_{owners[o]}_{k}",
+             {"owner": owners[o], "bank": banks[b], "balance": float(bal)})
+            for o, k, b, bal in zip(owner_of.tolist(), nth.tolist(), bank_ids.tolist(), amounts.tolist())
+        ))
+
+    return env
+
+
+if __name__ == "__main__":
+    env = generate_environment(num_individuals=20, num_fraudsters=3, num_organizations=4, accounts_per_owner=(1, 2))
+    print(env)
+    print(env.get_banks())
+    print(env.get_accounts_of("person_0"))
@@ -0,0 +1,345 @@
+"""
+Fake Ollama Server - in-process, deterministic stand-in for /api/generate
+Lets throughput benchmarks and experiments run without a GPU or a real
+Ollama install. Responses are a pure function of the request body.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional, Tuple
+
+import src.utils.step_parser as step_parser
+
+
+FRAUD_WORDS = ["phish", "imperson", "posed", "pose as", "fake", "takeover", "sim swap",
+               "credential", "scam", "fraud", "hack", "breach", "malicious"]
+
+PATTERNS = (
+    "pattern_number;pattern_name\n"
+    "1;impersonation of an authority to create urgency\n"
+    "2;phishing to obtain credentials\n"
+    "3;credential disclosure followed by account access\n"
+    "4;account takeover followed by unauthorized transfer\n"
+    "5;transfer to an account with no prior relationship"
+)
+
+
+# one generated "token": a word with its leading whitespace
+_TOKEN_RE = re.compile(r"\s*\S+")
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _classify(seq: str) -> str:
+    seq = seq.lower()
+    return "fraud" if any(w in seq for w in FRAUD_WORDS) else "legit"
+
+
+def _fraud_sequence(prompt: str) -> str:
+    fields = {}
+    for key in ["Victim", "Victim Account", "Fraudster", "Fraudster Account", "Transfer Amount"]:
+        m = re.search(rf"- {key}: (\S+)", prompt)
+        fields[key] = m.group(1) if m else key.lower().replace(" ", "_")
+
+    hooks = [
+        ("posed as", "phone", "claimed to be a tax officer"),
+        ("phishing", "email", "sent a fake login link"),
+        ("impersonation", "sms", "posed as the bank fraud team"),
+    ]
+    action, channel, desc = hooks[_digest(prompt) % len(hooks)]
+    v, v_acc = fields["Victim"], fields["Victim Account"]
+    f, f_acc = fields["Fraudster"], fields["Fraudster Account"]
+
+    return json.dumps({"sequence": [
+        f"action({f}, {action}, {v}, {channel}, {desc})",
+        f"action({v}, shared credentials, {f}, {channel}, sent login details)",
+        f"action({f}, account takeover, {v_acc}, online, gained full access)",
+        f"transaction({v_acc}, fast payment, {f_acc}, {fields['Transfer Amount']})",
+    ]})
+
+
+def _legit_sequence(prompt: str) -> str:
+    def names(kind):
+        m = re.search(rf"- (.+?) as entities for {kind}", prompt)
+        return [x.strip() for x in m.group(1).split(",")] if m else []
+
+    individuals = names("individuals")
+    accounts = set(names("accounts"))
+    if len(individuals) < 2:
+        return json.dumps({"sequence": []})
+
+    i = _digest(prompt) % len(individuals)
+    payer, payee = individuals[i], individuals[(i + 1) % len(individuals)]
+    payer_acc = f"acc_{payer}" if f"acc_{payer}" in accounts else f"acc_{payer}".lower()
+    payee_acc = f"acc_{payee}" if f"acc_{payee}" in accounts else f"acc_{payee}".lower()
+
+    return json.dumps({"sequence": [
+        f"action({payee}, service, {payer}, in-person, tutored for one month)",
+        f"action({payer}, payment, {payee}, app, paid tutoring invoice)",
+        f"transaction({payer_acc}, fast payment, {payee_acc}, 150.0)",
+    ]})
+
+
+def structure_response(text: str) -> str:
+    """
+    Rewrites a {"sequence": ["action(...)", ...]} completion into the step
+    objects a schema-constrained model would emit. Steps that do not parse
+    are dropped, since constrained decoding could not have produced them.
+    """
+    try:
+        sequence = json.loads(text)["sequence"]
+    except (ValueError, TypeError, KeyError):
+        return text
+    if not isinstance(sequence, list):
+        return text
+    steps = []
+    for step in sequence:
+        if isinstance(step, str):
+            parsed = step_parser.parse_step(step)
+            if parsed.kind != "invalid":
+                steps.append({"kind": parsed.kind, **parsed.data})
+        elif isinstance(step, dict):
+            steps.append(step)
+    return json.dumps({"sequence": steps})
+
+
+def default_responder(request: dict) -> str:
+    """
+    Deterministic response for the prompts used in this repo.
+
+    Args:
+        request: decoded /api/generate body
+    Returns:
+        completion text
+    """
+    prompt = request.get("prompt", "")
+
+    if "binary classifier" in prompt:
+        seq = prompt.split("Input sequence:")[-1].split("Output:")[0]
+        return _classify(seq)
+    if prompt.startswith("Explain why you classified"):
+        return "The sequence was classified based on the entities and actions involved."
+    if "pattern_number;pattern_name" in prompt:
+        return PATTERNS
+    if "- Victim:" in prompt:
+        return _fraud_sequence(prompt)
+    if "entities for individuals" in prompt:
+        return _legit_sequence(prompt)
+    return "ok"
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server that answers /api/generate like Ollama.
+
+    Requests with a JSON schema `format` get their completion rewritten into
+    step objects (structure_response). Requests with "stream": true are answered as Ollama does, with one
+    newline-delimited JSON chunk per token. Generation stops when the client
+    disconnects, and tokens_generated only counts tokens actually produced.
+
+    With `capacity` set the server simulates load: a request arriving while n
+    requests are active is slowed by max(1, n / capacity), as if the GPU were
+    shared between them. With `max_queue` set, requests beyond that many
+    active ones are rejected with 503, like Ollama's OLLAMA_MAX_QUEUE.
+
+    Args:
+        responder: callable(request_dict) -> completion text, defaults to default_responder
+        latency: seconds to sleep before answering each request
+        port: port to bind on 127.0.0.1, 0 picks a free one
+        token_latency: seconds to "generate" each whitespace-delimited token
+        prompt_token_latency: seconds of prefill per prompt word, so longer prompts answer slower
+        capacity: requests served at full speed in parallel, None for no slowdown under load
+        max_queue: active requests beyond which new ones get 503, None for no limit
+
+    Usage:
+        with FakeOllamaServer() as server:
+            backend = OllamaBackend(host=server.url)
+    """
+
+    def __init__(self, responder: Optional[Callable[[dict], str]] = None, latency: float = 0.0, port: int = 0,
+                 token_latency: float = 0.0, prompt_token_latency: float = 0.0,
+                 capacity: Optional[int] = None, max_queue: Optional[int] = None):
+        self.responder = responder or default_responder
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.requests_served = 0
+        self.requests_rejected = 0
+        self.tokens_generated = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _admit(self) -> bool:
+        with self._lock:
+            if self.max_queue is not None and self.active >= self.max_queue:
+                self.requests_rejected += 1
+                return False
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return True
+
+    def _leave(self):
+        with self._lock:
+            self.active -= 1
+
+    def _slowdown(self) -> float:
+        if not self.capacity:
+            return 1.0
+        with self._lock:
+            return max(1.0, self.active / self.capacity)
+
+    def _begin(self, request: dict) -> Tuple[str, float]:
+        with self._lock:
+            self.requests_served += 1
+        slowdown = self._slowdown()
+        delay = self.latency + self.prompt_token_latency * len(request.get("prompt", "").split())
+        if delay:
+            time.sleep(delay * slowdown)
+        text = self.responder(request)
+        if isinstance(request.get("format"), dict):
+            text = structure_response(text)
+        return text, self.token_latency * slowdown
+
+    def _count_tokens(self, n: int):
+        with self._lock:
+            self.tokens_generated += n
+
+    def respond(self, request: dict) -> dict:
+        """
+        Builds the full response body for one request.
+        """
+        text, token_latency = self._begin(request)
+        tokens = _TOKEN_RE.findall(text)
+        decode_start = time.perf_counter()
+        if token_latency:
+            time.sleep(token_latency * len(tokens))
+        self._count_tokens(len(tokens))
+        return {
+            "model": request.get("model", ""),
+            "response": text,
+            "done": True,
+            "prompt_eval_count": len(request.get("prompt", "").split()),
+            "eval_count": len(text.split()),
+            "eval_duration": int((time.perf_counter() - decode_start) * 1e9),
+        }
+
+    def stream(self, request: dict) -> Iterator[dict]:
+        """
+        Yields the streamed chunks for one request, one token per chunk.
+        """
+        text, token_latency = self._begin(request)
+        tokens = _TOKEN_RE.findall(text)
+        decode_start = time.perf_counter()
+        for token in tokens:
+            if token_latency:
+                time.sleep(token_latency)
+            self._count_tokens(1)
+            yield {"model": request.get("model", ""), "response": token, "done": False}
+        yield {
+            "model": request.get("model", ""),
+            "response": "",
+            "done": True,
+            "prompt_eval_count": len(request.get("prompt", "").split()),
+            "eval_count": len(tokens),
+            "eval_duration": int((time.perf_counter() - decode_start) * 1e9),
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # keep-alive clients otherwise hit Nagle + delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self._send(404, {"error": "not found"})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, {"error": "invalid json"})
+                    return
+                if not server._admit():
+                    self._send(503, {"error": "server busy, please try again.  maximum pending requests exceeded"})
+                    return
+                try:
+                    if request.get("stream"):
+                        self._stream(server.stream(request))
+                    else:
+                        self._send(200, server.respond(request))
+                finally:
+                    server._leave()
+
+            def _stream(self, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        data = (json.dumps(chunk) + "\n").encode("utf-8")
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # client went away: stop generating, like Ollama on a cancelled request
+                    chunks.close()
+                    self.close_connection = True
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    with FakeOllamaServer() as server:
+        print(f"Fake Ollama listening on {server.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -1,27 +1,43 @@
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
+import random
+from collections import defaultdict
+import src.utils.ledger as ledger
+
+# default attributes of every node type, shared by FraudEnv and ArrayFraudEnv
+NODE_TEMPLATES = {
+    "participant": {
+        "role": None, # Either individual or fraudster
+        "isFraudster": None, #True or False
+    },
+    "bank": {
+        "role": "bank",
+    },
+    "account": {
+        "role": "account",
+        "owner": None,
+        "bank": None,
+        "balance": 0.0,
+        "status": "active",  # could be 'active', 'flagged', 'frozen', etc.
+        "compromised": False
+    }
+}
 
 class FraudEnv():
-    def __init__(self):
+    NODE_TEMPLATES = NODE_TEMPLATES
+
+    def __init__(self, verbose=True):
         self.G = nx.DiGraph()
+        self.verbose = verbose
+
+        # Incrementally maintained lookups, kept in sync by add_node_with_attribute and reset
+        self.role_index = defaultdict(list)    # role -> [node_id]
+        self.owner_index = defaultdict(list)   # owner -> [account_id]
+        self.bank_index = defaultdict(list)    # bank -> [account_id]
 
-        self.NODE_TEMPLATES = {
-            "participant": {
-                "role": None, # Either individual or fraudster
-                "isFraudster": None, #True or False
-            },
-            "bank": {
-                "role": "bank",
-            },
-            "account": {
-                "role": "account",
-                "owner": None,
-                "bank": None,
-                "balance": 0.0,
-                "status": "active",  # could be 'active', 'flagged', 'frozen', etc.
-                "compromised": False
-            }
-        }
+        # Append-only record of batches applied through apply_transfers
+        self.ledger = ledger.TransactionLedger(self)
     
     def add_node_with_attribute(self, node_id, node_type, custom_attrs=None):
         """
@@ -48,8 +64,13 @@ class FraudEnv():
             if invalid_attr:
                 raise ValueError(f"Invalid keys: {invalid_attr}")
             attr.update(custom_attrs)
+
+        if node_id in self.G:
+            self._unindex_node(node_id)
         self.G.add_node(node_id, **attr)
-        print(f"Successfully added node {node_id} as a {node_type} node.")
+        self._index_node(node_id, attr)
+        if self.verbose:
+            print(f"Successfully added node {node_id} as a {node_type} node.")
 
         try:
             if node_type == "account":
@@ -57,13 +78,64 @@ class FraudEnv():
                 bank = custom_attrs["bank"]
                 self.G.add_edge(owner, node_id, rel="owns")
                 self.G.add_edge(bank, node_id, rel="hosts")
-                print(f"   ↳ Added edges: {owner} → {node_id} and {bank} → {node_id}")
+                if self.verbose:
+                    print(f"   ↳ Added edges: {owner} → {node_id} and {bank} → {node_id}")
         except Exception as e:
             Exception("Add ownership and bank node.")
 
+    def add_nodes_bulk(self, node_type, nodes):
+        """
+        Adds many nodes of one type in a single networkx call, without per-node logging.
+
+        Args:
+            node_type (str): Type of node to add (must exist in `NODE_TEMPLATES`).
+            nodes (iterable): (node_id, custom_attrs) pairs, custom_attrs may be None.
+                Node ids must not already exist in the graph.
+
+        Raises:
+            ValueError: Same conditions as `add_node_with_attribute`.
+        """
+        if node_type not in self.NODE_TEMPLATES:
+            raise ValueError(f"Unknown node type: '{node_type}'")
+        template = self.NODE_TEMPLATES[node_type]
+
+        batch = []
+        for node_id, custom_attrs in nodes:
+            attr = template.copy()
+            if custom_attrs:
+                if not custom_attrs.keys() <= template.keys():
+                    raise ValueError(f"Invalid keys: {[i for i in custom_attrs if i not in template]}")
+                attr.update(custom_attrs)
+            batch.append((node_id, attr))
+
+        self.G.add_nodes_from(batch)
+        for node_id, attr in batch:
+            self._index_node(node_id, attr)
+
+        if node_type == "account":
+            self.G.add_edges_from((attr["owner"], node_id, {"rel": "owns"}) for node_id, attr in batch)
+            self.G.add_edges_from((attr["bank"], node_id, {"rel": "hosts"}) for node_id, attr in batch)
+
+    def _index_node(self, node_id, attr):
+        self.role_index[attr.get("role")].append(node_id)
+        if attr.get("role") == "account":
+            self.owner_index[attr.get("owner")].append(node_id)
+            self.bank_index[attr.get("bank")].append(node_id)
+
+    def _unindex_node(self, node_id):
+        attr = self.G.nodes[node_id]
+        if "role" not in attr:
+            # created implicitly by an edge (e.g. an owner added after its account), never indexed
+            return
+        self.role_index[attr.get("role")].remove(node_id)
+        if attr.get("role") == "account":
+            self.owner_index[attr.get("owner")].remove(node_id)
+            self.bank_index[attr.get("bank")].remove(node_id)
+
     def add_ownership_edge(self, node_id1, node_id2):
             self.G.add_edge(node_id1, node_id2, rel="owns")
-            print(f"Added ownership relationship between {node_id1} -> {node_id2}")
+            if self.verbose:
+                print(f"Added ownership relationship between {node_id1} -> {node_id2}")
 
     def get_nodes(self):
         return list(self.G.nodes)
@@ -74,26 +146,95 @@ class FraudEnv():
     def get_graph(self):
         return self.G
     
+    def get_attr(self, node_id, key, default=None):
+        return self.G.nodes[node_id].get(key, default)
+
+    def iter_roles(self):
+        """
+        Yields (node_id, role) for every node, role is None for nodes added implicitly by edges
+        """
+        for node, data in self.G.nodes(data=True):
+            yield node, data.get("role")
+
+    def get_nodes_by_role(self, role):
+        return list(self.role_index.get(role, []))
+
     def get_individuals(self):
-        return [node for node, data in self.G.nodes(data=True) if data.get('role') == 'individual']
+        return self.get_nodes_by_role("individual")
     
     def get_fraudsters(self):
-        return [node for node, data in self.G.nodes(data=True) if data.get('role') == "fraudster"]
+        return self.get_nodes_by_role("fraudster")
     
     def get_banks(self):
-        return [node for node, data in self.G.nodes(data=True) if data.get('role') == "bank"]
+        return self.get_nodes_by_role("bank")
     
     def get_acc(self):
-        return [node for node, data in self.G.nodes(data=True) if data.get('role') == "account"]
+        return self.get_nodes_by_role("account")
+
+    def sample_node(self, role):
+        """
+        Picks a random node with `role` in O(1), without copying the role list
+        """
+        return random.choice(self.role_index[role])
+
+    def sample_nodes(self, role, k):
+        """
+        Picks min(k, count) distinct random nodes with `role` in O(k), without copying the role list
+        """
+        nodes = self.role_index.get(role, [])
+        return [nodes[i] for i in random.sample(range(len(nodes)), min(k, len(nodes)))]
+
+    def get_accounts_of(self, owner):
+        """
+        Returns: accounts whose `owner` attribute is `owner`, in insertion order
+        """
+        return list(self.owner_index.get(owner, []))
+
+    def get_bank_accounts(self, bank):
+        """
+        Returns: accounts hosted by `bank`, in insertion order
+        """
+        return list(self.bank_index.get(bank, []))
 
     
     def update_balance(self, acc_from, acc_to, amount):
         self.G.nodes[acc_from]["balance"] -= amount
         self.G.nodes[acc_to]["balance"] += amount
+
+    def account_state(self, accounts):
+        """
+        Returns: (known, balance, frozen, compromised) arrays aligned with `accounts`,
+        known is False for ids that are missing or are not accounts
+        """
+        nodes = self.G.nodes
+        attrs = [nodes[a] if a in nodes and nodes[a].get("role") == "account" else None for a in accounts]
+        known = np.array([a is not None for a in attrs], dtype=bool)
+        balance = np.array([a["balance"] if a else 0.0 for a in attrs], dtype=np.float64)
+        frozen = np.array([bool(a) and a.get("status") == "frozen" for a in attrs], dtype=bool)
+        compromised = np.array([bool(a) and bool(a.get("compromised")) for a in attrs], dtype=bool)
+        return known, balance, frozen, compromised
+
+    def add_to_balances(self, accounts, deltas):
+        for acc, delta in zip(accounts, deltas):
+            self.G.nodes[acc]["balance"] += float(delta)
+
+    def apply_transfers(self, acc_from, acc_to, amounts):
+        """
+        Applies a batch of transfers with funds/status checks and records it in self.ledger.
+
+        Returns:
+            np.ndarray of per-row result codes (see src.utils.ledger)
+        """
+        return self.ledger.apply(acc_from, acc_to, amounts)
     
     def reset(self):
         self.G.clear()
-        print("Graph has been reset.")
+        self.role_index.clear()
+        self.owner_index.clear()
+        self.bank_index.clear()
+        self.ledger = ledger.TransactionLedger(self)
+        if self.verbose:
+            print("Graph has been reset.")
 
     def __str__(self):
         return f"FraudEnv with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges."
@@ -0,0 +1,78 @@
+"""
+Keyword Automaton - Aho-Corasick multi-pattern matcher
+Finds every category whose keywords occur as substrings of a text in one
+left-to-right scan, instead of one `kw in text` test per keyword. Results
+are memoized per distinct text, since generated corpora repeat the same
+action types and channels many times.
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List
+
+
+class KeywordAutomaton:
+    """
+    Args:
+        keywords: {category: [keyword, ...]}, matching is case-insensitive
+        cache_size: max distinct texts memoized before the memo is cleared
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]], cache_size: int = 65536):
+        self.cache_size = cache_size
+        self._cache: Dict[str, FrozenSet[str]] = {}
+
+        # trie: goto[state][char] -> state, out[state] = categories ending here
+        goto: List[Dict[str, int]] = [{}]
+        out: List[set] = [set()]
+        for category, words in keywords.items():
+            for word in words:
+                state = 0
+                for ch in word.lower():
+                    if ch not in goto[state]:
+                        goto.append({})
+                        out.append(set())
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                out[state].add(category)
+
+        # breadth-first fail links; each state's transitions are completed from
+        # its fail state so scanning never has to follow fail links
+        fail = [0] * len(goto)
+        delta = [dict(g) for g in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            out[state] |= out[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                queue.append(nxt)
+            if state:
+                for ch, nxt in delta[fail[state]].items():
+                    delta[state].setdefault(ch, nxt)
+
+        self._delta = delta
+        self._out = [frozenset(o) for o in out]
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """
+        Returns: every category with at least one keyword occurring in text
+        """
+        delta, out = self._delta, self._out
+        state = 0
+        found = set()
+        for ch in text.lower():
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return frozenset(found)
+
+    def classify(self, text: str) -> FrozenSet[str]:
+        """
+        Memoized scan.
+        """
+        result = self._cache.get(text)
+        if result is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            result = self._cache[text] = self.scan(text)
+        return result
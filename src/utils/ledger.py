@@ -0,0 +1,228 @@
+"""
+Transaction Ledger - vectorized batch transfers against a FraudEnv
+Applies arrays of (from, to, amount) transfers in one step with
+unknown-account, amount, frozen-account and overdraft checks, returns a
+per-row result code and keeps an append-only ledger that can be replayed.
+"""
+
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import src.utils.step_parser as step_parser
+
+
+# Per-row result codes
+ACCEPTED = 0
+REJECT_UNKNOWN_ACCOUNT = 1
+REJECT_BAD_AMOUNT = 2
+REJECT_SELF_TRANSFER = 3
+REJECT_FROZEN = 4
+REJECT_COMPROMISED = 5
+REJECT_INSUFFICIENT_FUNDS = 6
+
+CODE_NAMES = {
+    ACCEPTED: "accepted",
+    REJECT_UNKNOWN_ACCOUNT: "unknown account",
+    REJECT_BAD_AMOUNT: "non-positive amount",
+    REJECT_SELF_TRANSFER: "self transfer",
+    REJECT_FROZEN: "frozen account",
+    REJECT_COMPROMISED: "compromised source account",
+    REJECT_INSUFFICIENT_FUNDS: "insufficient funds",
+}
+
+
+def _group_cumsum(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Running sum of values within each key, in row order.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    csum = np.cumsum(values[order])
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    offsets = np.repeat(csum[starts] - values[order][starts], np.diff(np.r_[starts, len(keys)]))
+    out = np.empty_like(csum)
+    out[order] = csum - offsets
+    return out
+
+
+class TransactionLedger:
+    """
+    Append-only ledger of transfer batches applied to one environment.
+
+    Checks run in this order and the first failing one sets the row's code:
+    unknown account, non-positive amount, self transfer, frozen source or
+    destination, compromised source (only if reject_compromised), insufficient
+    funds. Funds are checked against the balance at the start of the batch
+    minus earlier accepted debits from the same account in the batch; credits
+    received within a batch settle at the end and cannot be spent in it.
+
+    Args:
+        env: FraudEnv or ArrayFraudEnv
+        reject_compromised: also reject transfers out of compromised accounts
+    """
+
+    def __init__(self, env, reject_compromised: bool = False):
+        self.env = env
+        self.reject_compromised = reject_compromised
+        self.batches: List[dict] = []
+
+    def check(self, acc_from: Sequence[str], acc_to: Sequence[str], amounts) -> Tuple[np.ndarray, list, np.ndarray, np.ndarray]:
+        """
+        Computes result codes without touching balances.
+
+        Returns:
+            (codes, accounts, from_idx, to_idx) where accounts lists the distinct
+            account ids and from_idx/to_idx index into it
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if not (len(acc_from) == len(acc_to) == len(amounts)):
+            raise ValueError("acc_from, acc_to and amounts must have the same length")
+
+        accounts = list(dict.fromkeys([*acc_from, *acc_to]))
+        position = {acc: i for i, acc in enumerate(accounts)}
+        fi = np.fromiter((position[a] for a in acc_from), dtype=np.int64, count=len(acc_from))
+        ti = np.fromiter((position[a] for a in acc_to), dtype=np.int64, count=len(acc_to))
+
+        known, balance, frozen, compromised = self.env.account_state(accounts)
+
+        codes = np.zeros(len(amounts), dtype=np.int8)
+
+        def reject(mask, code):
+            codes[(codes == ACCEPTED) & mask] = code
+
+        reject(~known[fi] | ~known[ti], REJECT_UNKNOWN_ACCOUNT)
+        reject(~(amounts > 0), REJECT_BAD_AMOUNT)
+        reject(fi == ti, REJECT_SELF_TRANSFER)
+        reject(frozen[fi] | frozen[ti], REJECT_FROZEN)
+        if self.reject_compromised:
+            reject(compromised[fi], REJECT_COMPROMISED)
+
+        # Overdraft, with the same result as checking rows one by one. Each round,
+        # rows before an account's first overdrawing row are final, that row is
+        # rejected, and rows that no longer fit the remaining funds are dropped.
+        # Only the rows after the first overdraft are carried into the next round.
+        settled = np.zeros(len(accounts))
+        active = np.flatnonzero(codes == ACCEPTED)
+        while len(active):
+            hopeless = amounts[active] > balance[fi[active]] - settled[fi[active]] + 1e-9
+            codes[active[hopeless]] = REJECT_INSUFFICIENT_FUNDS
+            active = active[~hopeless]
+            if not len(active):
+                break
+
+            order = np.argsort(fi[active], kind="stable")
+            active = active[order]
+            acc = fi[active]
+            spent = settled[acc] + _group_cumsum(acc, amounts[active])
+            over = spent > balance[acc] + 1e-9
+
+            # position of each row within its account group, and of the group's first overdraft
+            starts = np.flatnonzero(np.r_[True, acc[1:] != acc[:-1]])
+            group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(acc)]))
+            first_over = np.full(len(starts), len(acc))
+            np.minimum.at(first_over, group[over], np.flatnonzero(over))
+            pos = np.arange(len(acc))
+
+            final = pos < first_over[group]
+            np.add.at(settled, acc[final], amounts[active[final]])
+            rejected = pos == first_over[group]
+            codes[active[rejected]] = REJECT_INSUFFICIENT_FUNDS
+            active = active[pos > first_over[group]]
+
+        return codes, accounts, fi, ti
+
+    def apply(self, acc_from: Sequence[str], acc_to: Sequence[str], amounts) -> np.ndarray:
+        """
+        Applies a batch of transfers and records it in the ledger.
+
+        Args:
+            acc_from, acc_to: account ids per row
+            amounts: transfer amount per row
+        Returns:
+            np.ndarray of int8 result codes, ACCEPTED (0) for applied rows
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        codes, accounts, fi, ti = self.check(acc_from, acc_to, amounts)
+
+        ok = codes == ACCEPTED
+        delta = (np.bincount(ti[ok], amounts[ok], minlength=len(accounts))
+                 - np.bincount(fi[ok], amounts[ok], minlength=len(accounts)))
+        changed = np.flatnonzero(delta)
+        self.env.add_to_balances([accounts[i] for i in changed], delta[changed])
+
+        self.batches.append({
+            "from": list(acc_from),
+            "to": list(acc_to),
+            "amount": amounts.copy(),
+            "code": codes.copy(),
+        })
+        return codes
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns: one row per submitted transfer with batch id, accounts, amount and result
+        """
+        frames = [
+            pd.DataFrame({"batch": b, "from": batch["from"], "to": batch["to"],
+                          "amount": batch["amount"], "code": batch["code"]})
+            for b, batch in enumerate(self.batches)
+        ]
+        if not frames:
+            return pd.DataFrame(columns=["batch", "from", "to", "amount", "code", "result"])
+        df = pd.concat(frames, ignore_index=True)
+        df["result"] = df["code"].map(CODE_NAMES)
+        return df
+
+    def replay(self, env) -> "TransactionLedger":
+        """
+        Re-submits every recorded batch, in order, to `env`. Starting from the
+        same initial state this reproduces the same codes and balances.
+
+        Returns:
+            the new ledger attached to env
+        """
+        ledger = TransactionLedger(env, self.reject_compromised)
+        for batch in self.batches:
+            ledger.apply(batch["from"], batch["to"], batch["amount"])
+        return ledger
+
+
+def final_transactions(sequences: Iterable[List[str]]) -> Tuple[List[str], List[str], np.ndarray, List[int]]:
+    """
+    Extracts the closing transaction(...) step of generated sequences.
+
+    Args:
+        sequences: lists of step strings
+    Returns:
+        (acc_from, acc_to, amounts, seq_idx) for every sequence whose last step parses
+    """
+    acc_from, acc_to, amounts, seq_idx = [], [], [], []
+    for i, sequence in enumerate(sequences):
+        if not sequence:
+            continue
+        step = step_parser.parse_step(sequence[-1])
+        if step.kind != "transaction":
+            continue
+        acc_from.append(step.data["from_account"])
+        acc_to.append(step.data["to_account"])
+        amounts.append(step.data["amount"])
+        seq_idx.append(i)
+    return acc_from, acc_to, np.asarray(amounts, dtype=np.float64), seq_idx
+
+
+if __name__ == "__main__":
+    import json
+    import src.utils.fraud_env as fraud_env
+
+    env = fraud_env.FraudEnv(verbose=False).create_environment()
+    with open("data/test/coev_seq_v2.json", "r") as f:
+        data = json.load(f)
+
+    acc_from, acc_to, amounts, seq_idx = final_transactions(value["sequence"] for value in data.values())
+    codes = env.apply_transfers(acc_from, acc_to, amounts)
+
+    df = env.ledger.to_frame()
+    print(df["result"].value_counts())
+    print(f"{len(seq_idx)}/{len(data)} sequences end in a parseable transaction")
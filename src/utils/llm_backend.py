@@ -0,0 +1,330 @@
+"""
+LLM Backend - one place that talks to the Ollama HTTP API
+Keeps a pooled keep-alive session, applies a shared retry policy,
+consults the response cache and records latency metrics for every call
+made by the planner, detector and pattern miner. An optional concurrency
+controller shared between backends caps the requests in flight.
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_HOST = "http://localhost:11434"
+DEFAULT_MODEL = "llama3.2"
+
+# HTTP statuses worth retrying: overloaded / restarting model server
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class BackendMetrics:
+    """
+    Thread-safe counters and latency samples for backend calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.aborted = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.latencies: List[float] = []
+
+    def record(self, latency: float, ok: bool, retries: int, aborted: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            self.aborted += aborted
+            if ok:
+                self.latencies.append(latency)
+            elif not aborted:
+                self.failures += 1
+
+    def record_tokens(self, body: dict):
+        """
+        Adds the prompt_eval_count / eval_count Ollama reports in a final response body.
+        """
+        with self._lock:
+            self.prompt_tokens += body.get("prompt_eval_count") or 0
+            self.eval_tokens += body.get("eval_count") or 0
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.failures = 0
+            self.retries = 0
+            self.aborted = 0
+            self.prompt_tokens = 0
+            self.eval_tokens = 0
+            self.latencies = []
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns: dict with call counts, token counts and mean/p50/p95 latency in seconds
+        """
+        with self._lock:
+            lat = sorted(self.latencies)
+            calls, failures, retries, aborted = self.calls, self.failures, self.retries, self.aborted
+            prompt_tokens, eval_tokens = self.prompt_tokens, self.eval_tokens
+
+        def pct(p):
+            return lat[min(len(lat) - 1, int(p * len(lat)))] if lat else 0.0
+
+        return {
+            "calls": calls,
+            "failures": failures,
+            "retries": retries,
+            "aborted": aborted,
+            "prompt_tokens": prompt_tokens,
+            "eval_tokens": eval_tokens,
+            "mean_latency": sum(lat) / len(lat) if lat else 0.0,
+            "p50_latency": pct(0.50),
+            "p95_latency": pct(0.95),
+        }
+
+
+class OllamaBackend:
+    """
+    Pooled client for Ollama's /api/generate endpoint.
+
+    Args:
+        model: model name sent with every request
+        host: base URL of the Ollama server
+        options: default generation options, merged under per-call options
+        timeout: default per-request timeout in seconds
+        max_retries: retries on connection errors, timeouts and 429/5xx
+        backoff: base backoff in seconds, doubled on every retry
+        pool_size: max keep-alive connections held by the session
+        keep_alive: how long Ollama keeps the model loaded (e.g. "10m")
+        cache: ResponseCache consulted for deterministic (temperature 0 or seeded) calls
+        controller: AIMDConcurrencyController every HTTP attempt waits on, share one
+            between backends to bound the load they put on the same server together
+        latency_class: key of this backend's latency baseline on the controller,
+            defaults to one per backend; backends sending the same kind of
+            request (e.g. "detector") can share one
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, host: str = DEFAULT_HOST, options: Optional[dict] = None,
+                 timeout: float = 120, max_retries: int = 3, backoff: float = 0.5,
+                 pool_size: int = 16, keep_alive: Optional[str] = None, cache=None, controller=None,
+                 latency_class: Optional[str] = None):
+        self.model = model
+        self.host = host.rstrip("/")
+        self.options = options or {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.controller = controller
+        self.latency_class = latency_class or f"backend-{id(self):x}"
+        self.metrics = BackendMetrics()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def build_payload(self, prompt: str, options: Optional[dict] = None, **extra) -> dict:
+        """
+        Builds the JSON body for /api/generate. Extra keyword arguments
+        (format, context, system, ...) are passed through unchanged.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+        }
+        merged = {**self.options, **(options or {})}
+        if merged:
+            payload["options"] = merged
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update({k: v for k, v in extra.items() if v is not None})
+        return payload
+
+    def generate(self, prompt: str, options: Optional[dict] = None, timeout: Optional[float] = None,
+                 use_cache: bool = True, **extra) -> dict:
+        """
+        Calls /api/generate with retry and backoff. Deterministic requests are
+        served from / stored in self.cache when one is configured.
+
+        Args:
+            prompt: full prompt string
+            options: per-call generation options (temperature, num_predict, stop, ...)
+            timeout: per-request timeout, defaults to self.timeout
+            use_cache: set False to force a fresh call even for deterministic options
+        Returns:
+            decoded JSON payload from Ollama
+        Raises:
+            requests.RequestException: once retries are exhausted or on a non-retryable HTTP error
+        """
+        payload = self.build_payload(prompt, options, **extra)
+
+        if self.cache is None:
+            return self._post("/api/generate", payload, timeout)
+
+        if not use_cache or not self.cache.is_deterministic(payload.get("options")):
+            self.cache.bypassed += 1
+            return self._post("/api/generate", payload, timeout)
+
+        key = self.cache.make_key(payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        body = self._post("/api/generate", payload, timeout)
+        self.cache.put(key, body)
+        return body
+
+    def generate_text(self, prompt: str, options: Optional[dict] = None, timeout: Optional[float] = None,
+                      use_cache: bool = True, **extra) -> str:
+        """
+        Same as generate, but returns only the stripped response text.
+        """
+        return (self.generate(prompt, options, timeout, use_cache, **extra).get("response") or "").strip()
+
+    def stream_generate(self, prompt: str, options: Optional[dict] = None, timeout: Optional[float] = None,
+                        **extra) -> Iterator[dict]:
+        """
+        Calls /api/generate with "stream": true and yields each decoded chunk
+        ({"response": <text piece>, "done": bool, ...}) as it arrives. Retries
+        only apply before the first chunk. Closing the generator early (or
+        breaking out of the loop) closes the connection, which makes Ollama
+        stop generating. Streamed calls never use the response cache.
+
+        Args:
+            prompt: full prompt string
+            options: per-call generation options
+            timeout: connect/read timeout between chunks, defaults to self.timeout
+        Yields:
+            decoded chunk dicts, the last one has "done": True
+        """
+        payload = self.build_payload(prompt, options, **extra)
+        payload["stream"] = True
+        start = time.perf_counter()
+        response, retries, first_byte = self._send("/api/generate", payload, timeout, stream=True)
+
+        done = failed = False
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                done = bool(chunk.get("done"))
+                if done:
+                    self.metrics.record_tokens(chunk)
+                yield chunk
+                if done:
+                    break
+        except (requests.RequestException, ValueError):
+            failed = True
+            self.metrics.record(time.perf_counter() - start, False, retries)
+            raise
+        finally:
+            response.close()
+            if self.controller is not None:
+                # the slot is held until generation ends, but the latency reported is time to
+                # first byte, which reflects server load rather than completion length
+                self.controller.release(first_byte, ok=not failed, key=(self.latency_class, "stream"))
+            if done:
+                self.metrics.record(time.perf_counter() - start, True, retries)
+            elif not failed:
+                # the caller closed the generator before the final chunk
+                self.metrics.record(time.perf_counter() - start, False, retries, aborted=True)
+
+    @staticmethod
+    def _time_to_first_token(latency: float, body: dict) -> float:
+        # completion length varies widely between generations, so the congestion signal is the
+        # time not spent decoding (queueing + prompt prefill), the same thing time to first byte
+        # measures for streamed calls; eval_duration is reported by Ollama in nanoseconds
+        decoding = (body.get("eval_duration") or 0) / 1e9
+        return max(latency - decoding, 0.0)
+
+    def _post(self, path: str, payload: dict, timeout: Optional[float]) -> dict:
+        start = time.perf_counter()
+        response, retries, latency = self._send(path, payload, timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            # body was not JSON
+            if self.controller is not None:
+                self.controller.release(latency, ok=False, key=self.latency_class)
+            self.metrics.record(time.perf_counter() - start, False, retries)
+            raise
+        if self.controller is not None:
+            self.controller.release(self._time_to_first_token(latency, body), key=self.latency_class)
+        self.metrics.record(time.perf_counter() - start, True, retries)
+        self.metrics.record_tokens(body)
+        return body
+
+    def _send(self, path: str, payload: dict, timeout: Optional[float], stream: bool = False):
+        """
+        POSTs with retry and backoff. With a controller, every attempt waits
+        for a slot; failed attempts report their latency and outcome here,
+        while the successful one keeps its slot and the caller releases it
+        once it knows how much output the request produced.
+
+        Returns:
+            (response, retries, seconds until the response arrived) for the
+            first successful response; with stream, the seconds to first byte
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        retries = 0
+
+        while True:
+            if self.controller is not None:
+                self.controller.acquire()
+            slot_start = time.perf_counter()
+            response = None
+            try:
+                response = self.session.post(self.host + path, json=payload, timeout=timeout, stream=stream)
+                if response.status_code in RETRYABLE_STATUS and retries < self.max_retries:
+                    raise requests.HTTPError(f"retryable status {response.status_code}", response=response)
+                response.raise_for_status()
+                return response, retries, time.perf_counter() - slot_start
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                if response is not None:
+                    # a streamed response holds its pooled connection until closed
+                    response.close()
+                status = getattr(e.response, "status_code", None)
+                retryable = status is None or status in RETRYABLE_STATUS
+                if self.controller is not None:
+                    if retryable:
+                        self.controller.release(time.perf_counter() - slot_start, ok=False, key=self.latency_class)
+                    else:
+                        # 4xx other than 429 is the caller's fault, not a sign of load, and its
+                        # fast turnaround must not become the latency baseline either
+                        self.controller.abandon()
+                if not retryable or retries >= self.max_retries:
+                    self.metrics.record(time.perf_counter() - start, False, retries)
+                    raise
+                time.sleep(self.backoff * (2 ** retries))
+                retries += 1
+            except Exception:
+                if response is not None:
+                    response.close()
+                if self.controller is not None:
+                    self.controller.abandon()
+                raise
+
+    def load(self) -> Dict[str, float]:
+        """
+        Returns: current concurrency limit, requests in flight and callers queued
+            on the controller (all 0 without one)
+        """
+        if self.controller is None:
+            return {"concurrency": 0, "inflight": 0, "queue_depth": 0}
+        stats = self.controller.stats()
+        return {"concurrency": stats["limit"], "inflight": stats["inflight"], "queue_depth": stats["queue_depth"]}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,44 @@
+"""
+Prompt Template - str.format templates parsed once
+Splits a template into its literal pieces and field names at import time,
+so building a prompt only joins strings.
+"""
+
+import string
+from typing import List, Tuple
+
+
+class PromptTemplate:
+    """
+    Args:
+        template: str.format template, "{{" / "}}" are literal braces.
+            Only plain {name} fields are supported.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.parts: List[Tuple[str, str]] = []   # (literal, field name or None)
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if spec or conversion:
+                raise ValueError(f"format spec / conversion not supported in field '{field}'")
+            self.parts.append((literal, field))
+        self.fields = [field for _, field in self.parts if field is not None]
+
+    def render(self, **values) -> str:
+        """
+        Same result as template.format(**values).
+        """
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English prompts),
+    used when the server does not report prompt_eval_count.
+    """
+    return (len(text) + 3) // 4
@@ -9,6 +9,9 @@ from typing import Dict, List, Tuple, Optional
 from enum import Enum
 import json
 import re
+import threading
+import src.utils.keyword_automaton as keyword_automaton
+import src.utils.step_parser as step_parser
 
 
 class EntityType(str, Enum):
@@ -62,6 +65,113 @@ class ParsedTransaction(BaseModel):
     amount: float
 
 
+def step_json_schema(model, kind: str) -> dict:
+    """
+    JSON schema of one step object: the model's fields plus a "kind" tag.
+    """
+    schema = model.model_json_schema()
+    schema["properties"] = {"kind": {"type": "string", "enum": [kind]}, **schema["properties"]}
+    schema["required"] = ["kind", *schema["required"]]
+    return schema
+
+
+def sequence_json_schema() -> dict:
+    """
+    JSON schema of a {"sequence": [step, ...]} response, sent as Ollama's
+    `format` so the model can only emit well-formed action/transaction objects.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "sequence": {
+                "type": "array",
+                "minItems": 1,
+                "items": {"anyOf": [
+                    step_json_schema(ParsedAction, "action"),
+                    step_json_schema(ParsedTransaction, "transaction"),
+                ]},
+            },
+        },
+        "required": ["sequence"],
+    }
+
+
+# ============================================================================
+# RULE KEYWORDS
+# ============================================================================
+# Substring keywords per capability category. All categories are matched in a
+# single Aho-Corasick pass over the action type (or channel), memoized per string.
+
+CAPABILITY_KEYWORDS = {
+    # Communication channels that require humans
+    "human_channel": ['call', 'phone', 'email', 'sms', 'text', 'chat', 'voice', 'in-person', 'meeting'],
+
+    # Actions that inherently require human agency
+    "human_action": [
+        'phish', 'imperson', 'pretend', 'pose', 'deceiv', 'trick', 'manipulat',
+        'convince', 'persuad', 'social engineer', 'lie', 'claim', 'request',
+        'ask', 'call', 'contact', 'speak', 'talk', 'discuss', 'negotiate'
+    ],
+
+    # Providing/sending ...
+    "submission": [
+        'submit', 'send', 'provide', 'give', 'share', 'reveal',
+        'disclose', 'tell', 'supply', 'furnish'
+    ],
+    # ... information/credentials
+    "info": ['info', 'data', 'credential', 'password', 'ssn', 'dob', 'detail'],
+
+    "psychological": [
+        'phish', 'social engineer', 'manipulat', 'trick', 'deceiv',
+        'convince', 'persuad', 'imperson', 'pretend', 'scam'
+    ],
+
+    "identity": ['identity', 'impersonat'],
+
+    "technical": [
+        'takeover', 'access', 'login', 'authenticate', 'hack', 'breach',
+        'exploit', 'inject', 'query', 'request', 'api', 'database'
+    ],
+
+    "fraud": [
+        "impersonat", "pose", "pretend", "masquerad", "identity", "attack",
+
+        "social engineer", "manipulat", "trick", "deceiv", "scam", "fraud", "phish", "bait", "convince", "persuad", "lure",
+
+        "takeover", "compromise", "breach", "hijack", "hack", "exploit", "unauthorized",
+
+        "sim swap", "phone swap", "number port",
+
+        "fake", "invoice", "distress", "emergency", "urgent", "threat"
+    ],
+}
+
+RULE_KEYWORDS = keyword_automaton.KeywordAutomaton(CAPABILITY_KEYWORDS)
+
+
+ROLE_TO_ENTITYTYPE = {
+    "individual": EntityType.INDIVIDUAL,
+    "fraudster": EntityType.FRAUDSTER,
+    "bank": EntityType.BANK,
+    "account": EntityType.ACCOUNT,
+    "telecom": EntityType.TELECOM,
+    "utility": EntityType.ORGANIZATION,
+    "restaurant": EntityType.ORGANIZATION,
+    "institution": EntityType.ORGANIZATION,
+}
+
+
+def build_entity_registry(env) -> Dict[str, Entity]:
+    """
+    Builds registry of entities and entity types for pydantic validation
+    from every node of a FraudEnv/ArrayFraudEnv.
+    """
+    registry = {}
+    for node, role in env.iter_roles():
+        registry[node] = Entity(name=node, type=ROLE_TO_ENTITYTYPE.get(role))
+    return registry
+
+
 class UniversalRulesValidator:
     """
     Validates based on entity capabilities, not predefined actions.
@@ -70,107 +180,54 @@ class UniversalRulesValidator:
     
     def __init__(self, entity_registry: Dict[str, Entity]):
         self.entity_registry = entity_registry
+        # (sequence, parsed steps) of the last sequence parsed, so validate_syntax
+        # followed by validate_semantic on the same list parses it only once; kept
+        # per thread because planner workers, RuleScorer and the detector share one validator
+        self._local = threading.local()
     
     def requires_human_agency(self, action_type: str, channel: str) -> bool:
         """
         Determine if action requires human decision-making and communication.
         Based on keywords in action type and channel.
         """
-        action_lower = action_type.lower()
-        channel_lower = channel.lower()
-        
-        # Communication channels that require humans
-        human_channels = ['call', 'phone', 'email', 'sms', 'text', 'chat', 'voice', 'in-person', 'meeting']
-        if any(ch in channel_lower for ch in human_channels):
-            return True
-        
-        # Actions that inherently require human agency
-        human_actions = [
-            'phish', 'imperson', 'pretend', 'pose', 'deceiv', 'trick', 'manipulat',
-            'convince', 'persuad', 'social engineer', 'lie', 'claim', 'request',
-            'ask', 'call', 'contact', 'speak', 'talk', 'discuss', 'negotiate'
-        ]
-        if any(kw in action_lower for kw in human_actions):
-            return True
-        
-        return False        
+        # Communication channels that require humans, or actions that inherently require human agency
+        return ("human_channel" in RULE_KEYWORDS.classify(channel)
+                or "human_action" in RULE_KEYWORDS.classify(action_type))
 
-    
     def is_information_submission(self, action_type: str) -> bool:
         """
         Determine if action is about providing/sending information.
         Only humans can decide to submit their own information.
         """
-        action_lower = action_type.lower()
-        
-        submission_keywords = [
-            'submit', 'send', 'provide', 'give', 'share', 'reveal', 
-            'disclose', 'tell', 'supply', 'furnish'
-        ]
-        
-        # Check if it's about information/credentials
-        info_keywords = ['info', 'data', 'credential', 'password', 'ssn', 'dob', 'detail']
-        
-        has_submission = any(kw in action_lower for kw in submission_keywords)
-        has_info = any(kw in action_lower for kw in info_keywords)
-        
-        return has_submission and has_info
+        categories = RULE_KEYWORDS.classify(action_type)
+        return "submission" in categories and "info" in categories
     
     def targets_human_psychology(self, action_type: str) -> bool:
         """
         Determine if action targets human psychology/behavior.
         You can't manipulate or trick an inanimate object.
         """
-        action_lower = action_type.lower()
-        
-        psychological_actions = [
-            'phish', 'social engineer', 'manipulat', 'trick', 'deceiv',
-            'convince', 'persuad', 'imperson', 'pretend', 'scam'
-        ]
-        
-        return any(kw in action_lower for kw in psychological_actions)
+        return "psychological" in RULE_KEYWORDS.classify(action_type)
     
     def is_identity_based(self, action_type: str) -> bool:
         """
         Determine if action involves stealing/using identity.
         Only humans have identities that can be stolen.
         """
-        action_lower = action_type.lower()
-        return 'identity' in action_lower or 'impersonat' in action_lower
+        return "identity" in RULE_KEYWORDS.classify(action_type)
     
     def is_technical_system_action(self, action_type: str) -> bool:
         """
         Determine if action is purely technical/system-based.
         These might not require human agency.
         """
-        action_lower = action_type.lower()
-        
-        technical_keywords = [
-            'takeover', 'access', 'login', 'authenticate', 'hack', 'breach',
-            'exploit', 'inject', 'query', 'request', 'api', 'database'
-        ]
-        
-        return any(kw in action_lower for kw in technical_keywords)
+        return "technical" in RULE_KEYWORDS.classify(action_type)
     
     def is_fraud_behavior(self, action_type: str) -> bool:
         """
         Determines if the action is a fraudulent action
         """
-        action_lower = action_type.lower()
-    
-        fraud_keywords = [
-        "impersonat", "pose", "pretend", "masquerad", "identity", "attack",
-        
-        "social engineer", "manipulat", "trick", "deceiv", "scam", "fraud", "phish", "bait", "convince", "persuad", "lure",
-
-        "takeover", "compromise", "breach", "hijack", "hack", "exploit", "unauthorized",
-        
-        "sim swap", "phone swap", "number port",
-
-        "fake", "invoice", "distress", "emergency", "urgent", "threat"
-        ]
-    
-        return any(kw in action_lower for kw in fraud_keywords)
+        return "fraud" in RULE_KEYWORDS.classify(action_type)
     
     # ========================================================================
     # VALIDATION RULES
@@ -181,18 +238,26 @@ class UniversalRulesValidator:
         Apply universal capability-based rules.
         Returns: (is_valid, error_message)
         """
+        rule, error = self.check_action(action)
+        return rule is None, error
+
+    def check_action(self, action: ParsedAction) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Apply universal capability-based rules.
+        Returns: (rule_id, error_message), (None, None) if the action is valid
+        """
         
         subject_entity = self.entity_registry.get(action.subject)
         object_entity = self.entity_registry.get(action.object)
         
         if not subject_entity:
-            return False, f"Unknown subject entity: {action.subject}"
+            return "unknown_subject", f"Unknown subject entity: {action.subject}"
         if not object_entity:
-            return False, f"Unknown object entity: {action.object}"
+            return "unknown_object", f"Unknown object entity: {action.object}"
         
         # RULE 1: Accounts cannot perform actions requiring human agency
         if subject_entity.is_account() and self.requires_human_agency(action.action_type, action.channel):
-            return False, (
+            return "account_human_agency", (
                 f"Account '{action.subject}' cannot perform '{action.action_type}' via '{action.channel}'. "
                 f"This action requires human agency (making calls, sending emails, communicating). "
                 f"Change subject to a person or fraudster."
@@ -201,14 +266,14 @@ class UniversalRulesValidator:
         # RULE 2: Only humans can submit their own information
         if self.is_information_submission(action.action_type):
             if not subject_entity.is_human():
-                return False, (
+                return "non_human_submission", (
                     f"Only people can submit information, not {subject_entity.type.value} '{action.subject}'. "
                     f"Information submission requires conscious decision-making."
                 )
         
         # RULE 3: Cannot target accounts with psychological manipulation
         if object_entity.is_account() and self.targets_human_psychology(action.action_type):
-            return False, (
+            return "account_psychology_target", (
                 f"Cannot perform '{action.action_type}' on account '{action.object}'. "
                 f"This action targets human psychology/behavior. "
                 f"Change object to the person who owns the account."
@@ -217,7 +282,7 @@ class UniversalRulesValidator:
         # RULE 4: Identity theft/impersonation targets humans or organizations, not accounts
         if self.is_identity_based(action.action_type):
             if object_entity.is_account():
-                return False, (
+                return "account_identity_target", (
                     f"Cannot perform '{action.action_type}' on account '{action.object}'. "
                     f"Identity-based actions target people or organizations, not accounts."
                 )
@@ -225,7 +290,7 @@ class UniversalRulesValidator:
         # RULE 5: Accounts can only perform technical actions on other accounts
         if subject_entity.is_account() and object_entity.is_account():
             if not self.is_technical_system_action(action.action_type):
-                return False, (
+                return "account_non_technical", (
                     f"Account '{action.subject}' cannot perform '{action.action_type}' on account '{action.object}'. "
                     f"Accounts can only have technical relationships (access, transfer). "
                     f"For money transfers, use transaction() syntax."
@@ -234,14 +299,14 @@ class UniversalRulesValidator:
         # RULE 6: Only fraudsters can perform fraudulent actions on individuals
         if self.is_fraud_behavior(action.action_type):
             if not subject_entity.is_fraudster() and not object_entity.is_victim():
-                return False, (
+                return "non_fraudster_fraud", (
                     f"'{subject_entity.name}' is a {subject_entity.type.value} can not perform {action.action_type} on '{object_entity.name}', which is a {object_entity.type.value}. '"
                     f"Generate a sequence with correct fraudster and victim entities."
                 )
             
         # RULE 7: Subject and object cannot be the same entity
         if subject_entity == object_entity:
-            return False, (
+            return "self_action", (
                 f"{subject_entity.name} can not perform {action.object} on itself."
             )
             
@@ -253,35 +318,43 @@ class UniversalRulesValidator:
                 # Return as valid but could be logged for review
                 pass
         
-        return True, None
+        return None, None
     
     def validate_transaction(self, trans: ParsedTransaction) -> Tuple[bool, Optional[str]]:
         """
         Validate transaction - must be account to account
         """
+        rule, error = self.check_transaction(trans)
+        return rule is None, error
+
+    def check_transaction(self, trans: ParsedTransaction) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Validate transaction - must be account to account
+        Returns: (rule_id, error_message), (None, None) if the transaction is valid
+        """
         
         from_entity = self.entity_registry.get(trans.from_account)
         to_entity = self.entity_registry.get(trans.to_account)
         
         if not from_entity:
-            return False, f"Unknown from entity: {trans.from_account}"
+            return "unknown_from", f"Unknown from entity: {trans.from_account}"
         if not to_entity:
-            return False, f"Unknown to entity: {trans.to_account}"
+            return "unknown_to", f"Unknown to entity: {trans.to_account}"
         
         # RULE 7: Transactions must be between accounts
         if not from_entity.is_account():
-            return False, (
+            return "non_account_source", (
                 f"Transaction source must be an account, not {from_entity.type.value} '{trans.from_account}'. "
                 f"Use the account belonging to {trans.from_account}."
             )
         
         if not to_entity.is_account():
-            return False, (
+            return "non_account_destination", (
                 f"Transaction destination must be an account, not {to_entity.type.value} '{trans.to_account}'. "
                 f"Use the account belonging to {trans.to_account}."
             )
         
-        return True, None
+        return None, None
     
     # ========================================================================
     # SEQUENCE VALIDATION
@@ -292,112 +365,106 @@ class UniversalRulesValidator:
         Parse a step string into type and components.
         Returns: (step_type, parsed_data)
         """
-        step = step.strip()
-        
-        if step.startswith('action('):
-            # Extract components: action(subject, action_type, object, channel, details)
-            inner = step[7:-1]  # Remove "action(" and ")"
-            parts = [x.strip() for x in inner.split(",")]
-            
-            if len(parts) != 5:
-                return 'invalid', {}
-            
-            return 'action', {
-                'subject': parts[0],
-                'action_type': parts[1],
-                'object': parts[2],
-                'channel': parts[3],
-                'details': parts[4]
-            }
-        
-        elif step.startswith('transaction('):
-            # Extract components: transaction(from, type, to, amount)
-            inner = step[12:-1]  # Remove "transaction(" and ")"
-            parts = [p.strip() for p in inner.split(',')]
-            
-            if len(parts) != 4:
-                return 'invalid', {}
-            
-            return 'transaction', {
-                'from_account': parts[0],
-                'payment_type': parts[1],
-                'to_account': parts[2],
-                'amount': float(parts[3])
-            }
-        
-        return 'invalid', {}
+        parsed = step_parser.parse_step(step)
+        # copy: parsed steps are shared through the step_parser cache
+        return parsed.kind, dict(parsed.data)
+
+    def parse_sequence(self, sequence: List[str]) -> List[step_parser.ParsedStep]:
+        """
+        Parse every step of a sequence once. The result for the most recent
+        sequence is reused when the same steps are validated again.
+        """
+        key = tuple(sequence)
+        last = getattr(self._local, "last_parsed", None)
+        if last is None or last[0] != key:
+            last = (key, step_parser.parse_sequence(sequence))
+            self._local.last_parsed = last
+        return last[1]
     
-    def validate_semantic(self, sequence: List[str]) -> Tuple[bool, List[str]]:
+    def step_semantic_violations(self, step: step_parser.ParsedStep) -> List[Tuple[str, str]]:
+        """
+        Semantic rule violations of one parsed step.
+        Returns: list of (rule_id, error_message)
+        """
+        if step.kind == 'invalid':
+            return [("parse", "Failed to parse step.")]
+
+        try:
+            if step.kind == 'action':
+                rule, error = self.check_action(ParsedAction(**step.data))
+            else:
+                rule, error = self.check_transaction(ParsedTransaction(**step.data))
+        except Exception as e:
+            rule, error = "invalid_fields", str(e)
+        return [] if rule is None else [(rule, error)]
+
+    def step_syntax_violations(self, step: step_parser.ParsedStep) -> List[Tuple[str, str]]:
+        """
+        Syntax violations of one parsed step: unparseable step or unknown entities.
+        Returns: list of (rule_id, error_message)
+        """
+        violations = []
+
+        if step.kind == 'invalid':
+            return [("parse", f"Failed to parse step. There should be 5 fields for action and 4 fields for transaction. Here is the invalid step: {step.raw}")]
+
+        if step.kind == "action":
+            if step.data['subject'] not in self.entity_registry:
+                violations.append(("unknown_entity", f"{step.data['subject']} is not a valid entity."))
+            if step.data['object'] not in self.entity_registry:
+                violations.append(("unknown_entity", f"{step.data['object']} is not a valid entity."))
+
+        if step.kind == "transaction":
+            if step.data['from_account'] not in self.entity_registry:
+                violations.append(("unknown_entity", f"{step.data['from_account']} is not a valid entry."))
+            if step.data['to_account'] not in self.entity_registry:
+                violations.append(("unknown_entity", f"{step.data['to_account']} is not a valid entry."))
+
+        return violations
+
+    def semantic_violations(self, parsed: List[step_parser.ParsedStep]) -> List[Tuple[int, str, str]]:
+        """
+        Semantic rule violations of a parsed sequence.
+        Returns: list of (step_index, rule_id, error_message)
+        """
+        return [(i, rule, error) for i, step in enumerate(parsed)
+                for rule, error in self.step_semantic_violations(step)]
+
+    def syntax_violations(self, parsed: List[step_parser.ParsedStep]) -> List[Tuple[int, str, str]]:
+        """
+        Syntax violations of a parsed sequence: unparseable steps, unknown
+        entities and a last step that is not a transaction.
+        Returns: list of (step_index, rule_id, error_message)
+        """
+        if not parsed:
+            return [(0, "empty", "The sequence is empty, it must end with a transaction")]
+
+        violations = []
+
+        for i, step in enumerate(parsed):
+            if i == len(parsed)-1:
+                if step.kind != "transaction":
+                    violations.append((i, "last_not_transaction", "The last step must be a transaction"))
+            violations.extend((i, rule, error) for rule, error in self.step_syntax_violations(step))
+
+        return violations
+
+    def validate_semantic(self, sequence: List[str], parsed: Optional[List[step_parser.ParsedStep]] = None) -> Tuple[bool, List[str]]:
         """
         Validate entire sequence from JSON format.
         Returns: (is_valid, list_of_errors)
         """
-        errors = []
-        
-        for i, step in enumerate(sequence):
-            try:
-                step_type, parsed_data = self.parse_step(step)
-            except Exception as e:
-                errors.append(f"Sequence is not in the right format. Generate again.")
-            
-            if step_type == 'invalid':
-                errors.append(f"Step {i}: Failed to parse step.")
-                continue
-            
-            if step_type == 'action':
-                try:
-                    action = ParsedAction(**parsed_data)
-                    is_valid, error = self.validate_action(action)
-                    if not is_valid:
-                        errors.append(f"Step {i}: {error}")
-                except Exception as e:
-                    errors.append(f"Step {i}: {str(e)}")
-            
-            elif step_type == 'transaction':
-                try:
-                    trans = ParsedTransaction(**parsed_data)
-                    is_valid, error = self.validate_transaction(trans)
-                    if not is_valid:
-                        errors.append(f"Step {i}: {error}")
-                except Exception as e:
-                    errors.append(f"Step {i}: {str(e)}")
-        
+        parsed = parsed if parsed is not None else self.parse_sequence(sequence)
+        errors = [f"Step {i}: {error}" for i, _, error in self.semantic_violations(parsed)]
         return len(errors) == 0, errors
     
-    def validate_syntax(self, sequence: List[str]) -> Tuple[bool, List[str]]:
+    def validate_syntax(self, sequence: List[str], parsed: Optional[List[step_parser.ParsedStep]] = None) -> Tuple[bool, List[str]]:
         """
         Validates entire syntax of entire sequence
         Returns: (is_valid, list of errors)
         """
-        errors = []
-
-        for i, step in enumerate(sequence):
-            try:
-                step_type, parsed_data = self.parse_step(step)
-            except Exception as e:
-                errors.append(f"Sequence is not in the right format. Generate again.")
-
-            if i == len(sequence)-1:
-                if step_type != "transaction":
-                    errors.append(f"Step {i}: The last step must be a transaction")
-
-            
-            if step_type == 'invalid':
-                errors.append(f"Step {i}: Failed to parse step. There should be 5 fields for action and 4 fields for transaction. Here is the invalid step: {step}")
-                continue
-
-            if step_type == "action":
-                if parsed_data['subject'] not in self.entity_registry:
-                    errors.append(f"Step {i}: {parsed_data['subject']} is not a valid entity.")
-                if parsed_data['object'] not in self.entity_registry:
-                    errors.append(f"Step {i}: {parsed_data['object']} is not a valid entity.")
-
-            if step_type == "transaction":
-                if parsed_data['from_account'] not in self.entity_registry:
-                    errors.append(f"Step {i}: {parsed_data['from_account']} is not a valid entry.")
-                if parsed_data['to_account'] not in self.entity_registry:
-                    errors.append(f"Step {i}: {parsed_data['to_account']} is not a valid entry.")
-        
+        parsed = parsed if parsed is not None else self.parse_sequence(sequence)
+        errors = [f"Step {i}: {error}" for i, _, error in self.syntax_violations(parsed)]
         return len(errors) == 0, errors
 
 
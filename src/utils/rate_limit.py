@@ -0,0 +1,192 @@
+"""
+Adaptive Rate Limiting - AIMD pacing and backpressure for the model server
+AdaptiveRateLimiter paces calls with a token bucket whose rate grows
+additively while calls succeed and is cut multiplicatively when the server
+throttles (429/5xx, timeouts, retries). AIMDConcurrencyController applies the
+same control to the number of requests in flight, using latency and HTTP
+errors as the congestion signal.
+"""
+
+import threading
+import time
+
+
+_default_controller = None
+
+
+def get_default_controller() -> "AIMDConcurrencyController":
+    """
+    Returns the process-wide concurrency controller shared by the default
+    planner and detector backends, creating it on first use.
+    """
+    global _default_controller
+    if _default_controller is None:
+        _default_controller = AIMDConcurrencyController()
+    return _default_controller
+
+
+class AdaptiveRateLimiter:
+    """
+    Args:
+        rate: initial requests per second
+        burst: bucket size, requests that may go out back to back
+        min_rate, max_rate: bounds for the adapted rate
+        increase: requests/sec added after every success
+        decrease: factor applied to the rate after a throttle signal
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 1, min_rate: float = 0.05, max_rate: float = 50.0,
+                 increase: float = 0.1, decrease: float = 0.5):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.throttles = 0
+        self.waited = 0.0
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.waited += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.throttles += 1
+
+
+class AIMDConcurrencyController:
+    """
+    Limits requests in flight to a model server and adapts the limit (AIMD):
+    every success adds increase / limit (about +increase per round trip of
+    the whole window), while an HTTP throttle/error, a timeout or a latency
+    above latency_tolerance x the best latency seen multiplies it by
+    decrease, at most once per smoothed round trip.
+
+    The best latency is tracked per request class (the key passed to
+    release), so short detector votes sharing the controller with long
+    planner generations do not make every generation look congested.
+
+    Callers wait in acquire() while the window is full; queue_depth counts them.
+
+    Args:
+        initial: starting concurrency limit
+        min_limit, max_limit: bounds for the limit
+        increase: additive increase per window
+        decrease: multiplicative decrease factor
+        latency_tolerance: latency / best latency ratio treated as congestion, None to ignore latency
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, increase: float = 1.0,
+                 decrease: float = 0.5, latency_tolerance: float = 2.0):
+        self._limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+
+        self.inflight = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.decreases = 0
+        self.min_latency = {}           # request class -> best latency seen
+        self.smoothed_latency = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self):
+        """
+        Blocks until a request slot is free.
+        """
+        with self._cond:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            while self.inflight >= self.limit:
+                self._cond.wait()
+            self.queue_depth -= 1
+            self.inflight += 1
+
+    def release(self, latency: float, ok: bool = True, key=None):
+        """
+        Frees a slot and adapts the limit.
+
+        Args:
+            latency: seconds the request took
+            ok: False for throttling statuses (429/5xx), connection errors and timeouts
+            key: request class whose latency baseline this latency is compared
+                with, e.g. one per backend
+        """
+        with self._cond:
+            self.inflight -= 1
+            best = self.min_latency.get(key)
+            if ok:
+                best = latency if best is None else min(best, latency)
+                self.min_latency[key] = best
+                self.smoothed_latency = latency if self.smoothed_latency is None else 0.8 * self.smoothed_latency + 0.2 * latency
+
+            congested = not ok or (self.latency_tolerance is not None and best is not None
+                                   and latency > self.latency_tolerance * best)
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease >= (self.smoothed_latency or latency):
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+            self._cond.notify_all()
+
+    def abandon(self):
+        """
+        Frees a slot without adapting the limit, for requests that failed
+        client-side or were rejected as the caller's fault (4xx).
+        """
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Returns: current limit, in-flight requests, waiting callers and adaptation counters
+        """
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "inflight": self.inflight,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "decreases": self.decreases,
+                "min_latency": dict(self.min_latency),
+                "smoothed_latency": self.smoothed_latency,
+            }
@@ -0,0 +1,145 @@
+"""
+Response Cache - persistent, content-addressed store for LLM responses
+Keyed by a SHA-256 of model + prompt + options, backed by SQLite with
+least-recently-used eviction by entry count and total payload size.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join("data", "cache", "llm_responses.sqlite")
+
+_default_cache = None
+
+
+def get_default_cache() -> "ResponseCache":
+    """
+    Returns the process-wide cache at DEFAULT_CACHE_PATH, opening it on first use.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache(DEFAULT_CACHE_PATH)
+    return _default_cache
+
+
+class ResponseCache:
+    """
+    On-disk LLM response cache.
+
+    Args:
+        path: SQLite file, parent directories are created
+        max_entries: evict least recently used rows above this count
+        max_bytes: evict least recently used rows above this total payload size (None = unbounded)
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 100_000, max_bytes: Optional[int] = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        """
+        Content hash of an /api/generate body. Transport-only fields
+        (stream, keep_alive) do not change the response and are ignored.
+        """
+        keyed = {k: v for k, v in payload.items() if k not in ("stream", "keep_alive")}
+        blob = json.dumps(keyed, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_deterministic(options: Optional[dict]) -> bool:
+        """
+        A response is only reusable when sampling is greedy or seeded.
+        """
+        options = options or {}
+        return options.get("temperature") == 0 or "seed" in options
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, payload: dict):
+        blob = json.dumps(payload)
+        size = len(blob)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._entries -= 1
+                self._bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, size, time.time()),
+            )
+            self._entries += 1
+            self._bytes += size
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Drops least recently used rows until both limits hold. Caller holds the lock.
+        """
+        while self._entries > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            over = max(self._entries - self.max_entries, 1)
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT ?", (over,)
+            ).fetchall()
+            if not rows:
+                break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k, _ in rows])
+            self._entries -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._entries, self._bytes = 0, 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._entries,
+            "bytes": self._bytes,
+        }
+
+    def close(self):
+        self._conn.close()
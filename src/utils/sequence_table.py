@@ -0,0 +1,203 @@
+"""
+Sequence Table - a coev dataset as a pandas table with one row per step
+Every distinct step string is parsed once with step_parser and its fields
+are laid out in columns, so the similarity, detector and analysis code can
+filter, group and join steps instead of re-splitting strings in Python
+loops. String columns are categoricals: generated corpora reuse a small
+step vocabulary, so a million sequences fit in a few hundred MB.
+
+Columns:
+    seq          position of the sequence (0..n-1), the fast group key
+    seq_id       id from the coev file
+    label        "fraud" / "legit"
+    step_idx     position of the step in its sequence
+    kind         "action", "transaction" or "invalid"
+    subject      actor of an action, source account of a transaction
+    action       action type, or payment type of a transaction
+    object       target of an action, destination account of a transaction
+    channel      channel of an action
+    description  details of an action
+    amount       amount of a transaction, NaN otherwise
+    step         the raw step string
+
+Fields that do not apply to a row's kind are missing. Sequences without
+steps have no rows, so per-sequence results are sized by the caller's
+sequence count (see counts_per_sequence).
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import src.utils.step_parser as step_parser
+from src.utils.coev_io import iter_coev
+
+COLUMNS = ("seq", "seq_id", "label", "step_idx", "kind", "subject", "action", "object", "channel",
+           "description", "amount", "step")
+
+# step_parser field -> table column, per kind
+_ACTION_COLUMNS = {"subject": "subject", "action_type": "action", "object": "object", "channel": "channel",
+                   "details": "description"}
+_TRANSACTION_COLUMNS = {"from_account": "subject", "payment_type": "action", "to_account": "object"}
+_FIELD_COLUMNS = ("subject", "action", "object", "channel", "description")
+
+
+def _categorical(values: list, codes: np.ndarray) -> pd.Categorical:
+    # values per distinct step (None for missing) expanded to one per row
+    value_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+    return pd.Categorical.from_codes(value_codes[codes], categories)
+
+
+def from_sequences(sequences: Sequence[List[str]], seq_ids: Optional[Sequence] = None,
+                   labels: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Builds the table from lists of step strings.
+
+    Args:
+        sequences: one list of step strings per sequence
+        seq_ids: id per sequence, defaults to the position
+        labels: label per sequence, missing if None
+    Returns:
+        DataFrame with COLUMNS
+    """
+    n = len(sequences)
+    seq_ids = list(seq_ids) if seq_ids is not None else list(range(n))
+    labels = list(labels) if labels is not None else [None] * n
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=n)
+
+    flat = [step if isinstance(step, str) else str(step) for sequence in sequences for step in sequence]
+    step_codes, distinct = pd.factorize(pd.Series(flat, dtype=object))
+    parsed = step_parser.parse_sequence(list(distinct))
+
+    fields = {column: [None] * len(parsed) for column in _FIELD_COLUMNS}
+    amounts = np.full(len(parsed), np.nan)
+    for i, step in enumerate(parsed):
+        names = _ACTION_COLUMNS if step.kind == "action" else _TRANSACTION_COLUMNS
+        for name, value in step.data.items():
+            if name in names:
+                fields[names[name]][i] = value
+        if step.kind == "transaction":
+            amounts[i] = step.data["amount"]
+
+    seq = np.repeat(np.arange(n), lengths)
+    table = pd.DataFrame({
+        "seq": seq,
+        "seq_id": np.repeat(np.asarray(seq_ids, dtype=object), lengths),
+        "label": _categorical(labels, seq),
+        "step_idx": np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths),
+        "kind": _categorical([step.kind for step in parsed], step_codes),
+        **{column: _categorical(fields[column], step_codes) for column in _FIELD_COLUMNS},
+        "amount": amounts[step_codes],
+        "step": pd.Categorical.from_codes(step_codes, pd.Index(distinct, dtype=object)),
+    })
+    return table
+
+
+def read(path: str) -> Tuple[list, list, List[List[str]]]:
+    """
+    Reads a coev file (any layout iter_coev reads) into per-sequence lists.
+
+    Returns:
+        (seq_ids, labels, sequences), the from_sequences arguments; unlike
+        the table they keep the id and label of sequences without steps
+    """
+    seq_ids, labels, sequences = [], [], []
+    for seq_id, label, sequence in iter_coev(path):
+        seq_ids.append(seq_id)
+        labels.append(label)
+        sequences.append(sequence or [])
+    return seq_ids, labels, sequences
+
+
+def load(path: str) -> pd.DataFrame:
+    """
+    Parses a coev file (any layout iter_coev reads) into the table.
+    """
+    seq_ids, labels, sequences = read(path)
+    return from_sequences(sequences, seq_ids, labels)
+
+
+def num_sequences(table: pd.DataFrame) -> int:
+    """
+    Sequences up to the last one with steps.
+    """
+    return int(table["seq"].max()) + 1 if len(table) else 0
+
+
+def counts_per_sequence(table: pd.DataFrame, mask=None, n: Optional[int] = None) -> np.ndarray:
+    """
+    Rows per sequence (only rows where mask is true), as an (n,) int64 array.
+    """
+    seq = table["seq"].to_numpy()
+    if mask is not None:
+        seq = seq[np.asarray(mask, dtype=bool)]
+    return np.bincount(seq, minlength=num_sequences(table) if n is None else n)
+
+
+def with_label(table: pd.DataFrame, label: str) -> pd.DataFrame:
+    """
+    Rows of the sequences with the given label.
+    """
+    return table[table["label"] == label]
+
+
+def distinct_rows(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    First row of every distinct step string, indexed by its code in table["step"].
+    """
+    codes = table["step"].cat.codes.to_numpy()
+    __, first = np.unique(codes, return_index=True)
+    rows = table.iloc[first]
+    return rows.set_index(codes[first])
+
+
+def stripped_steps(table: pd.DataFrame) -> pd.Categorical:
+    """
+    Step strings with the action descriptions removed, e.g.
+    "action(govco, posed as, sally, phone)"; other steps are unchanged.
+    Built once per distinct step from the parsed fields.
+    """
+    steps = table["step"].cat
+    stripped = list(steps.categories)
+    rows = distinct_rows(table)
+    fields = [np.asarray(rows[column], dtype=object).tolist() for column in ("subject", "action", "object", "channel")]
+    for code, kind, *values in zip(rows.index.tolist(), np.asarray(rows["kind"], dtype=object).tolist(), *fields):
+        if kind == "action":
+            stripped[code] = "action(" + ", ".join(map(step_parser.quote_field, values)) + ")"
+    # steps that only differ in their description share a category
+    stripped_codes, categories = pd.factorize(pd.Series(stripped, dtype=object))
+    return pd.Categorical.from_codes(stripped_codes[steps.codes.to_numpy()], categories)
+
+
+def _groups(table: pd.DataFrame, values, n: Optional[int] = None) -> List[list]:
+    # rows are grouped by seq in order, so each sequence is one slice (much faster than groupby.agg)
+    seq = table["seq"].to_numpy()
+    if n is not None:
+        bounds = np.r_[0, np.cumsum(np.bincount(seq, minlength=n))].tolist()
+    elif len(seq):
+        bounds = np.r_[0, np.flatnonzero(seq[1:] != seq[:-1]) + 1, len(seq)].tolist()
+    else:
+        bounds = [0]
+    values = np.asarray(values, dtype=object).tolist()
+    return [values[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def joined_text(table: pd.DataFrame, strip: bool = False, n: Optional[int] = None) -> List[str]:
+    """
+    One ", "-joined string per sequence, in seq order: the text the
+    embedding store encodes. strip drops action descriptions.
+
+    Args:
+        n: return exactly n strings, one per seq 0..n-1 ("" for sequences
+            without rows); by default only the sequences in the table
+    """
+    return [", ".join(steps) for steps in _groups(table, stripped_steps(table) if strip else table["step"], n)]
+
+
+def sequences(table: pd.DataFrame, n: Optional[int] = None) -> List[List[str]]:
+    """
+    Step strings per sequence, in seq order; inverse of from_sequences.
+    n as in joined_text.
+    """
+    return _groups(table, table["step"], n)
@@ -1,125 +1,106 @@
-import json
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 import matplotlib.pyplot as plt
+import src.utils.embedding_store as embedding_store
+import src.utils.blocked_similarity as blocked_similarity
+import src.utils.sequence_table as sequence_table
+
+_store = None
+
+
+def get_store() -> embedding_store.EmbeddingStore:
+    """
+    Returns the process-wide embedding store at DEFAULT_STORE_DIR, opening it
+    on first use. The model itself is only loaded when a text is missing.
+    """
+    global _store
+    if _store is None:
+        _store = embedding_store.EmbeddingStore()
+    return _store
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def prep_data(file, strip=False):
     """
-    Prepares sequences by removing description and action/transaction start
-    
-    :param file: Description
-    :param strip: Description
+    Fraud sequences of a coev file as ", "-joined text, one string per sequence
+
+    :param file: coev file (JSON dict or JSON lines)
+    :param strip: remove action descriptions, keeping subject, action, object and channel
     """
-    with open(file, 'r') as f:
-        data = json.load(f)
-        data = [", ".join(value.get("sequence")) for key, value in data.items() if value.get("label") == "fraud"]
-
-        if strip == True:
-            data_no_desc = []
-
-            for seq in data:
-                print(seq)
-                for act in seq:
-                    if act.startswith("action("):
-                        desc_removed += ",".join(act.split(",")[5:-1]) + ")" + ", "
-                        print(desc_removed + '\n')
-                    else:
-                        desc_removed += act
-                data_no_desc.append(desc_removed)
-            return data_no_desc
-    return data
-
-
-def sim_check_full_seq(file):
+    table = sequence_table.with_label(sequence_table.load(file), "fraud")
+    return sequence_table.joined_text(table, strip=strip)
+
+
+def avg_similarity(embeddings):
     """
-    Docstring for sim_check_full_seq
-    
-    :param file: Description
+    Mean cosine similarity over all distinct pairs of rows, through the
+    dense N x N matrix. Reference for blocked_similarity.mean_similarity,
+    which the sim checks use so memory stays bounded on large corpora.
     """
-    with open(file, 'r') as f:
-        data = json.load(f)
-
-        fraud_data = [", ".join(value.get("sequence")) for key, value in data.items() if value.get("label") == "fraud"]
-
-        embeddings = model.encode(fraud_data, convert_to_numpy=True, normalize_embeddings=True)
-        cos_matrix = cosine_similarity(embeddings)
-
-        n = cos_matrix.shape[0]
-        iu = np.triu_indices(n, k=1)
-        pairwise_sims = cos_matrix[iu]
-        avg_similarity = pairwise_sims.mean()
-        return avg_similarity
-
-def sim_check2():
-    with open('data/coev/coev_seq_v2.json', 'r') as f:
-        data = json.load(f)
-        fraud_data = [value.get("sequence") for key, value in data.items() if value.get("label") == "fraud"]
-
-        data_no_desc = []
-
-        for seq in fraud_data:
-            desc_removed = ""
-            for act in seq:
-                if act.startswith("action("):
-                    desc_removed += ",".join(act.split(",")[:-1]) + ")" + ", "
-                else:
-                    desc_removed += act
-            data_no_desc.append(desc_removed)
-
-        embeddings = model.encode(data_no_desc, convert_to_numpy=True, normalize_embeddings=True)
-        cos_matrix = cosine_similarity(embeddings)
-
-        n = cos_matrix.shape[0]
-        iu = np.triu_indices(n, k=1)
-        pairwise_sims = cos_matrix[iu]
-        avg_similarity = pairwise_sims.mean()
-        return avg_similarity
-    
-def sim_check3():
-    with open('data/coev/coev_seq_v2.json', 'r') as f:
-        data = json.load(f)
-        fraud_data = [value.get("sequence") for key, value in data.items() if value.get("label") == "fraud"]
-        legit_data = [value.get("sequence") for key, value in data.items() if value.get("label") == "legit"]
-
-
-        fraud_data_no_desc = []
-        legit_data_no_desc = []
-
-        for seq in fraud_data:
-            desc_removed = ""
-            for act in seq:
-                if act.startswith("action("):
-                    desc_removed += ",".join(act.split(",")[:-1]) + ")" + ", "
-                else:
-                    desc_removed += act
-            fraud_data_no_desc.append(desc_removed)
-
-        for seq in legit_data:
-            desc_removed = ""
-            for act in seq:
-                if act.startswith("action("):
-                    desc_removed += ",".join(act.split(",")[:-1]) + ")" + ", "
-                else:
-                    desc_removed += act
-            legit_data_no_desc.append(desc_removed)
-
-        embeddings1 = model.encode(fraud_data_no_desc, convert_to_numpy=True, normalize_embeddings=True)
-        embeddings2 = model.encode(legit_data_no_desc, convert_to_numpy=True, normalize_embeddings=True)
-
-        cos_matrix = cosine_similarity(embeddings1,embeddings2)
-
-        n = cos_matrix.shape[0]
-        iu = np.triu_indices(n, k=1)
-        pairwise_sims = cos_matrix[iu]
-        avg_similarity = pairwise_sims.mean()
-        return cos_matrix, avg_similarity
-    
-# sim_check_full_seq('data/coev/coev_seq_v2.json')
-prep_data('data/coev/coev_seq_v2.json', strip=True)
-      
-        
-
-        
\ No newline at end of file
+    cos_matrix = cosine_similarity(embeddings)
+
+    n = cos_matrix.shape[0]
+    iu = np.triu_indices(n, k=1)
+    pairwise_sims = cos_matrix[iu]
+    return pairwise_sims.mean()
+
+
+def sim_check_full_seq(file, store=None):
+    """
+    Mean pairwise cosine similarity of the fraud sequences, descriptions included
+
+    :param file: coev file
+    :param store: EmbeddingStore, defaults to get_store()
+    """
+    store = store or get_store()
+    embeddings = store.encode(prep_data(file))
+    return blocked_similarity.mean_similarity(embeddings, normalized=True)
+
+def sim_check2(file='data/coev/coev_seq_v2.json', store=None):
+    store = store or get_store()
+    embeddings = store.encode(prep_data(file, strip=True))
+    return blocked_similarity.mean_similarity(embeddings, normalized=True)
+
+def sim_check3(file='data/coev/coev_seq_v2.json', store=None):
+    """
+    Cosine similarity between every fraud and every legit sequence, descriptions removed
+
+    :param file: coev file
+    :param store: EmbeddingStore, defaults to get_store()
+    :return: (blocked_similarity.SimilarityStats over all fraud x legit pairs, their mean)
+    """
+    store = store or get_store()
+    table = sequence_table.load(file)
+    fraud_data_no_desc = sequence_table.joined_text(sequence_table.with_label(table, "fraud"), strip=True)
+    legit_data_no_desc = sequence_table.joined_text(sequence_table.with_label(table, "legit"), strip=True)
+
+    embeddings1 = store.encode(fraud_data_no_desc)
+    embeddings2 = store.encode(legit_data_no_desc)
+
+    stats = blocked_similarity.pairwise_stats(embeddings1, other=embeddings2, normalized=True)
+    return stats, stats.mean
+
+
+def sim_check_structural(file='data/coev/coev_seq_v2.json', env=None, label="fraud"):
+    """
+    Model-free alternative to sim_check2: mean structural (skeleton MinHash)
+    Jaccard similarity between the sequences with the given label, and their
+    near-duplicate clusters.
+
+    :param env: FraudEnv for entity roles, built with FraudEnv() if None
+    :param label: "fraud", "legit" or None for all sequences
+    """
+    import src.utils.fraud_env as fraud_env
+    import src.utils.pydantic_validator as pydantic_validator
+    from src.utils.structural_minhash import StructuralMinHash
+
+    env = env or fraud_env.FraudEnv(verbose=False).create_environment()
+    minhash = StructuralMinHash(pydantic_validator.build_entity_registry(env))
+    table = sequence_table.load(file)
+    signatures = minhash.table_signatures(table if label is None else sequence_table.with_label(table, label))
+    return 1.0 - minhash.diversity(signatures), minhash.duplicate_clusters(signatures).clusters
+
+
+if __name__ == "__main__":
+    # sim_check_full_seq('data/coev/coev_seq_v2.json')
+    for text in prep_data('data/coev/coev_seq_v2.json', strip=True):
+        print(text + '\n')
@@ -0,0 +1,192 @@
+"""
+Stateful Validator - graph-aware, step-by-step sequence validation
+Walks a sequence in order and carries forward what earlier steps established
+(who has appeared, who disclosed credentials, which accounts are compromised,
+running balances), checking each step against the FraudEnv owner/bank
+attributes in O(1). Steps are fed one at a time, so a growing partial
+sequence can be rejected as soon as its prefix goes wrong.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import src.utils.pydantic_validator as pv
+import src.utils.step_parser as step_parser
+
+
+class StatefulValidator:
+    """
+    Rules, each reported with its rule id:
+        owner_not_introduced: a non-owner acts on an account whose owner has
+            not appeared in an earlier step
+        bank_mismatch: a bank acts on an account it does not hold
+        unauthorized_source: a transaction debits an account whose owner has not
+            appeared and which is not compromised
+        fraudster_not_introduced: a transaction pays a fraudster's account
+            before that fraudster appeared
+        frozen_account: a transaction touches a frozen account
+        insufficient_funds: the amount exceeds the source's running balance
+
+    An account becomes compromised when a fraudster acts on it, when a
+    non-owner performs a technical or fraudulent action on it, or when its
+    owner discloses credentials or information.
+
+    Args:
+        env: FraudEnv or ArrayFraudEnv the sequences are generated against
+        rules: UniversalRulesValidator whose registry and keyword predicates are reused
+    """
+
+    def __init__(self, env, rules: pv.UniversalRulesValidator):
+        self.env = env
+        self.rules = rules
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets all state, ready for a new sequence.
+        """
+        self.step_index = 0
+        self.appeared: Set[str] = set()        # lowercased names of every subject/object/account seen
+        self.disclosed: Set[str] = set()       # people who submitted information
+        self.compromised: Set[str] = set()     # accounts a non-owner has taken over
+        self.balances: Dict[str, float] = {}   # running balance of every account touched
+        self.violations: List[Tuple[int, str, str]] = []
+
+    # ------------------------------------------------------------------------
+    # env lookups, all O(1)
+    # ------------------------------------------------------------------------
+
+    def _entity(self, name: str) -> Optional[pv.Entity]:
+        return self.rules.entity_registry.get(name)
+
+    def _is_account(self, name: str) -> bool:
+        entity = self._entity(name)
+        return entity is not None and entity.is_account()
+
+    def _owner(self, account: str) -> str:
+        return str(self.env.get_attr(account, "owner") or "").lower()
+
+    def _balance(self, account: str) -> float:
+        if account not in self.balances:
+            self.balances[account] = float(self.env.get_attr(account, "balance") or 0.0)
+        return self.balances[account]
+
+    def _is_compromised(self, account: str) -> bool:
+        return (account in self.compromised
+                or self._owner(account) in self.disclosed
+                or bool(self.env.get_attr(account, "compromised")))
+
+    # ------------------------------------------------------------------------
+    # step checks
+    # ------------------------------------------------------------------------
+
+    def _check_action(self, data: dict) -> List[Tuple[str, str]]:
+        subject, obj = data["subject"], data["object"]
+        action_type = data["action_type"]
+        subject_entity = self._entity(subject)
+        errors = []
+
+        if self._is_account(obj):
+            owner = self._owner(obj)
+            if owner != subject.lower():
+                if owner not in self.appeared:
+                    errors.append(("owner_not_introduced", (
+                        f"'{subject}' acts on account '{obj}' but its owner '{owner}' has not appeared yet. "
+                        f"Introduce '{owner}' in an earlier step."
+                    )))
+                if subject_entity is not None and subject_entity.type == pv.EntityType.BANK:
+                    bank = self.env.get_attr(obj, "bank")
+                    if bank != subject:
+                        errors.append(("bank_mismatch", (
+                            f"Bank '{subject}' acts on account '{obj}', which is held at '{bank}'."
+                        )))
+                if ((subject_entity is not None and subject_entity.is_fraudster())
+                        or self.rules.is_technical_system_action(action_type)
+                        or self.rules.is_fraud_behavior(action_type)):
+                    self.compromised.add(obj)
+
+        if subject_entity is not None and subject_entity.is_human() and self.rules.is_information_submission(action_type):
+            self.disclosed.add(subject.lower())
+
+        self.appeared.add(subject.lower())
+        self.appeared.add(obj.lower())
+        return errors
+
+    def _check_transaction(self, data: dict) -> List[Tuple[str, str]]:
+        src, dst, amount = data["from_account"], data["to_account"], data["amount"]
+        errors = []
+        if not (self._is_account(src) and self._is_account(dst)):
+            # entity type errors are reported by UniversalRulesValidator
+            return errors
+
+        owner = self._owner(src)
+        if owner not in self.appeared and src.lower() not in self.appeared and not self._is_compromised(src):
+            errors.append(("unauthorized_source", (
+                f"Transaction debits '{src}' but neither its owner '{owner}' nor the account appeared before, "
+                f"and the account is not compromised."
+            )))
+
+        dst_owner = self._owner(dst)
+        dst_owner_entity = self._entity(self.env.get_attr(dst, "owner"))
+        if dst_owner_entity is not None and dst_owner_entity.is_fraudster() and dst_owner not in self.appeared:
+            errors.append(("fraudster_not_introduced", (
+                f"Transaction pays '{dst}', owned by fraudster '{dst_owner}', who has not appeared yet."
+            )))
+
+        for account in (src, dst):
+            if self.env.get_attr(account, "status") == "frozen":
+                errors.append(("frozen_account", f"Account '{account}' is frozen."))
+
+        balance = self._balance(src)
+        if amount > balance + 1e-9:
+            errors.append(("insufficient_funds", (
+                f"Transaction of {amount:.2f} from '{src}' exceeds its balance of {balance:.2f}."
+            )))
+        else:
+            self.balances[src] = balance - amount
+            self.balances[dst] = self._balance(dst) + amount
+
+        self.appeared.add(src.lower())
+        self.appeared.add(dst.lower())
+        return errors
+
+    # ------------------------------------------------------------------------
+    # incremental API
+    # ------------------------------------------------------------------------
+
+    def feed(self, step: Union[str, step_parser.ParsedStep]) -> List[Tuple[int, str, str]]:
+        """
+        Checks the next step against the state built by the previous ones and
+        advances the state.
+
+        Returns:
+            violations of this step as (step_index, rule_id, error_message)
+        """
+        if isinstance(step, str):
+            step = step_parser.parse_step(step)
+
+        if step.kind == "action":
+            errors = self._check_action(step.data)
+        elif step.kind == "transaction":
+            errors = self._check_transaction(step.data)
+        else:
+            errors = []   # unparseable steps are reported by validate_syntax
+
+        found = [(self.step_index, rule, msg) for rule, msg in errors]
+        self.violations.extend(found)
+        self.step_index += 1
+        return found
+
+    def validate(self, sequence: List[Union[str, step_parser.ParsedStep]], stop_early: bool = False) -> Tuple[bool, List[str]]:
+        """
+        Validates a whole sequence from a fresh state.
+
+        Args:
+            sequence: step strings or ParsedSteps
+            stop_early: stop at the first step with a violation
+        Returns: (is_valid, list_of_errors)
+        """
+        self.reset()
+        for step in sequence:
+            if self.feed(step) and stop_early:
+                break
+        return len(self.violations) == 0, [f"Step {i}: {msg}" for i, _, msg in self.violations]
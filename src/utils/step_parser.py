@@ -0,0 +1,183 @@
+"""
+Step Parser - single-pass parser for action(...)/transaction(...) steps
+Parses each step string once into a ParsedStep that both syntax and
+semantic validation reuse.
+
+Quoting rule: a field may be wrapped in double quotes, in which case it may
+contain commas, and \\" and \\\\ inside it are escaped quote and backslash.
+Unquoted fields cannot contain commas (stray quotes inside them are kept
+as-is), so
+    action(govco, posed as, sally, phone, "claimed to be from the IRS, then asked for SSN")
+has five fields, while the same step without the quotes has six and is invalid.
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+ACTION_FIELDS = ("subject", "action_type", "object", "channel", "details")
+TRANSACTION_FIELDS = ("from_account", "payment_type", "to_account", "amount")
+
+# whole step: kind and the text between the outer parentheses; a stray
+# trailing comma or semicolon copied from a list is tolerated
+_STEP_RE = re.compile(r'\s*(action|transaction)\((.*)\)\s*[,;]?\s*$', re.S)
+# one field: a quoted string with escapes, or else a run of non-comma characters
+_FIELD_RE = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|([^,]*?))\s*(,|$)', re.S)
+_UNESCAPE_RE = re.compile(r'\\(.)', re.S)
+_NEEDS_QUOTES = re.compile(r'[,"\\]|^\s|\s$')
+
+
+class ParsedStep(NamedTuple):
+    """
+    kind is "action", "transaction" or "invalid"; data holds the named fields
+    (amount as float) and is empty for invalid steps. parse_step returns the
+    same ParsedStep for repeated strings, so data must be treated as read-only.
+    """
+    kind: str
+    data: Dict[str, object]
+    raw: str
+    error: Optional[str] = None
+
+
+# tuple.__new__ skips the Python-level NamedTuple constructor on the fast path
+_new_step = tuple.__new__
+
+
+def split_fields(inner: str) -> Optional[List[str]]:
+    """
+    Splits the text between the parentheses into fields.
+
+    Returns:
+        list of stripped fields, or None if the fields cannot be split
+    """
+    if '"' not in inner:
+        return list(map(str.strip, inner.split(",")))
+
+    fields = []
+    pos = 0
+    while True:
+        m = _FIELD_RE.match(inner, pos)
+        if m is None:
+            return None
+        quoted, plain, sep = m.groups()
+        fields.append(_UNESCAPE_RE.sub(r"\1", quoted) if quoted is not None else plain)
+        pos = m.end()
+        if sep == "":
+            return fields if pos == len(inner) else None
+
+
+# generated corpora reuse a small step vocabulary, so most steps are parsed once
+@lru_cache(maxsize=1 << 14)
+def parse_step(step: str) -> ParsedStep:
+    """
+    Parses one step string. Memoized; parse_step.__wrapped__ is the uncached parser.
+    """
+    # fast path for plain steps (no quotes, no trailing separator): the same work as
+    # the old str.split parser. Anything else, including every invalid step, falls
+    # through to the general path below.
+    stripped = step.strip()
+    if '"' not in stripped:
+        if stripped.startswith("action(") and stripped[-1] == ")":
+            parts = list(map(str.strip, stripped[7:-1].split(",")))
+            if len(parts) == 5:
+                return _new_step(ParsedStep, ("action", dict(zip(ACTION_FIELDS, parts)), step, None))
+        elif stripped.startswith("transaction(") and stripped[-1] == ")":
+            parts = list(map(str.strip, stripped[12:-1].split(",")))
+            if len(parts) == 4:
+                try:
+                    amount = float(parts[3])
+                except ValueError:
+                    amount = None
+                if amount is not None:
+                    data = {"from_account": parts[0], "payment_type": parts[1], "to_account": parts[2],
+                            "amount": amount}
+                    return _new_step(ParsedStep, ("transaction", data, step, None))
+
+    m = _STEP_RE.match(step)
+    if m is None:
+        return ParsedStep("invalid", {}, step, "not an action(...) or transaction(...)")
+    kind, inner = m.groups()
+    names = ACTION_FIELDS if kind == "action" else TRANSACTION_FIELDS
+    parts = split_fields(inner)
+    if parts is None:
+        return ParsedStep("invalid", {}, step, "could not split fields")
+    if len(parts) != len(names):
+        return ParsedStep("invalid", {}, step, f"expected {len(names)} fields, got {len(parts)}")
+
+    data = dict(zip(names, parts))
+    if kind == "transaction":
+        try:
+            data["amount"] = float(data["amount"])
+        except ValueError:
+            return ParsedStep("invalid", {}, step, f"amount is not a number: {data['amount']}")
+    return ParsedStep(kind, data, step)
+
+
+def parse_sequence(sequence: List[str]) -> List[ParsedStep]:
+    return [parse_step(step) if isinstance(step, str) else ParsedStep("invalid", {}, str(step), "not a string")
+            for step in sequence]
+
+
+def quote_field(value) -> str:
+    """
+    Quotes a field only if it would not survive split_fields unquoted.
+    """
+    value = str(value)
+    if not _NEEDS_QUOTES.search(value):
+        return value
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def format_step(kind: str, data: Dict[str, object]) -> str:
+    """
+    Inverse of parse_step: builds the step string from named fields.
+    """
+    names = ACTION_FIELDS if kind == "action" else TRANSACTION_FIELDS
+    return f"{kind}(" + ", ".join(quote_field(data[n]) for n in names) + ")"
+
+
+# a complete JSON string literal
+_JSON_STRING_RE = re.compile(r'"((?:[^"\\]|\\.)*)"', re.S)
+
+
+class StepStream:
+    """
+    Incremental step extractor for a streamed {"sequence": [...]} completion.
+    feed() takes the next text chunk and returns the step strings whose JSON
+    string literal has just been closed, so each step can be validated while
+    the model is still generating the rest.
+
+    Args:
+        lower: lowercase steps, as LLMPlanner.check_response does with the full text
+    """
+
+    def __init__(self, lower: bool = True):
+        self.lower = lower
+        self.text = ""
+        self.steps: List[str] = []
+        self._pos = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        new = []
+        while True:
+            start = self.text.find('"', self._pos)
+            if start < 0:
+                break
+            m = _JSON_STRING_RE.match(self.text, start)
+            if m is None:
+                # string still open, wait for more text
+                break
+            self._pos = m.end()
+            try:
+                value = json.loads(m.group(0))
+            except ValueError:
+                continue
+            value = value.strip()
+            if self.lower:
+                value = value.lower()
+            if value.startswith(("action(", "transaction(")):
+                new.append(value)
+        self.steps.extend(new)
+        return new
@@ -0,0 +1,236 @@
+"""
+Structural MinHash - model-free similarity of sequence skeletons
+Reduces every step to its skeleton (subject role, action, object role,
+channel for actions; source and destination roles for transactions), using
+the sequence_table columns and the entity registry, so sequences that only
+differ in names, amounts or descriptions look the same. Sequences become
+sets of skeleton unigrams and bigrams, hashed into MinHash signatures with
+vectorised multiply-shift hashing, and LSH banding finds duplicate clusters
+without comparing all pairs. Shingles come from a stable 64-bit hash of the
+skeleton strings, so signatures from separate calls can be compared.
+
+Skeletons are built once per distinct step of the table, and shingles
+hashed once per distinct shingle, so a million generated sequences, which
+reuse a small step vocabulary, are processed in seconds on one CPU.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import src.utils.sequence_table as sequence_table
+import src.utils.step_parser as step_parser
+
+_SPACES_RE = re.compile(r"[\s_\-]+")
+
+# sequences hashed at once, bounds the (sequences, width, num_perm) uint32 gather
+_CHUNK_SEQUENCES = 2048
+# candidate pairs verified at once
+_CHUNK_PAIRS = 1 << 16
+# odd multiplier mixing the first skeleton hash of a bigram with the second
+_BIGRAM_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+class DuplicateClusters(NamedTuple):
+    labels: np.ndarray          # cluster id per sequence
+    clusters: List[np.ndarray]  # member indices of every cluster with more than one sequence, largest first
+
+
+def _normalize(text: str) -> str:
+    return _SPACES_RE.sub(" ", text.strip().lower())
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+class StructuralMinHash:
+    """
+    Args:
+        entity_registry: name -> pydantic_validator.Entity, for the roles; names
+            not in it get the role "unknown"
+        num_perm: MinHash signature length
+        bands: LSH bands, num_perm must be a multiple of it; rows per band is
+            num_perm // bands, fewer rows find less similar pairs (and verify
+            more candidates). 16 bands of 8 rows suit thresholds around 0.8
+        seed: seed for the hash functions
+    """
+
+    def __init__(self, entity_registry: Optional[Dict[str, object]] = None, num_perm: int = 128,
+                 bands: int = 16, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.registry = entity_registry or {}
+        # build_entity_registry keys by the environment's names (e.g. "ConEdison"), while
+        # generated steps are usually lowercased
+        self._folded = {str(name).strip().lower(): entity for name, entity in self.registry.items()}
+        self.num_perm = num_perm
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, a odd
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2**63, num_perm // bands, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    def role(self, name) -> str:
+        entity = self.registry.get(name)
+        if entity is None:
+            entity = self._folded.get(str(name).strip().lower())
+        return entity.type.value if entity is not None and entity.type is not None else "unknown"
+
+    def _skeleton(self, kind, subject, action, obj, channel) -> str:
+        if kind == "action":
+            return "|".join(("action", self.role(subject), _normalize(action), self.role(obj), _normalize(channel)))
+        if kind == "transaction":
+            return "|".join(("transaction", self.role(subject), self.role(obj)))
+        return "invalid"
+
+    def step_skeleton(self, step: str) -> str:
+        """
+        Skeleton of one step, e.g. "action|fraudster|posed as|individual|email".
+        """
+        parsed = step_parser.parse_step(step)
+        d = parsed.data
+        if parsed.kind == "action":
+            return self._skeleton("action", d["subject"], d["action_type"], d["object"], d["channel"])
+        if parsed.kind == "transaction":
+            return self._skeleton("transaction", d["from_account"], None, d["to_account"], None)
+        return "invalid"
+
+    def skeleton(self, sequence: List[str]) -> List[str]:
+        return [self.step_skeleton(step) for step in sequence]
+
+    def _tokens(self, table: pd.DataFrame) -> np.ndarray:
+        """
+        Returns: stable 64-bit hash of the skeleton of every row
+        """
+        rows = sequence_table.distinct_rows(table)
+        columns = [np.asarray(rows[c], dtype=object).tolist() for c in ("kind", "subject", "action", "object", "channel")]
+        step_hashes = np.zeros(len(table["step"].cat.categories), dtype=np.uint64)
+        # distinct steps share few skeletons, each is hashed once
+        skeleton_hashes = {}
+        for code, *fields in zip(rows.index.tolist(), *columns):
+            skeleton = self._skeleton(*fields)
+            if skeleton not in skeleton_hashes:
+                skeleton_hashes[skeleton] = _stable_hash(skeleton)
+            step_hashes[code] = skeleton_hashes[skeleton]
+        return step_hashes[table["step"].cat.codes.to_numpy()]
+
+    def signatures(self, sequences: List[List[str]]) -> np.ndarray:
+        """
+        MinHash signatures of the skeleton unigram + bigram sets.
+
+        Returns:
+            (len(sequences), num_perm) uint32; a sequence without steps gets all 0xFFFFFFFF
+        """
+        table = sequence_table.from_sequences(sequences)
+        return self._signatures(table, table["seq"].to_numpy(), len(sequences))
+
+    def table_signatures(self, table: pd.DataFrame) -> np.ndarray:
+        """
+        Signatures from a sequence_table, e.g. one filtered with with_label.
+
+        Returns:
+            (sequences with steps in the table, num_perm) uint32, in seq order
+        """
+        __, seq_index = np.unique(table["seq"].to_numpy(), return_inverse=True)
+        return self._signatures(table, seq_index, int(seq_index.max()) + 1 if len(seq_index) else 0)
+
+    def _signatures(self, table: pd.DataFrame, seq_index: np.ndarray, n: int) -> np.ndarray:
+        tokens = self._tokens(table) if len(table) else np.empty(0, np.uint64)
+        lengths = np.bincount(seq_index, minlength=n)
+
+        # per sequence: its unigrams, then its bigrams (ordered pairs of steps)
+        counts = np.maximum(2 * lengths - 1, 0)
+        offsets = np.r_[0, np.cumsum(counts)[:-1]]
+        step_pos = np.arange(len(tokens)) - np.r_[0, np.cumsum(lengths)[:-1]][seq_index]
+        shingles = np.empty(int(counts.sum()), dtype=np.uint64)
+        shingles[offsets[seq_index] + step_pos] = tokens
+        pairs = np.flatnonzero(seq_index[:-1] == seq_index[1:])
+        shingles[offsets[seq_index[pairs]] + lengths[seq_index[pairs]] + step_pos[pairs]] = (
+            tokens[pairs] * _BIGRAM_MIX + tokens[pairs + 1])
+
+        signatures = np.full((n, self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        if not len(shingles):
+            return signatures
+
+        # generated corpora reuse few distinct shingles: hash each once, the last row pads
+        codes, distinct = pd.factorize(shingles)
+        hashes = np.full((len(distinct) + 1, self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        hashes[:-1] = ((distinct.astype(np.uint64)[:, None] * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+        pad = len(distinct)
+
+        # sequences of similar length together, min over a padded (chunk, width, num_perm) gather
+        by_length = np.argsort(counts, kind="stable")
+        for lo in range(0, n, _CHUNK_SEQUENCES):
+            chunk = by_length[lo:lo + _CHUNK_SEQUENCES]
+            width = max(int(counts[chunk[-1]]), 1)
+            cols = np.arange(width)
+            valid = cols < counts[chunk, None]
+            ids = np.where(valid, codes[np.minimum(offsets[chunk, None] + cols, len(codes) - 1)], pad)
+            signatures[chunk] = hashes[ids].min(axis=1)
+        return signatures
+
+    @staticmethod
+    def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> np.ndarray:
+        """
+        Estimated Jaccard similarity, row-wise for 2D inputs.
+        """
+        return (sig_a == sig_b).mean(axis=-1)
+
+    def diversity(self, signatures: np.ndarray, num_pairs: int = 100_000, seed: int = 0) -> float:
+        """
+        1 - mean estimated Jaccard similarity over num_pairs random pairs of distinct sequences.
+        """
+        n = len(signatures)
+        if n < 2:
+            return 0.0
+        rng = np.random.default_rng(seed)
+        i = rng.integers(0, n, num_pairs)
+        j = (i + rng.integers(1, n, num_pairs)) % n
+        return float(1.0 - self.jaccard(signatures[i], signatures[j]).mean())
+
+    def duplicate_clusters(self, signatures: np.ndarray, threshold: float = 0.8) -> DuplicateClusters:
+        """
+        Groups sequences whose skeletons are near-identical. Sequences sharing
+        an LSH band bucket are joined to the bucket's first member if their
+        estimated Jaccard similarity is at least `threshold`; clusters are the
+        connected components of those links.
+        """
+        n = len(signatures)
+        rows = self.num_perm // self.bands
+        candidates = []
+        for band in range(self.bands):
+            block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            keys = block[:, 0] * self._band_mix[0]
+            for r in range(1, rows):
+                keys += block[:, r] * self._band_mix[r]
+            buckets, distinct = pd.factorize(keys)
+            # first member of every bucket, by assigning in reverse so the earliest index wins
+            first = np.empty(len(distinct), dtype=np.int64)
+            first[buckets[::-1]] = np.arange(n - 1, -1, -1)
+            leaders = first[buckets]
+            members = np.flatnonzero(leaders != np.arange(n))
+            candidates.append(members * np.int64(n) + leaders[members])
+
+        # a pair sharing several buckets is verified once
+        candidates = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, np.int64)
+        src, dst = candidates // n, candidates % n
+        close = np.concatenate([self.jaccard(signatures[src[i:i + _CHUNK_PAIRS]], signatures[dst[i:i + _CHUNK_PAIRS]])
+                                for i in range(0, len(src), _CHUNK_PAIRS)] or [np.empty(0)]) >= threshold
+        src, dst = src[close], dst[close]
+        graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+        __, labels = connected_components(graph, directed=False)
+
+        sizes = np.bincount(labels)
+        multi = np.flatnonzero(sizes > 1)
+        multi = multi[np.argsort(-sizes[multi], kind="stable")]
+        order = np.argsort(labels, kind="stable")
+        bounds = np.r_[0, np.cumsum(sizes)]
+        clusters = [order[bounds[c]:bounds[c + 1]] for c in multi]
+        return DuplicateClusters(labels=labels, clusters=clusters)